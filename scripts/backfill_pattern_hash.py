@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Oceanus Agent Pattern Hash Backfill.
+
+One-off migration for knowledge cases stored before pattern_hash existed.
+Their error_pattern was produced by an older normalization (timestamps,
+addresses and in-word slashes were generalized differently), so hashing it
+with MD5(error_pattern) in SQL never matches patterns extracted today.
+
+Each case's pattern is re-derived with the current extract_error_pattern:
+from the source exception's error message when it still exists, otherwise
+by re-normalizing the stored pattern. The latter cannot undo fragments the
+old normalization already replaced, so such cases may still not be matched.
+
+Run after adding the pattern_hash and seen_count columns (see
+docs/design/database-design.md).
+
+Usage:
+    python scripts/backfill_pattern_hash.py --dry-run
+    python scripts/backfill_pattern_hash.py
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from oceanus_agent.config.settings import settings
+from oceanus_agent.services.mysql_service import (
+    ERROR_MESSAGE_MAX_CHARS,
+    MySQLService,
+    pattern_hash,
+)
+from oceanus_agent.workflow.nodes.accumulator import extract_error_pattern
+from sqlalchemy import text
+
+# SQL statements, built once at import
+SELECT_CASES_SQL = text("""
+    SELECT kc.id, kc.error_pattern, kc.pattern_hash,
+           LEFT(e.error_message, :error_message_chars)
+    FROM knowledge_cases kc
+    LEFT JOIN flink_job_exceptions e ON e.id = kc.source_exception_id
+    WHERE kc.error_pattern IS NOT NULL
+""")
+
+UPDATE_CASE_SQL = text("""
+    UPDATE knowledge_cases
+    SET error_pattern = :error_pattern, pattern_hash = :pattern_hash
+    WHERE id = :id
+""")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Backfill knowledge case pattern hashes"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report changes without writing"
+    )
+    args = parser.parse_args()
+
+    mysql_service = MySQLService(settings.mysql)
+    try:
+        async with mysql_service.async_session() as session:
+            result = await session.execute(
+                SELECT_CASES_SQL, {"error_message_chars": ERROR_MESSAGE_MAX_CHARS}
+            )
+            rows = result.fetchall()
+
+            updates = []
+            renormalized = 0
+            for case_id, stored_pattern, stored_hash, source_message in rows:
+                if source_message:
+                    error_pattern = extract_error_pattern(source_message)
+                else:
+                    error_pattern = extract_error_pattern(stored_pattern)
+                    renormalized += 1
+                new_hash = pattern_hash(error_pattern)
+                if error_pattern != stored_pattern or new_hash != stored_hash:
+                    updates.append(
+                        {
+                            "id": case_id,
+                            "error_pattern": error_pattern,
+                            "pattern_hash": new_hash,
+                        }
+                    )
+
+            print(
+                f"📋 {len(rows)} cases, {len(updates)} to update, "
+                f"{renormalized} without a source exception"
+            )
+            if args.dry_run or not updates:
+                return
+
+            await session.execute(UPDATE_CASE_SQL, updates)
+            await session.commit()
+            print(f"✅ Updated {len(updates)} cases")
+    finally:
+        await mysql_service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
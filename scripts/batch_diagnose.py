@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Oceanus Agent Batch Diagnosis.
+
+Diagnoses a backlog of pending exceptions through the OpenAI Batch API
+instead of the interactive agent loop. Batch requests cost half as much
+and have separate rate limits, but can take up to 24h to complete, so
+this is meant for backfills rather than live traffic.
+
+Claimed exceptions stay 'in_progress' until the batch finishes. If the
+submission fails they are released back to pending; if the batch fails,
+expires or is cancelled they are marked failed. When waiting is
+interrupted, --resume collects the batch later.
+
+Usage:
+    python scripts/batch_diagnose.py --limit 500
+    python scripts/batch_diagnose.py --resume batch_abc123
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from oceanus_agent.config.settings import settings
+from oceanus_agent.services.llm_service import LLMService
+from oceanus_agent.services.mysql_service import MySQLService
+
+
+async def claim_pending(mysql_service: MySQLService, limit: int) -> list:
+    """Claim up to `limit` pending exceptions (marks them in_progress)."""
+    return await mysql_service.get_pending_exceptions(limit)
+
+
+async def store_results(
+    mysql_service: MySQLService, batch_id: str, results: dict, exception_ids: list
+) -> None:
+    """Write batch results back; exceptions without a result are marked failed."""
+    completed = 0
+    for exception_id in exception_ids:
+        diagnosis = results.get(str(exception_id))
+        if diagnosis is None:
+            await mysql_service.mark_exception_failed(
+                exception_id, f"No result in diagnosis batch {batch_id}"
+            )
+            continue
+        await mysql_service.update_diagnosis_result(exception_id, diagnosis)
+        completed += 1
+
+    print(f"✅ Stored {completed} diagnoses, {len(exception_ids) - completed} failed")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Oceanus Agent Batch Diagnosis")
+    parser.add_argument(
+        "--limit", type=int, default=100, help="Max pending exceptions to claim"
+    )
+    parser.add_argument(
+        "--resume", metavar="BATCH_ID", help="Collect results of a submitted batch"
+    )
+    args = parser.parse_args()
+
+    mysql_service = MySQLService(settings.mysql)
+    llm_service = LLMService(settings.openai)
+    try:
+        if args.resume:
+            batch_id = args.resume
+            # Every exception submitted with the batch, not only those that
+            # came back with a result
+            exception_ids = await llm_service.get_diagnosis_batch_exception_ids(
+                batch_id
+            )
+        else:
+            job_infos = await claim_pending(mysql_service, args.limit)
+            if not job_infos:
+                print("No pending exceptions.")
+                return
+
+            exception_ids = [job_info["exception_id"] for job_info in job_infos]
+            try:
+                batch_id = await llm_service.submit_diagnosis_batch(job_infos)
+            except Exception:
+                # Nothing was submitted; let the agent loop claim them again
+                await mysql_service.release_exceptions(exception_ids)
+                raise
+            print(f"🚀 Submitted {len(job_infos)} exceptions as batch {batch_id}")
+            print(f"   Resume later with: --resume {batch_id}")
+
+        try:
+            results = await llm_service.await_diagnosis_batch(batch_id)
+        except RuntimeError as e:
+            # The batch failed, expired or was cancelled: no result will come
+            print(f"❌ {e}")
+            results = {}
+
+        await store_results(mysql_service, batch_id, results, exception_ids)
+    finally:
+        await llm_service.close()
+        await mysql_service.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
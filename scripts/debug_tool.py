@@ -8,6 +8,7 @@ Useful for development, testing, and demos.
 Usage:
     python scripts/debug_tool.py insert --type checkpoint
     python scripts/debug_tool.py insert --msg "Custom error message"
+    python scripts/debug_tool.py insert --type oom_heap --count 20
     python scripts/debug_tool.py status --job-id test-job-123
     python scripts/debug_tool.py list --limit 5
 """
@@ -17,6 +18,10 @@ import asyncio
 import json
 import sys
 import uuid
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from oceanus_agent.config.settings import settings
 from oceanus_agent.services.mysql_service import MySQLService
@@ -51,10 +56,37 @@ ERROR_TEMPLATES = {
     },
 }
 
-
-async def insert_record(args: argparse.Namespace) -> None:
-    """Insert a test record into the database."""
-    job_id = args.job_id or f"test-job-{uuid.uuid4().hex[:8]}"
+# SQL statements, built once at import
+INSERT_SQL = text("""
+INSERT INTO flink_job_exceptions
+(job_id, job_name, job_type, error_message, error_type, status)
+VALUES
+(:job_id, :job_name, 'streaming', :error_message, :error_type, 'pending');
+""")
+
+STATUS_SQL = text("""
+SELECT job_id, status, diagnosis_confidence, suggested_fix, created_at, updated_at
+FROM flink_job_exceptions
+WHERE job_id = :job_id
+""")
+
+LIST_SQL = text("""
+SELECT job_id, error_type, status, created_at
+FROM flink_job_exceptions
+ORDER BY created_at DESC
+LIMIT :limit
+""")
+
+# Header for the list command output
+LIST_HEADER = f"{'Job ID':<25} {'Status':<12} {'Type':<20} {'Created At'}\n" + "-" * 80
+
+
+async def insert_record(mysql_service: MySQLService, args: argparse.Namespace) -> None:
+    """Insert one or more test records into the database."""
+    count = max(args.count or 1, 1)
+    if args.job_id and count > 1:
+        print("❌ Error: --job-id cannot be combined with --count > 1")
+        return
 
     if args.msg:
         error_msg = args.msg
@@ -66,51 +98,43 @@ async def insert_record(args: argparse.Namespace) -> None:
         error_type = template["type"]
         job_name = template["name"]
 
-    print(f"Inserting job: {job_id}")
+    job_ids = [args.job_id or f"test-job-{uuid.uuid4().hex[:8]}" for _ in range(count)]
+
+    print(f"Inserting {count} job(s): {job_ids[0]}{' ...' if count > 1 else ''}")
     print(f"Error Type: {error_type}")
     print(f"Message: {error_msg[:100]}...")
 
-    mysql_service = MySQLService(settings.mysql)
-
-    query = text("""
-    INSERT INTO flink_job_exceptions
-    (job_id, job_name, job_type, error_message, error_type, status)
-    VALUES
-    (:job_id, :job_name, 'streaming', :error_message, :error_type, 'pending');
-    """)
-
-    params = {
-        "job_id": job_id,
-        "job_name": job_name,
-        "error_message": error_msg,
-        "error_type": error_type,
-    }
+    # A list of parameter sets is sent as a single executemany in one transaction
+    params = [
+        {
+            "job_id": job_id,
+            "job_name": job_name,
+            "error_message": error_msg,
+            "error_type": error_type,
+        }
+        for job_id in job_ids
+    ]
 
     try:
         async with mysql_service.engine.begin() as conn:
-            await conn.execute(query, params)
-        print(f"\n✅ Successfully inserted test record. Job ID: {job_id}")
+            await conn.execute(INSERT_SQL, params)
+        if count == 1:
+            print(f"\n✅ Successfully inserted test record. Job ID: {job_ids[0]}")
+        else:
+            print(f"\n✅ Successfully inserted {count} test records.")
     except Exception as e:
         print(f"\n❌ Error inserting record: {e}")
 
 
-async def check_status(args: argparse.Namespace) -> None:
+async def check_status(mysql_service: MySQLService, args: argparse.Namespace) -> None:
     """Check the status of a specific job."""
     if not args.job_id:
         print("❌ Error: --job-id is required for status command")
         return
 
-    mysql_service = MySQLService(settings.mysql)
-
-    query = text("""
-    SELECT job_id, status, diagnosis_confidence, suggested_fix, created_at, updated_at
-    FROM flink_job_exceptions
-    WHERE job_id = :job_id
-    """)
-
     try:
         async with mysql_service.engine.connect() as conn:
-            result = await conn.execute(query, {"job_id": args.job_id})
+            result = await conn.execute(STATUS_SQL, {"job_id": args.job_id})
             row = result.fetchone()
 
             if row:
@@ -133,30 +157,24 @@ async def check_status(args: argparse.Namespace) -> None:
         print(f"\n❌ Error checking status: {e}")
 
 
-async def list_records(args: argparse.Namespace) -> None:
+async def list_records(mysql_service: MySQLService, args: argparse.Namespace) -> None:
     """List recent records."""
-    mysql_service = MySQLService(settings.mysql)
-
     limit = args.limit or 10
 
-    query = text("""
-    SELECT job_id, error_type, status, created_at
-    FROM flink_job_exceptions
-    ORDER BY created_at DESC
-    LIMIT :limit
-    """)
-
     try:
         async with mysql_service.engine.connect() as conn:
-            result = await conn.execute(query, {"limit": limit})
-            rows = result.fetchall()
+            # Stream rows from a server-side cursor instead of buffering them all
+            result = await conn.stream(LIST_SQL, {"limit": limit})
 
-            print(f"\nRecent {len(rows)} records:")
-            print(f"{ 'Job ID':<25} {'Status':<12} {'Type':<20} {'Created At'}")
-            print("-" * 80)
+            print(f"\nRecent records (limit {limit}):")
+            print(LIST_HEADER)
 
-            for row in rows:
+            count = 0
+            async for row in result:
                 print(f"{row[0]:<25} {row[1]:<12} {row[2][:20]:<20} {row[3]}")
+                count += 1
+
+            print(f"\n{count} record(s) shown.")
 
     except Exception as e:
         print(f"\n❌ Error listing records: {e}")
@@ -177,6 +195,9 @@ async def main() -> None:
     insert_parser.add_argument("--msg", help="Custom error message")
     insert_parser.add_argument("--error-type", help="Custom error type label")
     insert_parser.add_argument("--job-id", help="Custom Job ID (optional)")
+    insert_parser.add_argument(
+        "--count", type=int, default=1, help="Number of records to insert"
+    )
 
     # Status Command
     status_parser = subparsers.add_parser("status", help="Check diagnosis status")
@@ -190,23 +211,24 @@ async def main() -> None:
 
     args = parser.parse_args()
 
-    if args.command == "insert":
-        await insert_record(args)
-    elif args.command == "status":
-        await check_status(args)
-    elif args.command == "list":
-        await list_records(args)
-    else:
+    if args.command not in ("insert", "status", "list"):
         parser.print_help()
+        return
 
+    # One service (and connection pool) shared by whichever command runs
+    mysql_service = MySQLService(settings.mysql)
+    try:
+        if args.command == "insert":
+            await insert_record(mysql_service, args)
+        elif args.command == "status":
+            await check_status(mysql_service, args)
+        else:
+            await list_records(mysql_service, args)
+    finally:
+        await mysql_service.close()
 
-if __name__ == "__main__":
-    # Ensure src is in python path
-    import os
-    import sys
-
-    sys.path.append(os.path.join(os.getcwd(), "src"))
 
+if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
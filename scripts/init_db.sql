@@ -36,6 +36,8 @@ CREATE TABLE IF NOT EXISTS knowledge_cases (
     case_id VARCHAR(32) NOT NULL UNIQUE COMMENT 'Unique case identifier',
     error_type VARCHAR(64) NOT NULL COMMENT 'Error type',
     error_pattern TEXT COMMENT 'Generalized error pattern',
+    pattern_hash CHAR(32) COMMENT 'MD5 of error_pattern, for deduplication',
+    seen_count INT NOT NULL DEFAULT 1 COMMENT 'Times this error pattern was diagnosed',
     root_cause TEXT NOT NULL COMMENT 'Root cause description',
     solution TEXT NOT NULL COMMENT 'Solution description',
     source_exception_id BIGINT COMMENT 'Source exception ID if auto-generated',
@@ -44,6 +46,7 @@ CREATE TABLE IF NOT EXISTS knowledge_cases (
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT 'Record creation time',
     updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT 'Record update time',
     INDEX idx_error_type (error_type),
+    INDEX idx_pattern_hash (pattern_hash),
     INDEX idx_source_type (source_type),
     INDEX idx_verified (verified),
     FOREIGN KEY (source_exception_id) REFERENCES flink_job_exceptions(id) ON DELETE SET NULL
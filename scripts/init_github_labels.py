@@ -17,10 +17,15 @@ from __future__ import annotations
 
 import os
 import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
+# Maximum concurrent GitHub API requests
+MAX_WORKERS = 8
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class LabelConfig:
     """Label configuration."""
 
@@ -28,9 +33,14 @@ class LabelConfig:
     color: str
     description: str
 
+    @property
+    def compare_key(self) -> tuple[str, str]:
+        """Normalized (color, description) used to detect label drift."""
+        return self.color.lower(), self.description
+
 
 # Label definitions
-LABELS: list[LabelConfig] = [
+LABELS: tuple[LabelConfig, ...] = (
     # Area labels (used by labeler.yml for auto-labeling PRs)
     LabelConfig(
         name="area/workflow",
@@ -166,7 +176,7 @@ LABELS: list[LabelConfig] = [
         color="0E8A16",  # Green
         description="Low priority",
     ),
-]
+)
 
 
 def create_labels_with_api(repo_name: str, token: str) -> None:
@@ -190,46 +200,53 @@ def create_labels_with_api(repo_name: str, token: str) -> None:
     print(f"Creating labels for repository: {repo_name}")
     print("-" * 50)
 
-    created = 0
-    updated = 0
-    skipped = 0
+    # Fetch all existing labels up front (one paginated listing) instead of
+    # probing each label individually with get_label.
+    existing_labels = {existing.name: existing for existing in repo.get_labels()}
 
-    for label in LABELS:
+    def ensure_label(label: LabelConfig) -> str:
+        """Create or update a single label, returning the action taken."""
+        existing = existing_labels.get(label.name)
         try:
-            # Try to get existing label
-            existing = repo.get_label(label.name)
+            if existing is None:
+                # Label doesn't exist, create it
+                repo.create_label(
+                    name=label.name,
+                    color=label.color,
+                    description=label.description,
+                )
+                print(f"  Created: {label.name}")
+                return "created"
 
             # Check if update needed
-            if (
-                existing.color != label.color
-                or existing.description != label.description
-            ):
+            # GitHub reports colors in lowercase, so compare normalized keys
+            existing_key = (existing.color.lower(), existing.description or "")
+            if existing_key != label.compare_key:
                 existing.edit(
                     name=label.name,
                     color=label.color,
                     description=label.description,
                 )
                 print(f"  Updated: {label.name}")
-                updated += 1
-            else:
-                print(f"  Skipped (exists): {label.name}")
-                skipped += 1
+                return "updated"
+
+            print(f"  Skipped (exists): {label.name}")
+            return "skipped"
 
         except GithubException as e:
-            if e.status == 404:
-                # Label doesn't exist, create it
-                repo.create_label(
-                    name=label.name,
-                    color=label.color,
-                    description=label.description,
-                )
-                print(f"  Created: {label.name}")
-                created += 1
-            else:
-                print(f"  Error with {label.name}: {e}")
+            print(f"  Error with {label.name}: {e}")
+            return "error"
+
+    # Only mutations hit the API now; run them concurrently, capped to stay
+    # under GitHub's secondary rate limit.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = Counter(executor.map(ensure_label, LABELS))
 
     print("-" * 50)
-    print(f"Summary: {created} created, {updated} updated, {skipped} skipped")
+    print(
+        f"Summary: {results['created']} created, {results['updated']} updated, "
+        f"{results['skipped']} skipped"
+    )
 
 
 def print_gh_cli_commands() -> None:
@@ -28,8 +28,8 @@ def main() -> None:
 
         print("\nMilvus initialization complete!")
         print("\nNote: Collections are empty. To populate the knowledge base:")
-        print("  1. Manually add historical cases using the insert_case() method")
-        print("  2. Add Flink documentation using the insert_doc() method")
+        print("  1. Manually add historical cases using insert_case() / insert_cases()")
+        print("  2. Add Flink documentation using insert_doc() / insert_docs()")
         print("  3. Let the agent auto-accumulate high-confidence diagnoses")
 
         milvus_service.close()
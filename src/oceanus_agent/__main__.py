@@ -1,36 +1,12 @@
 """Application entry point for the Oceanus Diagnosis Agent."""
 
-import logging
-import sys
-
 import structlog
 import uvicorn
 
+from oceanus_agent.config.logging_setup import configure_logging
 from oceanus_agent.config.settings import settings
 
-# Configure basic logging first
-logging.basicConfig(
-    format="%(message)s",
-    stream=sys.stdout,
-    level=logging.INFO,
-)
-
-# Configure structured logging
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.JSONRenderer(),
-    ],
-    wrapper_class=structlog.stdlib.BoundLogger,
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    cache_logger_on_first_use=True,
-)
+configure_logging(settings.app.log_level)
 
 logger = structlog.get_logger()
 
@@ -45,6 +21,11 @@ def main() -> None:
         port=8000,
         reload=settings.app.debug,
         log_level=settings.app.log_level.lower(),
+        # Both ship with uvicorn[standard]; request them explicitly so a failed
+        # auto-detect can't silently fall back to asyncio/h11.
+        loop="uvloop",
+        http="httptools",
+        workers=settings.app.workers,
     )
 
 
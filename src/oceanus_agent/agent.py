@@ -1,83 +1,174 @@
 import asyncio
-from datetime import datetime
+import time
+from datetime import UTC, datetime
 
 import structlog
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 
 from oceanus_agent.config.settings import Settings, settings
-from oceanus_agent.models.state import DiagnosisStatus
+from oceanus_agent.models.state import DiagnosisState, DiagnosisStatus
 from oceanus_agent.workflow.graph import DiagnosisWorkflow
 
 logger = structlog.get_logger()
 
 
+def next_run_time(
+    last_run: float, now: float, interval: float, max_catchup: int
+) -> tuple[float, int]:
+    """Compute the next fixed-rate tick after a batch finishes.
+
+    A batch that overruns its interval is followed immediately by the next
+    run, plus up to max_catchup further missed ticks; older ones are skipped.
+
+    Args:
+        last_run: Scheduled time of the batch that just finished.
+        now: Current monotonic time.
+        interval: Interval between ticks in seconds.
+        max_catchup: Extra missed ticks to run back to back.
+
+    Returns:
+        Tuple of (next scheduled time, number of skipped ticks).
+    """
+    next_run = last_run + interval
+    if interval <= 0 or now <= next_run:
+        return next_run, 0
+
+    overdue = int((now - next_run) // interval)
+    skipped = max(0, overdue - max_catchup)
+    return next_run + skipped * interval, skipped
+
+
 class DiagnosisAgent:
     """Main diagnosis agent application."""
 
     def __init__(self, app_settings: Settings | None = None):
         self.settings = app_settings or settings
-        self.scheduler = AsyncIOScheduler()
         self.workflow = DiagnosisWorkflow(self.settings)
-        self.running = False
+        self._stop_event = asyncio.Event()
+        self._scheduler_task: asyncio.Task[None] | None = None
         self._batch_count = 0
 
     async def run_diagnosis_batch(self) -> None:
         """Run a batch of diagnosis tasks."""
         self._batch_count += 1
-        batch_id = (
-            f"batch_{self._batch_count}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        )
+        batch_id = f"batch_{self._batch_count}_{time.time_ns()}"
+
+        # Workflow tasks copy the current context, so every log line emitted
+        # during the batch carries batch_id without passing it around.
+        with structlog.contextvars.bound_contextvars(batch_id=batch_id):
+            await self._run_batch(batch_id)
+
+    async def _run_batch(self, batch_id: str) -> None:
+        """Run one batch of concurrent workflow iterations.
+
+        Args:
+            batch_id: Unique batch ID, used as the thread ID prefix.
+        """
+        thread_prefix = f"{batch_id}_"
+
+        # One cheap count up front: idle ticks start no workflow runs at all
+        pending = await self.workflow.count_pending()
+        if not pending:
+            logger.debug("No pending exceptions")
+            return
+
+        batch_size = min(self.settings.scheduler.batch_size, pending)
+        max_concurrency = self.settings.scheduler.max_concurrency
 
         logger.info(
             "Starting diagnosis batch",
-            batch_id=batch_id,
-            batch_size=self.settings.scheduler.batch_size,
+            started_at=datetime.now(UTC).isoformat(timespec="seconds"),
+            pending=pending,
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+        )
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        drained = asyncio.Event()
+
+        # Collector claims rows with FOR UPDATE SKIP LOCKED, so concurrent
+        # workflow runs never pick up the same exception.
+        results = await asyncio.gather(
+            *(
+                self._run_one(thread_prefix + str(i), semaphore, drained)
+                for i in range(batch_size)
+            ),
+            return_exceptions=True,
         )
 
         processed = 0
         failed = 0
 
-        for i in range(self.settings.scheduler.batch_size):
-            try:
-                thread_id = f"{batch_id}_{i}"
-                result = await self.workflow.run(thread_id)
-
-                job_info = result.get("job_info")
-                diagnosis_result = result.get("diagnosis_result")
-
-                if not job_info:
-                    logger.info("No more pending exceptions")
-                    break
-
-                if result["status"] == DiagnosisStatus.COMPLETED:
-                    processed += 1
-                    logger.info(
-                        "Diagnosis completed",
-                        job_id=job_info["job_id"],
-                        confidence=diagnosis_result["confidence"]
-                        if diagnosis_result
-                        else None,
-                    )
-                else:
-                    failed += 1
-                    logger.warning(
-                        "Diagnosis failed",
-                        job_id=job_info["job_id"],
-                        error=result.get("error"),
-                    )
+        for result in results:
+            if result is None:
+                # Skipped: the queue was already drained
+                continue
 
-            except Exception as e:
+            if isinstance(result, BaseException):
+                failed += 1
+                logger.error(
+                    "Error in diagnosis batch",
+                    error=str(result),
+                    exc_info=result,
+                )
+                continue
+
+            job_info = result.get("job_info")
+            diagnosis_result = result.get("diagnosis_result")
+
+            if not job_info:
+                continue
+
+            if result["status"] == DiagnosisStatus.COMPLETED:
+                processed += 1
+                logger.info(
+                    "Diagnosis completed",
+                    job_id=job_info["job_id"],
+                    confidence=diagnosis_result["confidence"]
+                    if diagnosis_result
+                    else None,
+                )
+            else:
                 failed += 1
-                logger.exception("Error in diagnosis batch", error=str(e))
+                logger.warning(
+                    "Diagnosis failed",
+                    job_id=job_info["job_id"],
+                    error=result.get("error"),
+                )
+
+        if drained.is_set():
+            logger.info("No more pending exceptions")
 
         logger.info(
             "Diagnosis batch completed",
-            batch_id=batch_id,
             processed=processed,
             failed=failed,
         )
 
+    async def _run_one(
+        self,
+        thread_id: str,
+        semaphore: asyncio.Semaphore,
+        drained: asyncio.Event,
+    ) -> DiagnosisState | None:
+        """Run one workflow iteration within the batch concurrency limit.
+
+        Args:
+            thread_id: Unique thread ID for checkpointing.
+            semaphore: Semaphore bounding concurrent workflow runs.
+            drained: Set once any run finds no pending exception.
+
+        Returns:
+            Final workflow state, or None if skipped because the queue is empty.
+        """
+        async with semaphore:
+            if drained.is_set():
+                return None
+
+            result = await self.workflow.run(thread_id)
+            if not result.get("job_info"):
+                drained.set()
+            return result
+
     async def start(self) -> None:
         """Start the diagnosis agent standalone."""
         logger.info(
@@ -87,32 +178,83 @@ class DiagnosisAgent:
             batch_size=self.settings.scheduler.batch_size,
         )
 
-        self.running = True
+        if self.scheduler_running:
+            raise RuntimeError("Diagnosis scheduler is already running")
+
+        # Run immediately on start, then every interval until stop() is called.
+        # The loop is the tracked scheduler task, so start_scheduler() won't
+        # launch a second one and stop() waits for an in-flight batch.
+        await self.start_scheduler()
+        if self._scheduler_task is not None:
+            await self._scheduler_task
+
+    @property
+    def scheduler_running(self) -> bool:
+        """Whether the batch loop (from start() or start_scheduler()) is active."""
+        return self._scheduler_task is not None and not self._scheduler_task.done()
+
+    async def start_scheduler(self) -> None:
+        """Start periodic diagnosis batches in the background.
 
-        # Configure scheduled job
-        self.scheduler.add_job(
-            self.run_diagnosis_batch,
-            trigger=IntervalTrigger(seconds=self.settings.scheduler.interval_seconds),
-            id="diagnosis_batch",
-            name="Run Diagnosis Batch",
-            replace_existing=True,
+        Unlike start(), returns immediately; used by the API lifespan. Calling
+        it again while the loop is running is a no-op, so batches are never
+        driven by two loops at once.
+        """
+        if self.scheduler_running:
+            logger.warning("Diagnosis scheduler already running")
+            return
+
+        logger.info(
+            "Starting diagnosis scheduler",
+            interval_seconds=self.settings.scheduler.interval_seconds,
+            batch_size=self.settings.scheduler.batch_size,
         )
 
-        self.scheduler.start()
+        self._stop_event.clear()
+        self._scheduler_task = asyncio.create_task(self._run_periodically())
+
+    async def _run_periodically(self) -> None:
+        """Run diagnosis batches at a fixed rate until stopped.
 
-        # Run immediately on start
-        await self.run_diagnosis_batch()
+        Ticks are scheduled on the monotonic clock from the first run, so the
+        time spent in a batch does not push later ticks back.
+        """
+        loop = asyncio.get_running_loop()
+        interval = self.settings.scheduler.interval_seconds
+        max_catchup = self.settings.scheduler.max_catchup
+        next_run = loop.time()
 
-        # Keep running
-        while self.running:
-            await asyncio.sleep(1)
+        while not self._stop_event.is_set():
+            try:
+                await self.run_diagnosis_batch()
+            except Exception as e:
+                logger.exception("Error in scheduled diagnosis batch", error=str(e))
+
+            now = loop.time()
+            next_run, skipped = next_run_time(next_run, now, interval, max_catchup)
+            if skipped:
+                logger.warning(
+                    "Diagnosis batch overran its interval", skipped_runs=skipped
+                )
+
+            # Sleeps until the next tick, but wakes immediately on stop()
+            try:
+                await asyncio.wait_for(
+                    self._stop_event.wait(), timeout=max(0.0, next_run - now)
+                )
+            except TimeoutError:
+                pass
 
     async def stop(self) -> None:
         """Stop the diagnosis agent."""
         logger.info("Stopping Oceanus Diagnosis Agent")
-        self.running = False
+        self._stop_event.set()
 
-        if self.scheduler.running:
-            self.scheduler.shutdown(wait=False)
+        # Let an in-flight batch finish before closing the workflow. When
+        # called from within a batch, the loop exits once that batch returns.
+        task = self._scheduler_task
+        if task is not None and task is not asyncio.current_task():
+            await task
+            self._scheduler_task = None
 
         await self.workflow.close()
@@ -1,17 +1,20 @@
+import asyncio
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
 import structlog
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 from fastapi import FastAPI
 
 from oceanus_agent.agent import DiagnosisAgent
 from oceanus_agent.api.routes import router
+from oceanus_agent.config.logging_setup import configure_logging
 from oceanus_agent.config.settings import settings
 
 logger = structlog.get_logger()
 
+# Upper bound on warming up connections at startup
+PREWARM_TIMEOUT_SECONDS = 10
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
@@ -23,40 +26,34 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     agent = DiagnosisAgent(settings)
     app.state.agent = agent
 
-    # Start the scheduler attached to the agent
-    # We duplicate the start logic from Agent.start() but integrated into FastAPI
-    # Or simpler: just call agent.start() as a background task?
-    # agent.start() blocks with a while loop, so we can't await it directly in lifespan.
-    # We should extract the scheduler part.
-
-    # Let's modify the agent usage slightly.
-    # We'll just start the scheduler here.
-
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(
-        agent.run_diagnosis_batch,
-        trigger=IntervalTrigger(seconds=settings.scheduler.interval_seconds),
-        id="diagnosis_batch",
-        name="Run Diagnosis Batch",
-        replace_existing=True,
-    )
-    scheduler.start()
-    app.state.scheduler = scheduler
+    # Request handlers share the workflow's MySQL service (connection pool)
+    app.state.mysql_service = agent.workflow.mysql_service
 
-    # Run one batch immediately
-    # asyncio.create_task(agent.run_diagnosis_batch())
+    # Establish DB/vector store connections before serving probes and batches;
+    # a slow dependency only delays startup by the timeout.
+    try:
+        await asyncio.wait_for(
+            agent.workflow.prewarm(), timeout=PREWARM_TIMEOUT_SECONDS
+        )
+    except Exception as e:
+        logger.warning("Failed to prewarm service connections", error=str(e))
+
+    # The agent owns the periodic batch loop
+    await agent.start_scheduler()
 
     yield
 
     # Shutdown
     logger.info("Shutting down Oceanus Agent API")
-    if scheduler.running:
-        scheduler.shutdown(wait=False)
-    await agent.workflow.close()
+    await agent.stop()
 
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
+    # No-op when already configured by the CLI entry point; needed when the
+    # app is imported directly (e.g. by uvicorn's reload worker).
+    configure_logging(settings.app.log_level)
+
     app = FastAPI(
         title="Oceanus Diagnosis Agent",
         description="Automated Flink Job Exception Diagnosis",
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated, cast
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel
 
 from oceanus_agent.config.settings import settings
@@ -23,16 +25,18 @@ async def health_check() -> HealthResponse:
     )
 
 
+def get_mysql_service(request: Request) -> MySQLService:
+    """Get the shared MySQL service created at application startup."""
+    return cast(MySQLService, request.app.state.mysql_service)
+
+
 @router.get("/ready")
-async def readiness_check() -> dict[str, str]:
+async def readiness_check(
+    mysql_service: Annotated[MySQLService, Depends(get_mysql_service)],
+) -> dict[str, str]:
     """Readiness check (database connectivity)."""
     try:
-        service = MySQLService(settings.mysql)
-        # Just check if we can connect
-        async with service.async_session() as session:
-            from sqlalchemy import text
-
-            await session.execute(text("SELECT 1"))
+        await mysql_service.ping()
         return {"status": "ready"}
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,54 @@
+"""Structured logging configuration shared by all entry points."""
+
+import logging
+import sys
+from typing import Any
+
+import orjson
+import structlog
+
+_configured = False
+
+
+def _orjson_dumps(obj: Any, default: Any = None, **_: Any) -> str:
+    """Serialize log events with orjson for structlog's JSONRenderer."""
+    return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def configure_logging(level: str = "INFO") -> None:
+    """Configure stdlib logging and structlog once per process.
+
+    Args:
+        level: Root log level name (e.g. "INFO", "DEBUG").
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    log_level = getattr(logging, level.upper(), logging.INFO)
+
+    # Configure basic logging first
+    logging.basicConfig(
+        format="%(message)s",
+        stream=sys.stdout,
+        level=log_level,
+    )
+
+    # Configure structured logging
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(serializer=_orjson_dumps),
+        ],
+        # Calls below the level return immediately, before any processor runs
+        wrapper_class=structlog.make_filtering_bound_logger(log_level),
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
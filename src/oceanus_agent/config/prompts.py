@@ -26,6 +26,14 @@ DIAGNOSIS_SYSTEM_PROMPT = """You are a professional Apache Flink job diagnosis e
 
 Please respond in the same language as the error message (Chinese if error is in Chinese, English if in English)."""
 
+CLASSIFY_AND_DIAGNOSE_SYSTEM_PROMPT = (
+    DIAGNOSIS_SYSTEM_PROMPT
+    + """
+
+The error type is not known yet, so also classify it:
+- error_type: one of checkpoint_failure, backpressure, deserialization_error, oom, network, other"""
+)
+
 DIAGNOSIS_USER_PROMPT = """Please diagnose the following Flink job exception:
 
 ## Job Information
@@ -1,5 +1,8 @@
 """Application settings using Pydantic Settings."""
 
+from functools import cached_property, lru_cache
+from typing import Literal
+
 from dotenv import load_dotenv
 from pydantic import Field, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -17,13 +20,20 @@ class MySQLSettings(BaseSettings):
     user: str = "root"
     password: SecretStr = SecretStr("")
     database: str = "oceanus_agent"
+    # SQLAlchemy async driver: aiomysql (pure Python) or asyncmy (Cython)
+    driver: Literal["aiomysql", "asyncmy"] = "aiomysql"
+
+    # Connection pool; size should cover scheduler.max_concurrency
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_recycle_seconds: int = 1800
 
-    @property
+    @cached_property
     def url(self) -> str:
         """Get async MySQL connection URL."""
-        return f"mysql+aiomysql://{self.user}:{self.password.get_secret_value()}@{self.host}:{self.port}/{self.database}"
+        return f"mysql+{self.driver}://{self.user}:{self.password.get_secret_value()}@{self.host}:{self.port}/{self.database}"
 
-    @property
+    @cached_property
     def sync_url(self) -> str:
         """Get sync MySQL connection URL."""
         return f"mysql+pymysql://{self.user}:{self.password.get_secret_value()}@{self.host}:{self.port}/{self.database}"
@@ -41,16 +51,26 @@ class MilvusSettings(BaseSettings):
     # Collection names
     cases_collection: str = "flink_cases"
     docs_collection: str = "flink_docs"
+    diagnosis_cache_collection: str = "flink_diagnosis_cache"
 
     # Vector dimension (OpenAI text-embedding-3-small)
     vector_dim: int = 1536
 
-    @property
+    # Vector field type for newly created collections; must match existing ones
+    vector_type: Literal["FLOAT_VECTOR", "FLOAT16_VECTOR"] = "FLOAT_VECTOR"
+
+    # Vector index for newly created collections; must match existing ones
+    index_type: Literal["HNSW", "IVF_FLAT", "IVF_SQ8"] = "HNSW"
+
+    # Threads for blocking pymilvus calls
+    executor_workers: int = 8
+
+    @cached_property
     def uri(self) -> str:
         """Get Milvus connection URI."""
         return f"http://{self.host}:{self.port}"
 
-    @property
+    @cached_property
     def token_value(self) -> str | None:
         """Get token actual value."""
         return self.token.get_secret_value() if self.token else None
@@ -71,6 +91,16 @@ class OpenAISettings(BaseSettings):
     max_tokens: int = 2000
     timeout: int = 60
 
+    # Embeddings kept in memory for repeated texts (0 disables the cache)
+    embedding_cache_size: int = 1024
+    # Concurrent embedding requests within this window share one API call
+    # (0 sends each request on its own)
+    embedding_batch_window_ms: int = 20
+    embedding_max_batch: int = 64
+
+    # Error classifications kept in memory for repeated messages (0 disables)
+    classify_cache_size: int = 2048
+
 
 class LangSmithSettings(BaseSettings):
     """LangSmith tracing configuration."""
@@ -92,6 +122,19 @@ class SchedulerSettings(BaseSettings):
 
     interval_seconds: int = 60
     batch_size: int = 10
+    max_concurrency: int = 4
+    # Extra missed ticks to run back to back after a slow batch
+    max_catchup: int = 0
+
+
+class WorkflowSettings(BaseSettings):
+    """Workflow graph configuration."""
+
+    model_config = SettingsConfigDict(env_prefix="WORKFLOW_")
+
+    # Each run is one-shot and persists its result to MySQL, so per-step
+    # checkpoints are only useful for debugging ("memory")
+    checkpointer: Literal["none", "memory"] = "none"
 
 
 class KnowledgeSettings(BaseSettings):
@@ -102,6 +145,30 @@ class KnowledgeSettings(BaseSettings):
     confidence_threshold: float = 0.8
     max_similar_cases: int = 3
     max_doc_snippets: int = 3
+    # Max wait for the query embedding before falling back to cases matched
+    # by error type alone (0 waits indefinitely)
+    embedding_timeout_ms: int = 0
+    # Retrieved context kept per error signature, so repeats of the same
+    # error skip the embedding and Milvus searches (0 disables the cache)
+    retrieval_cache_size: int = 1024
+    retrieval_cache_ttl_seconds: int = 600
+
+    # Accumulated cases are buffered and written in batches of this size, or
+    # after flush_seconds, whichever comes first (1 writes immediately)
+    accumulate_batch_size: int = 16
+    accumulate_flush_seconds: float = 5.0
+    # Store accumulated cases under the retriever's query embedding instead
+    # of embedding the full case text again
+    reuse_query_embedding: bool = False
+
+    # Cache of confident diagnoses keyed by normalized error signature
+    diagnosis_cache_size: int = 1024
+    diagnosis_cache_ttl_seconds: int = 3600
+
+    # Milvus-backed cache of diagnoses for semantically similar errors
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.92
+    semantic_cache_ttl_seconds: int = 7 * 24 * 3600
 
 
 class AppSettings(BaseSettings):
@@ -112,6 +179,7 @@ class AppSettings(BaseSettings):
     env: str = "development"
     debug: bool = False
     log_level: str = "INFO"
+    workers: int = 1
 
 
 class Settings(BaseSettings):
@@ -127,8 +195,19 @@ class Settings(BaseSettings):
     openai: OpenAISettings = Field(default_factory=OpenAISettings)
     langsmith: LangSmithSettings = Field(default_factory=LangSmithSettings)
     scheduler: SchedulerSettings = Field(default_factory=SchedulerSettings)
+    workflow: WorkflowSettings = Field(default_factory=WorkflowSettings)
     knowledge: KnowledgeSettings = Field(default_factory=KnowledgeSettings)
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the process-wide settings, parsing the environment only once.
+
+    Returns:
+        Cached global settings instance.
+    """
+    return Settings()
+
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
@@ -2,7 +2,7 @@
 
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Priority(str, Enum):
@@ -13,12 +13,29 @@ class Priority(str, Enum):
     LOW = "low"
 
 
+class ErrorType(str, Enum):
+    """Type of a Flink job error."""
+
+    CHECKPOINT_FAILURE = "checkpoint_failure"
+    BACKPRESSURE = "backpressure"
+    DESERIALIZATION_ERROR = "deserialization_error"
+    OOM = "oom"
+    NETWORK = "network"
+    OTHER = "other"
+
+
 class DiagnosisOutput(BaseModel):
     """Structured output from the LLM diagnosis.
 
     This model is used for structured output parsing from the LLM.
     """
 
+    # OpenAI strict mode: no extra properties, and every property required
+    # in the serialization schema, defaulted ones included
+    model_config = ConfigDict(
+        extra="forbid", json_schema_serialization_defaults_required=True
+    )
+
     root_cause: str = Field(
         description="Brief description of the root cause (1-2 sentences)"
     )
@@ -37,6 +54,16 @@ class DiagnosisOutput(BaseModel):
     )
 
 
+class ClassifiedDiagnosisOutput(DiagnosisOutput):
+    """Diagnosis output that also classifies the error type.
+
+    Used when the error type is not known yet, to classify and diagnose in a
+    single LLM call.
+    """
+
+    error_type: ErrorType = Field(description="Type of the error")
+
+
 class ErrorClassification(BaseModel):
     """Classification of error type."""
 
@@ -76,6 +76,7 @@ class DiagnosisState(TypedDict):
     job_info: JobInfo | None
     status: DiagnosisStatus
     retrieved_context: RetrievedContext | None
+    query_vector: list[float] | None
     diagnosis_result: DiagnosisResult | None
     start_time: str
     end_time: str | None
@@ -1,14 +1,21 @@
 """LLM service for diagnosis using OpenAI."""
 
-import json
-from typing import cast
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Final, cast
 
+import orjson
 import structlog
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAioHttpClient
+from openai.types.shared_params import ResponseFormatJSONSchema
+from pydantic import BaseModel
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from oceanus_agent.config.prompts import (
     CASE_TEMPLATE,
+    CLASSIFY_AND_DIAGNOSE_SYSTEM_PROMPT,
     CONTEXT_TEMPLATE,
     DIAGNOSIS_SYSTEM_PROMPT,
     DIAGNOSIS_USER_PROMPT,
@@ -16,7 +23,7 @@ from oceanus_agent.config.prompts import (
     ERROR_CLASSIFICATION_PROMPT,
 )
 from oceanus_agent.config.settings import OpenAISettings
-from oceanus_agent.models.diagnosis import DiagnosisOutput
+from oceanus_agent.models.diagnosis import ClassifiedDiagnosisOutput, DiagnosisOutput
 from oceanus_agent.models.state import (
     DiagnosisResult,
     JobInfo,
@@ -25,6 +32,70 @@ from oceanus_agent.models.state import (
 
 logger = structlog.get_logger()
 
+# Batch API endpoint for diagnosis requests
+BATCH_ENDPOINT: Final = "/v1/chat/completions"
+
+
+def strict_json_schema(model: type[BaseModel]) -> dict[str, Any]:
+    """Build an OpenAI strict-mode JSON schema for a structured output model.
+
+    The model's serialization schema already forbids extra properties and
+    requires every field; strict mode also rejects keywords next to a $ref,
+    so referenced enums are inlined into the properties using them.
+    """
+    schema = model.model_json_schema(mode="serialization")
+    defs = schema.get("$defs", {})
+    for name, prop in schema["properties"].items():
+        ref = prop.get("$ref")
+        if ref is not None and len(prop) > 1:
+            del prop["$ref"]
+            schema["properties"][name] = {**defs[ref.rsplit("/", 1)[-1]], **prop}
+    return schema
+
+
+# Structured output schema, built once: beta.chat.completions.parse()
+# regenerates it from the model on every request.
+DIAGNOSIS_RESPONSE_FORMAT: ResponseFormatJSONSchema = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": DiagnosisOutput.__name__,
+        "schema": strict_json_schema(DiagnosisOutput),
+        "strict": True,
+    },
+}
+CLASSIFIED_DIAGNOSIS_RESPONSE_FORMAT: ResponseFormatJSONSchema = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": ClassifiedDiagnosisOutput.__name__,
+        "schema": strict_json_schema(ClassifiedDiagnosisOutput),
+        "strict": True,
+    },
+}
+
+VALID_ERROR_TYPES: Final = frozenset(
+    {
+        "checkpoint_failure",
+        "backpressure",
+        "deserialization_error",
+        "oom",
+        "network",
+        "other",
+    }
+)
+
+# Exception classes that identify the error type without asking the LLM,
+# checked in order
+ERROR_TYPE_PATTERNS: Final = (
+    (re.compile(r"\bOutOfMemoryError\b"), "oom"),
+    (re.compile(r"\bCheckpointException\b"), "checkpoint_failure"),
+    (
+        re.compile(
+            r"\b(?:ConnectException|UnknownHostException|NoRouteToHostException)\b"
+        ),
+        "network",
+    ),
+)
+
 
 class LLMService:
     """Service for LLM-based diagnosis."""
@@ -35,29 +106,134 @@ class LLMService:
             api_key=settings.api_key.get_secret_value(),
             base_url=settings.base_url,
             timeout=settings.timeout,
+            # aiohttp transport: httpx's connection pool serializes under
+            # many concurrent requests on one client.
+            http_client=DefaultAioHttpClient(),
         )
+        # Exact-match LRU of embeddings keyed by sha256(model + text)
+        self._embedding_cache: OrderedDict[bytes, list[float]] = OrderedDict()
+        # Embedding requests waiting to be sent together in one API call
+        self._pending_embeddings: list[tuple[str, asyncio.Future[list[float]]]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._embedding_tasks: set[asyncio.Task[None]] = set()
+        # LRU of error types keyed by blake2b(error message)
+        self._classify_cache: OrderedDict[bytes, str] = OrderedDict()
 
-    @retry(
-        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     async def generate_embedding(self, text: str) -> list[float]:
         """Generate embedding for text.
 
+        Identical texts are served from an in-memory LRU cache.
+
         Args:
             text: Text to embed.
 
         Returns:
             Embedding vector.
         """
-        response = await self.client.embeddings.create(
-            model=self.settings.embedding_model,
-            input=text[:8000],  # Truncate to avoid token limit
-        )
-        return cast(list[float], response.data[0].embedding)
+        text = text[:8000]  # Truncate to avoid token limit
+        key = hashlib.sha256(
+            f"{self.settings.embedding_model}\0{text}".encode()
+        ).digest()
+
+        cached = self._embedding_cache.get(key)
+        if cached is not None:
+            self._embedding_cache.move_to_end(key)
+            return cached
+
+        embedding = await self._embed_batched(text)
+
+        if self.settings.embedding_cache_size > 0:
+            self._embedding_cache[key] = embedding
+            if len(self._embedding_cache) > self.settings.embedding_cache_size:
+                self._embedding_cache.popitem(last=False)
+
+        return embedding
+
+    async def _embed_batched(self, text: str) -> list[float]:
+        """Queue a text for the next batched embeddings request.
+
+        Requests arriving within the batch window share one API call; a full
+        batch is sent right away.
+
+        Args:
+            text: Text to embed, already truncated.
+
+        Returns:
+            Embedding vector.
+        """
+        window_ms = self.settings.embedding_batch_window_ms
+        if window_ms <= 0:
+            return (await self._create_embeddings([text]))[0]
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[list[float]] = loop.create_future()
+        self._pending_embeddings.append((text, future))
+
+        if len(self._pending_embeddings) >= self.settings.embedding_max_batch:
+            self._flush_embeddings()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                window_ms / 1000, self._flush_embeddings
+            )
+
+        return await future
+
+    def _flush_embeddings(self) -> None:
+        """Send all queued embedding requests as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending_embeddings = self._pending_embeddings, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send_embedding_batch(batch))
+        self._embedding_tasks.add(task)
+        task.add_done_callback(self._embedding_tasks.discard)
+
+    async def _send_embedding_batch(
+        self, batch: list[tuple[str, asyncio.Future[list[float]]]]
+    ) -> None:
+        """Request embeddings for a batch and resolve its waiters.
+
+        Args:
+            batch: Queued (text, future) pairs.
+        """
+        # Identical texts from concurrent runs are sent once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            embeddings = await self._create_embeddings(texts)
+        except Exception as e:
+            # Every waiter sees the failure, so callers' own retries apply
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, embeddings, strict=True))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
 
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10)
     )
+    async def _create_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Request embeddings for several texts in one API call.
+
+        Args:
+            texts: Texts to embed, already truncated.
+
+        Returns:
+            Embedding vectors in input order.
+        """
+        response = await self.client.embeddings.create(
+            model=self.settings.embedding_model,
+            input=texts,
+        )
+        return [cast(list[float], item.embedding) for item in response.data]
+
     async def generate_diagnosis(
         self, job_info: JobInfo, context: RetrievedContext | None = None
     ) -> DiagnosisResult:
@@ -70,46 +246,158 @@ class LLMService:
         Returns:
             Diagnosis result.
         """
-        # Build context string
-        context_str = self._build_context_string(context)
+        logger.debug(
+            "Generating diagnosis",
+            job_id=job_info["job_id"],
+            context_cases=len(context["similar_cases"]) if context else 0,
+            context_docs=len(context["doc_snippets"]) if context else 0,
+        )
+
+        # Prompt is formatted once; retries only repeat the API call
+        request = self._build_diagnosis_request(job_info, context)
+        result = await self._complete_diagnosis(request)
+
+        logger.info(
+            "Generated diagnosis",
+            job_id=job_info["job_id"],
+            confidence=result["confidence"],
+            priority=result["priority"],
+        )
+
+        return result
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def _complete_diagnosis(self, request: dict[str, Any]) -> DiagnosisResult:
+        """Send a prebuilt diagnosis request and parse the completion.
+
+        Args:
+            request: Body from _build_diagnosis_request().
+
+        Returns:
+            Diagnosis result.
+        """
+        response = await self.client.chat.completions.create(**request)
+        return self._parse_diagnosis(response.choices[0].message.content)
+
+    async def classify_and_diagnose(
+        self, job_info: JobInfo, context: RetrievedContext | None = None
+    ) -> tuple[str, DiagnosisResult]:
+        """Classify and diagnose a job exception in a single LLM call.
+
+        Saves the separate classify_error() round trip when the error type is
+        not known yet.
+
+        Args:
+            job_info: Information about the job exception.
+            context: Retrieved context from knowledge base.
+
+        Returns:
+            Error type and diagnosis result.
+        """
+        request = self._build_diagnosis_request(job_info, context, classify=True)
+        error_type, result = await self._complete_classified_diagnosis(request)
+
+        logger.info(
+            "Generated diagnosis",
+            job_id=job_info["job_id"],
+            error_type=error_type,
+            confidence=result["confidence"],
+            priority=result["priority"],
+        )
+
+        return error_type, result
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def _complete_classified_diagnosis(
+        self, request: dict[str, Any]
+    ) -> tuple[str, DiagnosisResult]:
+        """Send a prebuilt classify-and-diagnose request and parse it.
+
+        Args:
+            request: Body from _build_diagnosis_request(classify=True).
+
+        Returns:
+            Error type and diagnosis result.
+        """
+        response = await self.client.chat.completions.create(**request)
+        content = response.choices[0].message.content
+        if not content:
+            raise ValueError("Failed to parse LLM response")
+
+        parsed = ClassifiedDiagnosisOutput.model_validate_json(content)
+        return parsed.error_type.value, self._to_diagnosis_result(parsed)
+
+    def _build_diagnosis_request(
+        self,
+        job_info: JobInfo,
+        context: RetrievedContext | None,
+        *,
+        classify: bool = False,
+    ) -> dict[str, Any]:
+        """Build the chat completion request body for a diagnosis.
+
+        Args:
+            job_info: Information about the job exception.
+            context: Retrieved context from knowledge base.
+            classify: Also ask the model for the error type.
 
-        # Build user prompt
+        Returns:
+            Request body, usable both as create() kwargs and in a batch file.
+        """
         user_prompt = DIAGNOSIS_USER_PROMPT.format(
             job_id=job_info["job_id"],
             job_name=job_info.get("job_name") or "Unknown",
             job_type=job_info.get("job_type") or "Unknown",
             error_type=job_info.get("error_type") or "Unknown",
             error_message=job_info["error_message"][:4000],
-            job_config=json.dumps(
-                job_info.get("job_config") or {}, indent=2, ensure_ascii=False
-            )[:2000],
-            context=context_str,
-        )
-
-        logger.debug(
-            "Generating diagnosis",
-            job_id=job_info["job_id"],
-            context_cases=len(context["similar_cases"]) if context else 0,
-            context_docs=len(context["doc_snippets"]) if context else 0,
+            job_config=orjson.dumps(
+                job_info.get("job_config") or {},
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+            ).decode()[:2000],
+            context=self._build_context_string(context),
         )
 
-        response = await self.client.beta.chat.completions.parse(
-            model=self.settings.model,
-            messages=[
-                {"role": "system", "content": DIAGNOSIS_SYSTEM_PROMPT},
+        return {
+            "model": self.settings.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": CLASSIFY_AND_DIAGNOSE_SYSTEM_PROMPT
+                    if classify
+                    else DIAGNOSIS_SYSTEM_PROMPT,
+                },
                 {"role": "user", "content": user_prompt},
             ],
-            temperature=self.settings.temperature,
-            max_tokens=self.settings.max_tokens,
-            response_format=DiagnosisOutput,
-        )
+            "temperature": self.settings.temperature,
+            "max_tokens": self.settings.max_tokens,
+            "response_format": CLASSIFIED_DIAGNOSIS_RESPONSE_FORMAT
+            if classify
+            else DIAGNOSIS_RESPONSE_FORMAT,
+        }
+
+    def _parse_diagnosis(self, content: str | None) -> DiagnosisResult:
+        """Parse structured diagnosis output from a completion message.
 
-        parsed = response.choices[0].message.parsed
+        Args:
+            content: Message content returned by the model.
 
-        if not parsed:
+        Returns:
+            Diagnosis result.
+        """
+        if not content:
             raise ValueError("Failed to parse LLM response")
 
-        result: DiagnosisResult = {
+        # Validates straight from the JSON text, without an intermediate dict
+        return self._to_diagnosis_result(DiagnosisOutput.model_validate_json(content))
+
+    @staticmethod
+    def _to_diagnosis_result(parsed: DiagnosisOutput) -> DiagnosisResult:
+        """Convert validated model output to a DiagnosisResult."""
+        return {
             "root_cause": parsed.root_cause,
             "detailed_analysis": parsed.detailed_analysis,
             "suggested_fix": parsed.suggested_fix,
@@ -118,28 +406,163 @@ class LLMService:
             "related_docs": parsed.related_docs,
         }
 
-        logger.info(
-            "Generated diagnosis",
-            job_id=job_info["job_id"],
-            confidence=result["confidence"],
-            priority=result["priority"],
+    async def submit_diagnosis_batch(self, job_infos: list[JobInfo]) -> str:
+        """Submit diagnoses to the OpenAI Batch API for offline processing.
+
+        Batch requests cost less and have separate rate limits, at the price
+        of up to 24h turnaround. Results are keyed by exception_id.
+
+        Args:
+            job_infos: Job exceptions to diagnose.
+
+        Returns:
+            ID of the created batch.
+        """
+        lines = (
+            orjson.dumps(
+                {
+                    "custom_id": str(job_info["exception_id"]),
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": self._build_diagnosis_request(job_info, None),
+                }
+            )
+            for job_info in job_infos
         )
 
-        return result
+        input_file = await self.client.files.create(
+            file=("diagnosis_batch.jsonl", b"\n".join(lines)), purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        )
+
+        logger.info("Submitted diagnosis batch", batch_id=batch.id, size=len(job_infos))
+        return batch.id
+
+    async def await_diagnosis_batch(
+        self,
+        batch_id: str,
+        poll_interval: float = 30.0,
+        max_poll_interval: float = 600.0,
+    ) -> dict[str, DiagnosisResult]:
+        """Wait for a diagnosis batch to finish and collect its results.
+
+        Args:
+            batch_id: ID returned by submit_diagnosis_batch().
+            poll_interval: Initial delay between status checks in seconds.
+            max_poll_interval: Upper bound for the backed-off delay.
+
+        Returns:
+            Diagnosis results keyed by exception_id; failed requests are
+            left out.
+        """
+        while True:
+            batch = await self.client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise RuntimeError(f"Diagnosis batch {batch_id} {batch.status}")
+
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+
+        if not batch.output_file_id:
+            return {}
+
+        output = await self.client.files.content(batch.output_file_id)
+
+        results: dict[str, DiagnosisResult] = {}
+        for line in output.read().splitlines():
+            if not line:
+                continue
+            item = orjson.loads(line)
+            try:
+                body = item["response"]["body"]
+                results[item["custom_id"]] = self._parse_diagnosis(
+                    body["choices"][0]["message"]["content"]
+                )
+            except Exception as e:
+                logger.warning(
+                    "Failed diagnosis in batch",
+                    batch_id=batch_id,
+                    custom_id=item.get("custom_id"),
+                    error=str(item.get("error") or e),
+                )
+
+        return results
+
+    async def get_diagnosis_batch_exception_ids(self, batch_id: str) -> list[int]:
+        """Read the exception IDs submitted in a diagnosis batch.
+
+        The batch's input file is the record of which exceptions were
+        claimed, so a resumed batch can account for requests that never
+        produced a result.
+
+        Args:
+            batch_id: ID returned by submit_diagnosis_batch().
+
+        Returns:
+            Exception IDs in submission order.
+        """
+        batch = await self.client.batches.retrieve(batch_id)
+        content = await self.client.files.content(batch.input_file_id)
+        return [
+            int(orjson.loads(line)["custom_id"])
+            for line in content.read().splitlines()
+            if line
+        ]
 
-    @retry(
-        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     async def classify_error(self, error_message: str) -> str:
         """Classify error type from error message.
 
+        Well-known exception classes are matched locally, and repeated
+        messages are served from an in-memory LRU cache; only the rest go to
+        the LLM.
+
         Args:
             error_message: Error message to classify.
 
         Returns:
             Error type string.
         """
-        prompt = ERROR_CLASSIFICATION_PROMPT.format(error_message=error_message[:2000])
+        error_message = error_message[:2000]
+
+        for pattern, error_type in ERROR_TYPE_PATTERNS:
+            if pattern.search(error_message):
+                logger.debug("Classified error by pattern", error_type=error_type)
+                return error_type
+
+        key = hashlib.blake2b(error_message.encode(), digest_size=16).digest()
+        cached = self._classify_cache.get(key)
+        if cached is not None:
+            self._classify_cache.move_to_end(key)
+            return cached
+
+        error_type = await self._classify_with_llm(error_message)
+
+        if self.settings.classify_cache_size > 0:
+            self._classify_cache[key] = error_type
+            if len(self._classify_cache) > self.settings.classify_cache_size:
+                self._classify_cache.popitem(last=False)
+
+        return error_type
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def _classify_with_llm(self, error_message: str) -> str:
+        """Ask the LLM to classify an error message.
+
+        Args:
+            error_message: Error message, already truncated.
+
+        Returns:
+            Error type string.
+        """
+        prompt = ERROR_CLASSIFICATION_PROMPT.format(error_message=error_message)
 
         response = await self.client.chat.completions.create(
             model=self.settings.model,
@@ -151,16 +574,7 @@ class LLMService:
         content = response.choices[0].message.content or "other"
         error_type = content.strip().lower()
 
-        valid_types = [
-            "checkpoint_failure",
-            "backpressure",
-            "deserialization_error",
-            "oom",
-            "network",
-            "other",
-        ]
-
-        if error_type not in valid_types:
+        if error_type not in VALID_ERROR_TYPES:
             error_type = "other"
 
         logger.debug("Classified error", error_type=error_type)
@@ -179,36 +593,33 @@ class LLMService:
         if not context:
             return "No reference context available."
 
-        cases_section = ""
-        if context.get("similar_cases"):
-            cases_parts = []
-            for i, case in enumerate(context["similar_cases"][:3], 1):
-                cases_parts.append(
-                    CASE_TEMPLATE.format(
-                        index=i,
-                        error_type=case["error_type"],
-                        error_pattern=case["error_pattern"][:500],
-                        root_cause=case["root_cause"],
-                        solution=case["solution"][:1000],
-                    )
+        # Render each section with a single join over at most 3 entries
+        similar_cases = context.get("similar_cases")
+        if similar_cases:
+            cases_section = "\n".join(
+                CASE_TEMPLATE.format(
+                    index=i,
+                    error_type=case["error_type"],
+                    error_pattern=case["error_pattern"][:500],
+                    root_cause=case["root_cause"],
+                    solution=case["solution"][:1000],
                 )
-            cases_section = "\n".join(cases_parts)
+                for i, case in enumerate(similar_cases[:3], 1)
+            )
         else:
             cases_section = "No similar historical cases found."
 
-        docs_section = ""
-        if context.get("doc_snippets"):
-            docs_parts = []
-            for i, doc in enumerate(context["doc_snippets"][:3], 1):
-                docs_parts.append(
-                    DOC_TEMPLATE.format(
-                        index=i,
-                        title=doc["title"],
-                        content=doc["content"][:1000],
-                        doc_url=doc.get("doc_url") or "N/A",
-                    )
+        doc_snippets = context.get("doc_snippets")
+        if doc_snippets:
+            docs_section = "\n".join(
+                DOC_TEMPLATE.format(
+                    index=i,
+                    title=doc["title"],
+                    content=doc["content"][:1000],
+                    doc_url=doc.get("doc_url") or "N/A",
                 )
-            docs_section = "\n".join(docs_parts)
+                for i, doc in enumerate(doc_snippets[:3], 1)
+            )
         else:
             docs_section = "No related documentation found."
 
@@ -218,4 +629,8 @@ class LLMService:
 
     async def close(self) -> None:
         """Close the client."""
+        # Send anything still queued before the client goes away
+        self._flush_embeddings()
+        await asyncio.gather(*self._embedding_tasks, return_exceptions=True)
+
         await self.client.close()
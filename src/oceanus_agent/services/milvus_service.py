@@ -1,16 +1,65 @@
 """Milvus vector database service for knowledge retrieval."""
 
+import asyncio
+import contextvars
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, TypeVar, cast
+
+import numpy as np
+import orjson
 import structlog
 from pymilvus import (
     DataType,
     MilvusClient,
 )
+from pymilvus.milvus_client import IndexParams
 
 from oceanus_agent.config.settings import MilvusSettings
-from oceanus_agent.models.state import RetrievedCase, RetrievedDoc
+from oceanus_agent.models.state import DiagnosisResult, RetrievedCase, RetrievedDoc
 
 logger = structlog.get_logger()
 
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=128)
+def eq_filter(field: str, value: str) -> str:
+    """Build a Milvus equality filter expression.
+
+    The value is emitted as an escaped string literal, so quotes in it cannot
+    alter the expression. Filter values come from small closed sets (error
+    types, doc categories), so built expressions are cached.
+
+    Args:
+        field: Scalar field name.
+        value: Value to match.
+
+    Returns:
+        Filter expression string.
+    """
+    return f"{field} == {orjson.dumps(value).decode()}"
+
+
+# Vector index build/search parameters per supported index type. HNSW gives
+# logarithmic search; IVF_SQ8 quantizes vectors to cut memory bandwidth.
+INDEX_BUILD_PARAMS: dict[str, dict[str, int]] = {
+    "HNSW": {"M": 16, "efConstruction": 200},
+    "IVF_FLAT": {"nlist": 128},
+    "IVF_SQ8": {"nlist": 128},
+}
+INDEX_SEARCH_PARAMS: dict[str, dict[str, int]] = {
+    "HNSW": {"ef": 64},
+    "IVF_FLAT": {"nprobe": 8},
+    "IVF_SQ8": {"nprobe": 8},
+}
+
+# Entities per insert request for bulk loads
+INSERT_BATCH_SIZE = 1000
+
 
 class MilvusService:
     """Service for Milvus vector database operations."""
@@ -18,6 +67,34 @@ class MilvusService:
     def __init__(self, settings: MilvusSettings):
         self.settings = settings
         self.client = None
+        self._diagnosis_cache_ready = False
+        # pymilvus is blocking; its calls run here so they neither stall the
+        # event loop nor compete with other to_thread() users
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.executor_workers, thread_name_prefix="milvus"
+        )
+
+    async def _run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """Run a blocking pymilvus call on the Milvus thread pool."""
+        loop = asyncio.get_running_loop()
+        # Carry contextvars (e.g. bound log fields) into the worker thread
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, partial(ctx.run, func, *args, **kwargs)
+        )
+
+    async def _get_client_async(self) -> MilvusClient | None:
+        """Get the client, connecting on the thread pool if needed."""
+        if self.client:
+            return self.client
+        return await self._run(self.get_client)
+
+    async def connect(self) -> None:
+        """Connect the client (creating collections if needed) ahead of use.
+
+        Runs on the Milvus thread pool like every other client call.
+        """
+        await self._get_client_async()
 
     def get_client(self) -> MilvusClient | None:
         """Get or initialize Milvus client."""
@@ -57,6 +134,42 @@ class MilvusService:
         except Exception as e:
             logger.error("Failed to ensure collections", error=str(e))
 
+    def _ensure_diagnosis_cache_collection(self, client: MilvusClient) -> None:
+        """Create the diagnosis cache collection on first use."""
+        if self._diagnosis_cache_ready:
+            return
+
+        if not client.has_collection(self.settings.diagnosis_cache_collection):
+            self._create_diagnosis_cache_collection()
+            logger.info(
+                "Created diagnosis cache collection",
+                collection=self.settings.diagnosis_cache_collection,
+            )
+        self._diagnosis_cache_ready = True
+
+    def _encode_vector(self, vector: list[float]) -> Any:
+        """Convert an embedding to the collection's vector field type.
+
+        FLOAT16_VECTOR halves vector storage and search memory bandwidth;
+        pymilvus takes such vectors as float16 numpy arrays.
+        """
+        if self.settings.vector_type == "FLOAT16_VECTOR":
+            return np.asarray(vector, dtype=np.float16)
+        return vector
+
+    def _build_index_params(self) -> IndexParams:
+        """Build vector index parameters for the configured index type."""
+        assert self.client is not None
+
+        index_params = self.client.prepare_index_params()
+        index_params.add_index(
+            field_name="vector",
+            index_type=self.settings.index_type,
+            metric_type="COSINE",
+            params=INDEX_BUILD_PARAMS[self.settings.index_type],
+        )
+        return index_params
+
     def _create_cases_collection(self) -> None:
         """Create the flink_cases collection."""
         if not self.client:
@@ -75,7 +188,7 @@ class MilvusService:
         )
         schema.add_field(
             field_name="vector",
-            datatype=DataType.FLOAT_VECTOR,
+            datatype=getattr(DataType, self.settings.vector_type),
             dim=self.settings.vector_dim,
         )
         schema.add_field(
@@ -91,13 +204,7 @@ class MilvusService:
             field_name="solution", datatype=DataType.VARCHAR, max_length=4000
         )
 
-        index_params = self.client.prepare_index_params()
-        index_params.add_index(
-            field_name="vector",
-            index_type="IVF_FLAT",
-            metric_type="COSINE",
-            params={"nlist": 128},
-        )
+        index_params = self._build_index_params()
 
         self.client.create_collection(
             collection_name=self.settings.cases_collection,
@@ -122,7 +229,7 @@ class MilvusService:
         )
         schema.add_field(
             field_name="vector",
-            datatype=DataType.FLOAT_VECTOR,
+            datatype=getattr(DataType, self.settings.vector_type),
             dim=self.settings.vector_dim,
         )
         schema.add_field(field_name="title", datatype=DataType.VARCHAR, max_length=512)
@@ -136,16 +243,45 @@ class MilvusService:
             field_name="category", datatype=DataType.VARCHAR, max_length=64
         )
 
-        index_params = self.client.prepare_index_params()
-        index_params.add_index(
+        index_params = self._build_index_params()
+
+        self.client.create_collection(
+            collection_name=self.settings.docs_collection,
+            schema=schema,
+            index_params=index_params,
+        )
+
+    def _create_diagnosis_cache_collection(self) -> None:
+        """Create the diagnosis cache collection."""
+        if not self.client:
+            return
+        # Help mypy understand self.client is not None here
+        assert self.client is not None
+
+        schema = self.client.create_schema(auto_id=False, enable_dynamic_field=False)
+
+        schema.add_field(
+            field_name="cache_id",
+            datatype=DataType.VARCHAR,
+            max_length=64,
+            is_primary=True,
+        )
+        schema.add_field(
             field_name="vector",
-            index_type="IVF_FLAT",
-            metric_type="COSINE",
-            params={"nlist": 128},
+            datatype=getattr(DataType, self.settings.vector_type),
+            dim=self.settings.vector_dim,
         )
+        schema.add_field(
+            field_name="error_type", datatype=DataType.VARCHAR, max_length=64
+        )
+        schema.add_field(field_name="result", datatype=DataType.JSON)
+        # Milvus has no row TTL; expired rows are filtered out on search
+        schema.add_field(field_name="expires_at", datatype=DataType.INT64)
+
+        index_params = self._build_index_params()
 
         self.client.create_collection(
-            collection_name=self.settings.docs_collection,
+            collection_name=self.settings.diagnosis_cache_collection,
             schema=schema,
             index_params=index_params,
         )
@@ -163,20 +299,21 @@ class MilvusService:
         Returns:
             List of similar cases.
         """
-        client = self.get_client()
+        client = await self._get_client_async()
         if not client:
             logger.warning("Milvus client not available for search")
             return []
 
-        filter_expr = ""
-        if error_type:
-            filter_expr = f'error_type == "{error_type}"'
+        filter_expr = eq_filter("error_type", error_type) if error_type else None
 
-        results = client.search(
+        # pymilvus is blocking; search off the event loop so concurrent
+        # searches (and other workflow runs) proceed in parallel
+        results = await self._run(
+            client.search,
             collection_name=self.settings.cases_collection,
-            data=[query_vector],
+            data=[self._encode_vector(query_vector)],
             limit=limit,
-            filter=filter_expr if filter_expr else None,
+            filter=filter_expr,
             output_fields=[
                 "case_id",
                 "error_type",
@@ -184,6 +321,7 @@ class MilvusService:
                 "root_cause",
                 "solution",
             ],
+            search_params={"params": INDEX_SEARCH_PARAMS[self.settings.index_type]},
             consistency_level="Strong",
         )
 
@@ -205,6 +343,52 @@ class MilvusService:
         logger.debug("Found similar cases", count=len(cases), error_type=error_type)
         return cases
 
+    async def query_cases_by_error_type(
+        self, error_type: str, limit: int = 3
+    ) -> list[RetrievedCase]:
+        """Fetch cases of an error type by metadata alone, without a vector.
+
+        Cheaper fallback for when the query embedding is not available in
+        time; results carry no similarity score.
+
+        Args:
+            error_type: Error type to match.
+            limit: Maximum number of results.
+
+        Returns:
+            List of cases.
+        """
+        client = await self._get_client_async()
+        if not client:
+            logger.warning("Milvus client not available for query")
+            return []
+
+        rows = await self._run(
+            client.query,
+            collection_name=self.settings.cases_collection,
+            filter=eq_filter("error_type", error_type),
+            output_fields=[
+                "case_id",
+                "error_type",
+                "error_pattern",
+                "root_cause",
+                "solution",
+            ],
+            limit=limit,
+        )
+
+        return [
+            RetrievedCase(
+                case_id=row.get("case_id", ""),
+                error_type=row.get("error_type", ""),
+                error_pattern=row.get("error_pattern", ""),
+                root_cause=row.get("root_cause", ""),
+                solution=row.get("solution", ""),
+                similarity_score=0.0,
+            )
+            for row in rows
+        ]
+
     async def search_doc_snippets(
         self, query_vector: list[float], category: str | None = None, limit: int = 3
     ) -> list[RetrievedDoc]:
@@ -218,21 +402,21 @@ class MilvusService:
         Returns:
             List of relevant documents.
         """
-        client = self.get_client()
+        client = await self._get_client_async()
         if not client:
             logger.warning("Milvus client not available for search")
             return []
 
-        filter_expr = ""
-        if category:
-            filter_expr = f'category == "{category}"'
+        filter_expr = eq_filter("category", category) if category else None
 
-        results = client.search(
+        results = await self._run(
+            client.search,
             collection_name=self.settings.docs_collection,
-            data=[query_vector],
+            data=[self._encode_vector(query_vector)],
             limit=limit,
-            filter=filter_expr if filter_expr else None,
+            filter=filter_expr,
             output_fields=["doc_id", "title", "content", "doc_url", "category"],
+            search_params={"params": INDEX_SEARCH_PARAMS[self.settings.index_type]},
             consistency_level="Strong",
         )
 
@@ -254,6 +438,131 @@ class MilvusService:
         logger.debug("Found doc snippets", count=len(docs), category=category)
         return docs
 
+    async def search_cached_diagnosis(
+        self, query_vector: list[float], error_type: str | None = None
+    ) -> tuple[DiagnosisResult, float] | None:
+        """Find the closest unexpired cached diagnosis.
+
+        Args:
+            query_vector: Query embedding vector.
+            error_type: Optional filter by error type.
+
+        Returns:
+            Cached diagnosis and its similarity score, or None if empty.
+        """
+        client = await self._get_client_async()
+        if not client:
+            logger.warning("Milvus client not available for search")
+            return None
+
+        await self._run(self._ensure_diagnosis_cache_collection, client)
+
+        filter_expr = f"expires_at > {int(time.time())}"
+        if error_type:
+            filter_expr += f" and {eq_filter('error_type', error_type)}"
+
+        results = await self._run(
+            client.search,
+            collection_name=self.settings.diagnosis_cache_collection,
+            data=[self._encode_vector(query_vector)],
+            limit=1,
+            filter=filter_expr,
+            output_fields=["result"],
+            search_params={"params": INDEX_SEARCH_PARAMS[self.settings.index_type]},
+        )
+
+        for hits in results:
+            for hit in hits:
+                result = hit.get("entity", {}).get("result")
+                if result:
+                    return cast(DiagnosisResult, result), hit.get("distance", 0.0)
+        return None
+
+    async def insert_cached_diagnosis(
+        self,
+        vector: list[float],
+        error_type: str | None,
+        result: DiagnosisResult,
+        ttl_seconds: int,
+    ) -> None:
+        """Store a diagnosis in the semantic diagnosis cache.
+
+        Args:
+            vector: Embedding vector of the diagnosed error.
+            error_type: Type of error.
+            result: Diagnosis to cache.
+            ttl_seconds: Seconds until the entry expires.
+        """
+        client = await self._get_client_async()
+        if not client:
+            logger.warning("Milvus client not available for insert_cached_diagnosis")
+            return
+
+        await self._run(self._ensure_diagnosis_cache_collection, client)
+
+        data = [
+            {
+                "cache_id": uuid.uuid4().hex,
+                "vector": self._encode_vector(vector),
+                "error_type": error_type or "",
+                "result": dict(result),
+                "expires_at": int(time.time()) + ttl_seconds,
+            }
+        ]
+
+        await self._insert_chunked(
+            client, self.settings.diagnosis_cache_collection, data
+        )
+
+    async def _insert_chunked(
+        self, client: MilvusClient, collection_name: str, data: list[dict[str, Any]]
+    ) -> None:
+        """Insert entities in chunks of INSERT_BATCH_SIZE, off the event loop."""
+        for start in range(0, len(data), INSERT_BATCH_SIZE):
+            await self._run(
+                client.insert,
+                collection_name=collection_name,
+                data=data[start : start + INSERT_BATCH_SIZE],
+            )
+
+    def _case_entity(
+        self,
+        case_id: str,
+        vector: list[float],
+        error_type: str,
+        error_pattern: str,
+        root_cause: str,
+        solution: str,
+    ) -> dict[str, Any]:
+        """Build a cases collection entity, capping fields to the schema."""
+        return {
+            "case_id": case_id,
+            "vector": self._encode_vector(vector),
+            "error_type": error_type,
+            "error_pattern": error_pattern[:2000],
+            "root_cause": root_cause[:2000],
+            "solution": solution[:4000],
+        }
+
+    def _doc_entity(
+        self,
+        doc_id: str,
+        vector: list[float],
+        title: str,
+        content: str,
+        doc_url: str | None = None,
+        category: str | None = None,
+    ) -> dict[str, Any]:
+        """Build a docs collection entity, capping fields to the schema."""
+        return {
+            "doc_id": doc_id,
+            "vector": self._encode_vector(vector),
+            "title": title[:512],
+            "content": content[:8000],
+            "doc_url": doc_url or "",
+            "category": category or "",
+        }
+
     async def insert_case(
         self,
         case_id: str,
@@ -273,26 +582,36 @@ class MilvusService:
             root_cause: Root cause of the error.
             solution: Solution to fix the error.
         """
-        client = self.get_client()
+        client = await self._get_client_async()
         if not client:
             logger.warning("Milvus client not available for insert_case")
             return
 
         data = [
-            {
-                "case_id": case_id,
-                "vector": vector,
-                "error_type": error_type,
-                "error_pattern": error_pattern[:2000],
-                "root_cause": root_cause[:2000],
-                "solution": solution[:4000],
-            }
+            self._case_entity(
+                case_id, vector, error_type, error_pattern, root_cause, solution
+            )
         ]
-
-        client.insert(collection_name=self.settings.cases_collection, data=data)
+        await self._insert_chunked(client, self.settings.cases_collection, data)
 
         logger.info("Inserted case to Milvus", case_id=case_id, error_type=error_type)
 
+    async def insert_cases(self, cases: list[dict[str, Any]]) -> None:
+        """Insert many cases, in as few requests as possible.
+
+        Args:
+            cases: Cases, each with the keyword arguments of insert_case().
+        """
+        client = await self._get_client_async()
+        if not client:
+            logger.warning("Milvus client not available for insert_cases")
+            return
+
+        data = [self._case_entity(**case) for case in cases]
+        await self._insert_chunked(client, self.settings.cases_collection, data)
+
+        logger.info("Inserted cases to Milvus", count=len(data))
+
     async def insert_doc(
         self,
         doc_id: str,
@@ -312,26 +631,32 @@ class MilvusService:
             doc_url: URL to original document.
             category: Document category.
         """
-        client = self.get_client()
+        client = await self._get_client_async()
         if not client:
             logger.warning("Milvus client not available for insert_doc")
             return
 
-        data = [
-            {
-                "doc_id": doc_id,
-                "vector": vector,
-                "title": title[:512],
-                "content": content[:8000],
-                "doc_url": doc_url or "",
-                "category": category or "",
-            }
-        ]
-
-        client.insert(collection_name=self.settings.docs_collection, data=data)
+        data = [self._doc_entity(doc_id, vector, title, content, doc_url, category)]
+        await self._insert_chunked(client, self.settings.docs_collection, data)
 
         logger.info("Inserted doc to Milvus", doc_id=doc_id, title=title)
 
+    async def insert_docs(self, docs: list[dict[str, Any]]) -> None:
+        """Insert many documents, in as few requests as possible.
+
+        Args:
+            docs: Documents, each with the keyword arguments of insert_doc().
+        """
+        client = await self._get_client_async()
+        if not client:
+            logger.warning("Milvus client not available for insert_docs")
+            return
+
+        data = [self._doc_entity(**doc) for doc in docs]
+        await self._insert_chunked(client, self.settings.docs_collection, data)
+
+        logger.info("Inserted docs to Milvus", count=len(data))
+
     def get_collection_stats(self) -> dict:
         """Get statistics for all collections.
 
@@ -351,21 +676,12 @@ class MilvusService:
             if client.has_collection(collection_name):
                 info = client.describe_collection(collection_name)
 
-                # Use query to get count as num_entities is not available on MilvusClient
-                primary_key = (
-                    "case_id"
-                    if collection_name == self.settings.cases_collection
-                    else "doc_id"
-                )
-                res = client.query(
-                    collection_name=collection_name,
-                    filter=f'{primary_key} != ""',
-                    output_fields=["count(*)"],
-                )
-                count = res[0]["count(*)"] if res else 0
+                # Row count from segment metadata; a count(*) query with a
+                # predicate would scan every row
+                collection_stats = client.get_collection_stats(collection_name)
 
                 stats[collection_name] = {
-                    "num_entities": count,
+                    "num_entities": collection_stats.get("row_count", 0),
                     "description": info.get("description", ""),
                 }
 
@@ -375,3 +691,4 @@ class MilvusService:
         """Close the Milvus connection."""
         if self.client:
             self.client.close()
+        self._executor.shutdown(wait=False)
@@ -1,28 +1,116 @@
 """MySQL database service for exception and knowledge case management."""
 
-import json
+import hashlib
 from datetime import datetime
+from typing import Any, cast
 
+import orjson
 import structlog
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import CursorResult, bindparam, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from oceanus_agent.config.settings import MySQLSettings
 from oceanus_agent.models.state import DiagnosisResult, JobInfo
 
 logger = structlog.get_logger()
 
+# Longest error message prefix loaded into the workflow; prompts and pattern
+# extraction read at most 4000 characters of it
+ERROR_MESSAGE_MAX_CHARS = 8192
+
+# SQL statements, built once at import instead of on every call
+PING_QUERY = text("SELECT 1")
+
+SELECT_PENDING_QUERY = text("""
+    SELECT id, job_id, job_name, job_type, job_config,
+           LEFT(error_message, :error_message_chars), error_type, created_at
+    FROM flink_job_exceptions
+    WHERE status = 'pending'
+    ORDER BY created_at ASC
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+MARK_IN_PROGRESS_QUERY = text("""
+    UPDATE flink_job_exceptions
+    SET status = 'in_progress'
+    WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+RELEASE_QUERY = text("""
+    UPDATE flink_job_exceptions
+    SET status = 'pending'
+    WHERE id IN :ids AND status = 'in_progress'
+""").bindparams(bindparam("ids", expanding=True))
+
+UPDATE_DIAGNOSIS_QUERY = text("""
+    UPDATE flink_job_exceptions
+    SET status = :status,
+        suggested_fix = :suggested_fix,
+        diagnosis_confidence = :confidence,
+        diagnosed_at = :diagnosed_at
+    WHERE id = :id
+""")
+
+MARK_FAILED_QUERY = text("""
+    UPDATE flink_job_exceptions
+    SET status = 'failed',
+        suggested_fix = :suggested_fix,
+        diagnosed_at = :diagnosed_at
+    WHERE id = :id
+""")
+
+INSERT_CASE_QUERY = text("""
+    INSERT INTO knowledge_cases
+    (case_id, error_type, error_pattern, pattern_hash, seen_count, root_cause,
+     solution, source_exception_id, source_type, verified)
+    VALUES
+    (:case_id, :error_type, :error_pattern, :pattern_hash, :seen_count, :root_cause,
+     :solution, :source_exception_id, :source_type, FALSE)
+""")
+
+BUMP_CASE_SEEN_QUERY = text("""
+    UPDATE knowledge_cases
+    SET seen_count = seen_count + 1
+    WHERE pattern_hash = :pattern_hash
+""")
+
+PENDING_COUNT_QUERY = text("""
+    SELECT COUNT(*) FROM flink_job_exceptions
+    WHERE status = 'pending'
+""")
+
+
+def pattern_hash(error_pattern: str) -> str:
+    """Hash a generalized error pattern into the indexed deduplication key.
+
+    MD5 is a lookup key, not a security measure; it matches MySQL's
+    MD5(error_pattern) for ad-hoc queries.
+    """
+    return hashlib.md5(error_pattern.encode(), usedforsecurity=False).hexdigest()
+
 
 class MySQLService:
     """Service for MySQL database operations."""
 
-    def __init__(self, settings: MySQLSettings):
+    def __init__(self, settings: MySQLSettings, engine: AsyncEngine | None = None):
         self.settings = settings
-        self.engine = create_async_engine(
+        # An injected engine is shared with (and disposed by) its owner
+        self._owns_engine = engine is None
+        self.engine = engine or create_async_engine(
             settings.url,
-            pool_size=5,
-            max_overflow=10,
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_recycle=settings.pool_recycle_seconds,
             pool_pre_ping=True,
+            # Reuse the most recently returned connection so idle ones can
+            # be recycled instead of all being kept warm
+            pool_use_lifo=True,
         )
         self.async_session = async_sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
@@ -34,50 +122,75 @@ class MySQLService:
         Returns:
             JobInfo if found, None otherwise.
         """
+        job_infos = await self.get_pending_exceptions(1)
+        return job_infos[0] if job_infos else None
+
+    async def get_pending_exceptions(self, limit: int) -> list[JobInfo]:
+        """Claim up to `limit` pending exceptions in one transaction.
+
+        Rows are locked with SKIP LOCKED and marked in_progress by a single
+        bulk UPDATE, so concurrent workers never claim the same exception.
+
+        Args:
+            limit: Maximum number of exceptions to claim.
+
+        Returns:
+            Claimed exceptions, oldest first; empty if none are pending.
+        """
         async with self.async_session() as session:
-            query = text("""
-                SELECT id, job_id, job_name, job_type, job_config,
-                       error_message, error_type, created_at
-                FROM flink_job_exceptions
-                WHERE status = 'pending'
-                ORDER BY created_at ASC
-                LIMIT 1
-                FOR UPDATE SKIP LOCKED
-            """)
-
-            result = await session.execute(query)
-            row = result.fetchone()
-
-            if not row:
-                return None
+            result = await session.execute(
+                SELECT_PENDING_QUERY,
+                {"limit": limit, "error_message_chars": ERROR_MESSAGE_MAX_CHARS},
+            )
+            rows = result.fetchall()
+
+            if not rows:
+                return []
 
             # Mark as in_progress
-            update_query = text("""
-                UPDATE flink_job_exceptions
-                SET status = 'in_progress'
-                WHERE id = :id
-            """)
-            await session.execute(update_query, {"id": row[0]})
+            await session.execute(
+                MARK_IN_PROGRESS_QUERY, {"ids": [row[0] for row in rows]}
+            )
             await session.commit()
 
-            # Parse job_config
-            job_config = row[4]
-            if isinstance(job_config, str):
-                try:
-                    job_config = json.loads(job_config)
-                except json.JSONDecodeError:
-                    job_config = {}
-
-            return JobInfo(
-                exception_id=row[0],
-                job_id=row[1],
-                job_name=row[2],
-                job_type=row[3],
-                job_config=job_config,
-                error_message=row[5],
-                error_type=row[6],
-                created_at=str(row[7]) if row[7] else "",
-            )
+        return [self._row_to_job_info(row) for row in rows]
+
+    async def release_exceptions(self, exception_ids: list[int]) -> None:
+        """Return claimed exceptions to pending so they are picked up again.
+
+        Args:
+            exception_ids: IDs of in_progress exceptions to release.
+        """
+        if not exception_ids:
+            return
+
+        async with self.async_session() as session:
+            await session.execute(RELEASE_QUERY, {"ids": exception_ids})
+            await session.commit()
+
+        logger.info("Released claimed exceptions", count=len(exception_ids))
+
+    @staticmethod
+    def _row_to_job_info(row: Any) -> JobInfo:
+        """Convert a flink_job_exceptions row into JobInfo."""
+        # Parse job_config
+        job_config = row[4]
+        if isinstance(job_config, str):
+            try:
+                job_config = orjson.loads(job_config)
+            except orjson.JSONDecodeError:
+                job_config = {}
+
+        return JobInfo(
+            exception_id=row[0],
+            job_id=row[1],
+            job_name=row[2],
+            job_type=row[3],
+            job_config=job_config,
+            error_message=row[5],
+            error_type=row[6],
+            created_at=str(row[7]) if row[7] else "",
+        )
 
     async def update_diagnosis_result(
         self, exception_id: int, diagnosis: DiagnosisResult, status: str = "completed"
@@ -90,28 +203,18 @@ class MySQLService:
             status: New status (completed or failed).
         """
         async with self.async_session() as session:
-            query = text("""
-                UPDATE flink_job_exceptions
-                SET status = :status,
-                    suggested_fix = :suggested_fix,
-                    diagnosis_confidence = :confidence,
-                    diagnosed_at = :diagnosed_at
-                WHERE id = :id
-            """)
-
-            suggested_fix = json.dumps(
+            suggested_fix = orjson.dumps(
                 {
                     "root_cause": diagnosis["root_cause"],
                     "detailed_analysis": diagnosis["detailed_analysis"],
                     "suggested_fix": diagnosis["suggested_fix"],
                     "priority": diagnosis["priority"],
                     "related_docs": diagnosis["related_docs"],
-                },
-                ensure_ascii=False,
-            )
+                }
+            ).decode()
 
             await session.execute(
-                query,
+                UPDATE_DIAGNOSIS_QUERY,
                 {
                     "id": exception_id,
                     "status": status,
@@ -139,21 +242,11 @@ class MySQLService:
             error_message: Error message to store.
         """
         async with self.async_session() as session:
-            query = text("""
-                UPDATE flink_job_exceptions
-                SET status = 'failed',
-                    suggested_fix = :error_message,
-                    diagnosed_at = :diagnosed_at
-                WHERE id = :id
-            """)
-
             await session.execute(
-                query,
+                MARK_FAILED_QUERY,
                 {
                     "id": exception_id,
-                    "error_message": json.dumps(
-                        {"error": error_message}, ensure_ascii=False
-                    ),
+                    "suggested_fix": orjson.dumps({"error": error_message}).decode(),
                     "diagnosed_at": datetime.now(),
                 },
             )
@@ -174,6 +267,7 @@ class MySQLService:
         solution: str,
         source_exception_id: int | None = None,
         source_type: str = "auto",
+        seen_count: int = 1,
     ) -> None:
         """Insert a new knowledge case.
 
@@ -185,23 +279,17 @@ class MySQLService:
             solution: Solution to fix the error.
             source_exception_id: ID of source exception if auto-generated.
             source_type: Source type (manual or auto).
+            seen_count: Times the error pattern was diagnosed so far.
         """
         async with self.async_session() as session:
-            query = text("""
-                INSERT INTO knowledge_cases
-                (case_id, error_type, error_pattern, root_cause, solution,
-                 source_exception_id, source_type, verified)
-                VALUES
-                (:case_id, :error_type, :error_pattern, :root_cause, :solution,
-                 :source_exception_id, :source_type, FALSE)
-            """)
-
             await session.execute(
-                query,
+                INSERT_CASE_QUERY,
                 {
                     "case_id": case_id,
                     "error_type": error_type,
                     "error_pattern": error_pattern,
+                    "pattern_hash": pattern_hash(error_pattern),
+                    "seen_count": seen_count,
                     "root_cause": root_cause,
                     "solution": solution,
                     "source_exception_id": source_exception_id,
@@ -217,20 +305,74 @@ class MySQLService:
                 source_type=source_type,
             )
 
+    async def insert_knowledge_cases(self, cases: list[dict[str, Any]]) -> None:
+        """Insert knowledge cases in one executemany round trip.
+
+        Args:
+            cases: Case dicts with the keyword arguments of
+                insert_knowledge_case.
+        """
+        if not cases:
+            return
+
+        params = [
+            {
+                "case_id": case["case_id"],
+                "error_type": case["error_type"],
+                "error_pattern": case["error_pattern"],
+                "pattern_hash": pattern_hash(case["error_pattern"]),
+                "seen_count": case.get("seen_count", 1),
+                "root_cause": case["root_cause"],
+                "solution": case["solution"],
+                "source_exception_id": case.get("source_exception_id"),
+                "source_type": case.get("source_type", "auto"),
+            }
+            for case in cases
+        ]
+        async with self.async_session() as session:
+            await session.execute(INSERT_CASE_QUERY, params)
+            await session.commit()
+
+        logger.info("Inserted knowledge cases", count=len(cases))
+
+    async def bump_case_seen_count(self, error_pattern: str) -> bool:
+        """Count another occurrence of a known error pattern.
+
+        Args:
+            error_pattern: Generalized error pattern.
+
+        Returns:
+            True if a case with this pattern exists (and was counted).
+        """
+        async with self.async_session() as session:
+            result = await session.execute(
+                BUMP_CASE_SEEN_QUERY, {"pattern_hash": pattern_hash(error_pattern)}
+            )
+            await session.commit()
+
+        return cast(CursorResult[Any], result).rowcount > 0
+
     async def get_pending_count(self) -> int:
         """Get count of pending exceptions.
 
         Returns:
             Number of pending exceptions.
         """
-        async with self.async_session() as session:
-            query = text("""
-                SELECT COUNT(*) FROM flink_job_exceptions
-                WHERE status = 'pending'
-            """)
-            result = await session.execute(query)
+        # Read-only: a bare connection skips session bookkeeping
+        async with self.engine.connect() as conn:
+            result = await conn.execute(PENDING_COUNT_QUERY)
             return result.scalar() or 0
 
+    async def ping(self) -> None:
+        """Check database connectivity with a single round trip.
+
+        Uses a bare connection instead of an ORM session, so no session or
+        transaction bookkeeping is set up for the probe.
+        """
+        async with self.engine.connect() as conn:
+            await conn.execute(PING_QUERY)
+
     async def close(self) -> None:
-        """Close database connections."""
-        await self.engine.dispose()
+        """Close database connections, unless the engine was injected."""
+        if self._owns_engine:
+            await self.engine.dispose()
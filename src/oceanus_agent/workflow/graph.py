@@ -1,6 +1,7 @@
 """LangGraph workflow definition for diagnosis."""
 
-from typing import cast
+from datetime import datetime
+from typing import Any, cast
 
 import structlog
 from langchain_core.runnables import RunnableConfig
@@ -58,49 +59,59 @@ def should_continue_after_diagnose(state: DiagnosisState) -> str:
     return "store"
 
 
-def handle_error(state: DiagnosisState) -> DiagnosisState:
+def handle_error(state: DiagnosisState) -> dict[str, Any]:
     """Handle error state.
 
     Args:
         state: Current workflow state.
 
     Returns:
-        Updated state with failed status.
+        State update with failed status.
     """
-    from datetime import datetime
-
     job_info = state.get("job_info")
     job_id = job_info.get("job_id") if job_info else "unknown"
 
     logger.error("Workflow error", job_id=job_id, error=state.get("error"))
 
     return {
-        **state,
         "status": DiagnosisStatus.FAILED,
         "end_time": datetime.now().isoformat(),
     }
 
 
-def build_diagnosis_workflow(settings: Settings) -> CompiledStateGraph:
+def build_diagnosis_workflow(
+    settings: Settings,
+    mysql_service: MySQLService | None = None,
+    milvus_service: MilvusService | None = None,
+    llm_service: LLMService | None = None,
+    accumulator: KnowledgeAccumulator | None = None,
+) -> CompiledStateGraph:
     """Build the diagnosis workflow graph.
 
     Args:
         settings: Application settings.
+        mysql_service: MySQL service to use; created from settings if omitted.
+        milvus_service: Milvus service to use; created from settings if omitted.
+        llm_service: LLM service to use; created from settings if omitted.
+        accumulator: Knowledge accumulator node to use; created from the
+            services if omitted.
 
     Returns:
         Compiled workflow graph.
     """
     # Initialize services
-    mysql_service = MySQLService(settings.mysql)
-    milvus_service = MilvusService(settings.milvus)
-    llm_service = LLMService(settings.openai)
+    mysql_service = mysql_service or MySQLService(settings.mysql)
+    milvus_service = milvus_service or MilvusService(settings.milvus)
+    llm_service = llm_service or LLMService(settings.openai)
 
     # Initialize nodes
     collector = JobCollector(mysql_service)
     retriever = KnowledgeRetriever(milvus_service, llm_service, settings.knowledge)
-    diagnoser = LLMDiagnoser(llm_service)
+    diagnoser = LLMDiagnoser(
+        llm_service, settings=settings.knowledge, milvus_service=milvus_service
+    )
     storer = ResultStorer(mysql_service)
-    accumulator = KnowledgeAccumulator(
+    accumulator = accumulator or KnowledgeAccumulator(
         mysql_service, milvus_service, llm_service, settings.knowledge
     )
 
@@ -140,9 +151,9 @@ def build_diagnosis_workflow(settings: Settings) -> CompiledStateGraph:
     workflow.add_edge("accumulate", END)
     workflow.add_edge("handle_error", END)
 
-    # Compile workflow with checkpointer
-    memory = MemorySaver()
-    app = workflow.compile(checkpointer=memory)
+    # Compile workflow, checkpointing each step only if configured
+    checkpointer = MemorySaver() if settings.workflow.checkpointer == "memory" else None
+    app = workflow.compile(checkpointer=checkpointer)
 
     logger.info("Built diagnosis workflow")
 
@@ -154,9 +165,42 @@ class DiagnosisWorkflow:
 
     def __init__(self, settings: Settings):
         self.settings = settings
-        self.app = build_diagnosis_workflow(settings)
+        self.mysql_service = MySQLService(settings.mysql)
+        self.milvus_service = MilvusService(settings.milvus)
+        self.llm_service = LLMService(settings.openai)
+        self.accumulator = KnowledgeAccumulator(
+            self.mysql_service,
+            self.milvus_service,
+            self.llm_service,
+            settings.knowledge,
+        )
+        self.app = build_diagnosis_workflow(
+            settings,
+            mysql_service=self.mysql_service,
+            milvus_service=self.milvus_service,
+            llm_service=self.llm_service,
+            accumulator=self.accumulator,
+        )
         self._services_initialized = False
 
+    async def prewarm(self) -> None:
+        """Open service connections ahead of the first batch.
+
+        Checks out one MySQL connection so the pool is established, and
+        connects the Milvus client (creating collections if needed) off the
+        event loop, so the first diagnosis run doesn't pay for either.
+        """
+        await self.mysql_service.ping()
+        await self.milvus_service.connect()
+
+    async def count_pending(self) -> int:
+        """Count exceptions waiting for diagnosis.
+
+        Returns:
+            Number of pending exceptions.
+        """
+        return await self.mysql_service.get_pending_count()
+
     async def run(self, thread_id: str) -> DiagnosisState:
         """Run a single diagnosis iteration.
 
@@ -166,12 +210,11 @@ class DiagnosisWorkflow:
         Returns:
             Final workflow state.
         """
-        from datetime import datetime
-
         initial_state: DiagnosisState = {
             "job_info": None,
             "status": DiagnosisStatus.PENDING,
             "retrieved_context": None,
+            "query_vector": None,
             "diagnosis_result": None,
             "start_time": datetime.now().isoformat(),
             "end_time": None,
@@ -185,7 +228,8 @@ class DiagnosisWorkflow:
         return cast(DiagnosisState, result)
 
     async def close(self) -> None:
-        """Close all services."""
-        # Services are created inside build_diagnosis_workflow
-        # They would need to be tracked for proper cleanup
-        pass
+        """Write buffered knowledge cases, then close all services."""
+        await self.accumulator.close()
+        await self.mysql_service.close()
+        self.milvus_service.close()
+        await self.llm_service.close()
@@ -1,14 +1,15 @@
 """Knowledge accumulation node for the diagnosis workflow."""
 
+import asyncio
+import contextlib
 import re
 import uuid
 from typing import Any
 
 import structlog
-from langsmith import traceable
 
 from oceanus_agent.config.settings import KnowledgeSettings
-from oceanus_agent.models.state import DiagnosisState
+from oceanus_agent.models.state import DiagnosisResult, DiagnosisState, JobInfo
 from oceanus_agent.services.llm_service import LLMService
 from oceanus_agent.services.milvus_service import MilvusService
 from oceanus_agent.services.mysql_service import MySQLService
@@ -16,6 +17,40 @@ from oceanus_agent.services.mysql_service import MySQLService
 logger = structlog.get_logger()
 
 
+# Volatile fragments replaced by placeholders in a single scan. Alternatives
+# are tried left to right, so UUIDs, timestamps and addresses win over the
+# bare numbers inside them. Paths must start at a word boundary, so slashes
+# inside words ("I/O", "KB/s") are kept.
+ERROR_PATTERN_REGEX = re.compile(
+    r"(?P<UUID>[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})"
+    r"|(?P<TIMESTAMP>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2})"
+    r"|(?P<ADDR>0x[a-fA-F0-9]+)"
+    r"|(?P<PATH>(?<!\w)/[\w/.-]+)"
+    r"|(?P<NUM>\d+)"
+)
+
+
+def _placeholder(match: re.Match[str]) -> str:
+    """Render the placeholder named after the matched group."""
+    return f"<{match.lastgroup}>"
+
+
+def extract_error_pattern(error_message: str) -> str:
+    """Extract generalized error pattern from error message.
+
+    Args:
+        error_message: Raw error message.
+
+    Returns:
+        Generalized error pattern.
+    """
+    # Bound the regex scan; long stack traces are cut to 2000 chars anyway
+    pattern = ERROR_PATTERN_REGEX.sub(_placeholder, error_message[:4000])
+
+    # Limit length
+    return pattern[:2000]
+
+
 class KnowledgeAccumulator:
     """Node for accumulating high-confidence diagnoses into the knowledge base."""
 
@@ -30,22 +65,31 @@ class KnowledgeAccumulator:
         self.milvus_service = milvus_service
         self.llm_service = llm_service
         self.settings = settings
-
-    @traceable(name="accumulate_knowledge")
-    async def __call__(self, state: DiagnosisState) -> DiagnosisState:
+        # Cases awaiting the next batched write, as (Milvus, MySQL) pairs
+        self._pending: list[tuple[dict[str, Any], dict[str, Any]]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task[None] | None = None
+        # Accumulations still embedding or buffering, run after the workflow
+        # has returned
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def __call__(self, state: DiagnosisState) -> dict[str, Any]:
         """Accumulate high-confidence diagnosis into the knowledge base.
 
+        The result is already stored, so the accumulation runs as a background
+        task and the workflow finishes without waiting for it.
+
         Args:
             state: Current workflow state.
 
         Returns:
-            Unchanged state (accumulation is a side effect).
+            Empty update (accumulation is a side effect).
         """
         job_info = state.get("job_info")
         diagnosis = state.get("diagnosis_result")
 
         if not job_info or not diagnosis:
-            return state
+            return {}
 
         # Only accumulate high-confidence diagnoses
         if diagnosis["confidence"] < self.settings.confidence_threshold:
@@ -55,8 +99,29 @@ class KnowledgeAccumulator:
                 confidence=diagnosis["confidence"],
                 threshold=self.settings.confidence_threshold,
             )
-            return state
+            return {}
+
+        task = asyncio.create_task(
+            self._accumulate(job_info, diagnosis, state.get("query_vector"))
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
+        return {}
+
+    async def _accumulate(
+        self,
+        job_info: JobInfo,
+        diagnosis: DiagnosisResult,
+        query_vector: list[float] | None,
+    ) -> None:
+        """Embed a diagnosed case and buffer it for the next batched write.
+
+        Args:
+            job_info: Job information.
+            diagnosis: Confident diagnosis result.
+            query_vector: The retriever's query embedding, if any.
+        """
         try:
             # Generate case ID
             case_id = f"case_{uuid.uuid4().hex[:12]}"
@@ -64,31 +129,43 @@ class KnowledgeAccumulator:
             # Extract error pattern
             error_pattern = self._extract_error_pattern(job_info["error_message"])
 
-            # Build case text for embedding
-            case_text = self._build_case_text(job_info, diagnosis)
-
-            # Generate embedding
-            embedding = await self.llm_service.generate_embedding(case_text)
-
-            # Insert into Milvus
-            await self.milvus_service.insert_case(
-                case_id=case_id,
-                vector=embedding,
-                error_type=job_info.get("error_type") or "other",
-                error_pattern=error_pattern,
-                root_cause=diagnosis["root_cause"],
-                solution=diagnosis["suggested_fix"],
-            )
-
-            # Insert metadata into MySQL
-            await self.mysql_service.insert_knowledge_case(
-                case_id=case_id,
-                error_type=job_info.get("error_type") or "other",
-                error_pattern=error_pattern,
-                root_cause=diagnosis["root_cause"],
-                solution=diagnosis["suggested_fix"],
-                source_exception_id=job_info["exception_id"],
-                source_type="auto",
+            # A recurring error only counts another occurrence of its case
+            if await self.mysql_service.bump_case_seen_count(error_pattern):
+                logger.debug("Skipping known error pattern", job_id=job_info["job_id"])
+                return
+
+            # Reuse the retriever's embedding if allowed, otherwise embed the case
+            embedding = query_vector
+            if not self.settings.reuse_query_embedding or embedding is None:
+                case_text = self._build_case_text(job_info, diagnosis)
+                embedding = await self.llm_service.generate_embedding(case_text)
+
+            # Another run may have buffered the same pattern meanwhile; it
+            # is not in MySQL yet, so count the occurrence on the buffered row
+            for _, buffered in self._pending:
+                if buffered["error_pattern"] == error_pattern:
+                    buffered["seen_count"] = buffered.get("seen_count", 1) + 1
+                    return
+
+            error_type = job_info.get("error_type") or "other"
+            await self._enqueue(
+                {
+                    "case_id": case_id,
+                    "vector": embedding,
+                    "error_type": error_type,
+                    "error_pattern": error_pattern,
+                    "root_cause": diagnosis["root_cause"],
+                    "solution": diagnosis["suggested_fix"],
+                },
+                {
+                    "case_id": case_id,
+                    "error_type": error_type,
+                    "error_pattern": error_pattern,
+                    "root_cause": diagnosis["root_cause"],
+                    "solution": diagnosis["suggested_fix"],
+                    "source_exception_id": job_info["exception_id"],
+                    "source_type": "auto",
+                },
             )
 
             logger.info(
@@ -104,7 +181,61 @@ class KnowledgeAccumulator:
                 "Error accumulating knowledge", job_id=job_info["job_id"], error=str(e)
             )
 
-        return state
+    async def _enqueue(
+        self, milvus_case: dict[str, Any], mysql_case: dict[str, Any]
+    ) -> None:
+        """Buffer a case, writing the batch once it is full.
+
+        A partial batch is written by a timer after accumulate_flush_seconds.
+
+        Args:
+            milvus_case: Keyword arguments for MilvusService.insert_case.
+            mysql_case: Keyword arguments for MySQLService.insert_knowledge_case.
+        """
+        self._pending.append((milvus_case, mysql_case))
+
+        if len(self._pending) >= self.settings.accumulate_batch_size:
+            await self._write_pending()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        """Flush buffered cases after the configured delay."""
+        await asyncio.sleep(self.settings.accumulate_flush_seconds)
+        self._flush_task = None
+        await self._write_pending()
+
+    async def _write_pending(self) -> None:
+        """Write all buffered cases to Milvus and MySQL in one batch each."""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            try:
+                await self.milvus_service.insert_cases([m for m, _ in pending])
+                await self.mysql_service.insert_knowledge_cases([c for _, c in pending])
+            except Exception as e:
+                # Don't fail the workflow for accumulation errors
+                logger.warning(
+                    "Error writing knowledge cases", count=len(pending), error=str(e)
+                )
+
+    async def flush(self) -> None:
+        """Wait for in-flight accumulations, then write all buffered cases."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._write_pending()
+
+    async def close(self) -> None:
+        """Write any pending cases and cancel the flush timer."""
+        # In-flight accumulations may still start a timer, so wait for them first
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+        await self._write_pending()
 
     def _extract_error_pattern(self, error_message: str) -> str:
         """Extract generalized error pattern from error message.
@@ -115,31 +246,7 @@ class KnowledgeAccumulator:
         Returns:
             Generalized error pattern.
         """
-        pattern = error_message
-
-        # Replace numbers with placeholder
-        pattern = re.sub(r"\d+", "<NUM>", pattern)
-
-        # Replace UUIDs with placeholder
-        pattern = re.sub(
-            r"[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}",
-            "<UUID>",
-            pattern,
-        )
-
-        # Replace timestamps with placeholder
-        pattern = re.sub(
-            r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}", "<TIMESTAMP>", pattern
-        )
-
-        # Replace hex addresses with placeholder
-        pattern = re.sub(r"0x[a-fA-F0-9]+", "<ADDR>", pattern)
-
-        # Replace file paths with placeholder
-        pattern = re.sub(r"/[\w/.-]+", "<PATH>", pattern)
-
-        # Limit length
-        return pattern[:2000]
+        return extract_error_pattern(error_message)
 
     def _build_case_text(self, job_info: Any, diagnosis: Any) -> str:
         """Build case text for embedding generation.
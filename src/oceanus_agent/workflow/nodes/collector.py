@@ -1,9 +1,9 @@
 """Data collection node for the diagnosis workflow."""
 
 from datetime import datetime
+from typing import Any
 
 import structlog
-from langsmith import traceable
 
 from oceanus_agent.models.state import DiagnosisState, DiagnosisStatus
 from oceanus_agent.services.mysql_service import MySQLService
@@ -17,15 +17,14 @@ class JobCollector:
     def __init__(self, mysql_service: MySQLService):
         self.mysql_service = mysql_service
 
-    @traceable(name="collect_job_exception")
-    async def __call__(self, state: DiagnosisState) -> DiagnosisState:
+    async def __call__(self, state: DiagnosisState) -> dict[str, Any]:
         """Collect a pending job exception.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated state with job info or None if no pending jobs.
+            State update with job info, or None if no pending jobs.
         """
         try:
             job_info = await self.mysql_service.get_pending_exception()
@@ -33,7 +32,6 @@ class JobCollector:
             if job_info is None:
                 logger.info("No pending exceptions to process")
                 return {
-                    **state,
                     "job_info": None,
                     "status": DiagnosisStatus.COMPLETED,
                     "end_time": datetime.now().isoformat(),
@@ -47,7 +45,6 @@ class JobCollector:
             )
 
             return {
-                **state,
                 "job_info": job_info,
                 "status": DiagnosisStatus.IN_PROGRESS,
             }
@@ -55,7 +52,6 @@ class JobCollector:
         except Exception as e:
             logger.exception("Error collecting job exception", error=str(e))
             return {
-                **state,
                 "job_info": None,
                 "status": DiagnosisStatus.FAILED,
                 "error": f"Collection error: {str(e)}",
@@ -1,51 +1,217 @@
 """LLM diagnosis node for the diagnosis workflow."""
 
+import asyncio
+import contextlib
+import hashlib
+import random
 from datetime import datetime
+from typing import Any
 
+import openai
 import structlog
-from langsmith import traceable
+from tenacity import RetryError
 
-from oceanus_agent.models.state import DiagnosisState, DiagnosisStatus
+from oceanus_agent.config.settings import KnowledgeSettings
+from oceanus_agent.models.state import (
+    DiagnosisResult,
+    DiagnosisState,
+    DiagnosisStatus,
+    JobInfo,
+    RetrievedContext,
+)
 from oceanus_agent.services.llm_service import LLMService
+from oceanus_agent.services.milvus_service import MilvusService
+from oceanus_agent.workflow.cache import TTLCache
+from oceanus_agent.workflow.nodes.accumulator import extract_error_pattern
 
 logger = structlog.get_logger()
 
+# Upper bound on the wait before re-running a failed diagnosis
+RETRY_BACKOFF_MAX_SECONDS = 30.0
+
+
+class DiagnosisCache(TTLCache[DiagnosisResult]):
+    """Bounded LRU cache of diagnoses with per-entry expiry."""
+
+    @staticmethod
+    def make_key(job_info: JobInfo) -> str:
+        """Build a cache key from the normalized error signature.
+
+        Args:
+            job_info: Job information with error_type already resolved.
+
+        Returns:
+            Stable hex digest identifying the error signature.
+        """
+        signature = "|".join(
+            (
+                job_info.get("error_type") or "",
+                extract_error_pattern(job_info["error_message"]),
+                job_info.get("job_type") or "",
+            )
+        )
+        return hashlib.blake2b(signature.encode(), digest_size=16).hexdigest()
+
 
 class LLMDiagnoser:
     """Node for generating diagnosis using LLM."""
 
-    def __init__(self, llm_service: LLMService, max_retries: int = 3):
+    def __init__(
+        self,
+        llm_service: LLMService,
+        max_retries: int = 3,
+        settings: KnowledgeSettings | None = None,
+        milvus_service: MilvusService | None = None,
+    ):
         self.llm_service = llm_service
         self.max_retries = max_retries
+        self.settings = settings
+
+        # Reuse confident diagnoses for semantically similar errors
+        self.semantic_cache: MilvusService | None = None
+        if settings is not None and settings.semantic_cache_enabled:
+            self.semantic_cache = milvus_service
+
+        # Reuse confident diagnoses for repeats of the same error signature
+        self.cache: DiagnosisCache | None = None
+        if settings is not None and settings.diagnosis_cache_size > 0:
+            self.cache = DiagnosisCache(
+                settings.diagnosis_cache_size, settings.diagnosis_cache_ttl_seconds
+            )
+
+    async def _generate_diagnosis(
+        self,
+        job_info: JobInfo,
+        context: RetrievedContext | None,
+        query_vector: list[float] | None = None,
+    ) -> tuple[JobInfo, DiagnosisResult]:
+        """Generate a diagnosis, reusing a cached one for repeated errors.
+
+        The exact-match cache needs the error type, so for an unclassified
+        error only the semantic cache is consulted before the LLM call; the
+        result is cached under the error type that call resolves.
 
-    @traceable(name="diagnose_exception")
-    async def __call__(self, state: DiagnosisState) -> DiagnosisState:
+        Args:
+            job_info: Job information.
+            context: Retrieved context for the prompt.
+            query_vector: Error embedding from retrieval, for the semantic cache.
+
+        Returns:
+            Job info with error_type filled in if resolved, and the diagnosis.
+        """
+        if self.cache is not None and job_info.get("error_type"):
+            cached = self.cache.get(DiagnosisCache.make_key(job_info))
+            if cached is not None:
+                logger.debug("Reusing cached diagnosis", job_id=job_info["job_id"])
+                return job_info, DiagnosisResult(**cached)
+
+        if query_vector is not None:
+            similar = await self._search_semantic_cache(job_info, query_vector)
+            if similar is not None:
+                if self.cache is not None and job_info.get("error_type"):
+                    self.cache.put(DiagnosisCache.make_key(job_info), similar)
+                return job_info, similar
+
+        job_info, result = await self._diagnose(job_info, context)
+
+        # Only confident diagnoses are worth repeating for other jobs
+        if (
+            self.settings is not None
+            and result["confidence"] >= self.settings.confidence_threshold
+        ):
+            if self.cache is not None:
+                self.cache.put(DiagnosisCache.make_key(job_info), result)
+            if query_vector is not None:
+                await self._store_semantic_cache(job_info, query_vector, result)
+
+        return job_info, result
+
+    async def _diagnose(
+        self, job_info: JobInfo, context: RetrievedContext | None
+    ) -> tuple[JobInfo, DiagnosisResult]:
+        """Ask the LLM for a diagnosis, classifying the error if still needed."""
+        if job_info.get("error_type"):
+            result = await self.llm_service.generate_diagnosis(
+                job_info=job_info, context=context
+            )
+            return job_info, result
+
+        # Unclassified (retrieval could not classify it): classify and
+        # diagnose in one LLM call instead of two
+        error_type, result = await self.llm_service.classify_and_diagnose(
+            job_info, context
+        )
+        return {**job_info, "error_type": error_type}, result
+
+    async def _search_semantic_cache(
+        self, job_info: JobInfo, query_vector: list[float]
+    ) -> DiagnosisResult | None:
+        """Look up a diagnosis of a sufficiently similar past error."""
+        if self.semantic_cache is None or self.settings is None:
+            return None
+
+        try:
+            hit = await self.semantic_cache.search_cached_diagnosis(
+                query_vector, job_info.get("error_type")
+            )
+        except Exception as e:
+            logger.warning(
+                "Semantic cache lookup failed",
+                job_id=job_info["job_id"],
+                error=str(e),
+            )
+            return None
+
+        if hit is None or hit[1] < self.settings.semantic_cache_threshold:
+            return None
+
+        logger.debug(
+            "Reusing semantically cached diagnosis",
+            job_id=job_info["job_id"],
+            similarity=hit[1],
+        )
+        return hit[0]
+
+    async def _store_semantic_cache(
+        self, job_info: JobInfo, query_vector: list[float], result: DiagnosisResult
+    ) -> None:
+        """Add a confident diagnosis to the semantic cache."""
+        if self.semantic_cache is None or self.settings is None:
+            return
+
+        try:
+            await self.semantic_cache.insert_cached_diagnosis(
+                query_vector,
+                job_info.get("error_type"),
+                result,
+                self.settings.semantic_cache_ttl_seconds,
+            )
+        except Exception as e:
+            logger.warning(
+                "Semantic cache insert failed",
+                job_id=job_info["job_id"],
+                error=str(e),
+            )
+
+    async def __call__(self, state: DiagnosisState) -> dict[str, Any]:
         """Generate diagnosis for the job exception.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated state with diagnosis result.
+            State update with diagnosis result.
         """
         job_info = state.get("job_info")
 
         if not job_info:
-            return state
+            return {}
 
         retry_count = state.get("retry_count", 0)
 
         try:
-            # Classify error type if not already set
-            if not job_info.get("error_type"):
-                error_type = await self.llm_service.classify_error(
-                    job_info["error_message"]
-                )
-                job_info = {**job_info, "error_type": error_type}
-
-            # Generate diagnosis
-            diagnosis_result = await self.llm_service.generate_diagnosis(
-                job_info=job_info, context=state.get("retrieved_context")
+            job_info, diagnosis_result = await self._generate_diagnosis(
+                job_info, state.get("retrieved_context"), state.get("query_vector")
             )
 
             logger.info(
@@ -56,7 +222,6 @@ class LLMDiagnoser:
             )
 
             return {
-                **state,
                 "job_info": job_info,
                 "diagnosis_result": diagnosis_result,
                 "status": DiagnosisStatus.IN_PROGRESS,
@@ -75,11 +240,40 @@ class LLMDiagnoser:
 
             if new_retry_count >= self.max_retries:
                 return {
-                    **state,
                     "status": DiagnosisStatus.FAILED,
                     "error": f"Diagnosis failed after {new_retry_count} retries: {str(e)}",
                     "end_time": datetime.now().isoformat(),
                     "retry_count": new_retry_count,
                 }
 
-            return {**state, "error": str(e), "retry_count": new_retry_count}
+            # Back off before the graph routes back here, so a rate-limited or
+            # failing provider is not retried in a tight loop
+            await asyncio.sleep(self._retry_delay(e, new_retry_count))
+
+            return {"error": str(e), "retry_count": new_retry_count}
+
+    @staticmethod
+    def _retry_delay(error: BaseException, retry_count: int) -> float:
+        """Compute the wait before the next diagnosis attempt.
+
+        Honors the provider's Retry-After header when present, otherwise uses
+        exponential backoff with jitter.
+
+        Args:
+            error: Error raised by the failed attempt.
+            retry_count: Number of failed attempts so far.
+
+        Returns:
+            Delay in seconds.
+        """
+        # The LLM service's own retries wrap the last error
+        if isinstance(error, RetryError):
+            error = error.last_attempt.exception() or error
+
+        if isinstance(error, openai.APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after is not None:
+                with contextlib.suppress(ValueError):
+                    return min(float(retry_after), RETRY_BACKOFF_MAX_SECONDS)
+
+        return min(2.0**retry_count + random.random(), RETRY_BACKOFF_MAX_SECONDS)
@@ -1,15 +1,30 @@
 """Knowledge retrieval node for the diagnosis workflow."""
 
+import asyncio
+import hashlib
+from typing import Any, TypeVar
+
 import structlog
-from langsmith import traceable
 
 from oceanus_agent.config.settings import KnowledgeSettings
-from oceanus_agent.models.state import DiagnosisState, RetrievedContext
+from oceanus_agent.models.state import (
+    DiagnosisState,
+    JobInfo,
+    RetrievedCase,
+    RetrievedContext,
+)
 from oceanus_agent.services.llm_service import LLMService
 from oceanus_agent.services.milvus_service import MilvusService
+from oceanus_agent.workflow.cache import TTLCache
+from oceanus_agent.workflow.nodes.accumulator import extract_error_pattern
 
 logger = structlog.get_logger()
 
+T = TypeVar("T")
+
+# Resolved error type, retrieved context and query vector of a past retrieval
+CachedRetrieval = tuple[str | None, RetrievedContext, list[float]]
+
 
 class KnowledgeRetriever:
     """Node for retrieving relevant knowledge from Milvus."""
@@ -24,20 +39,148 @@ class KnowledgeRetriever:
         self.llm_service = llm_service
         self.settings = settings
 
-    @traceable(name="retrieve_knowledge")
-    async def __call__(self, state: DiagnosisState) -> DiagnosisState:
+        # Reuse retrieval results for repeats of the same error signature
+        self.cache: TTLCache[CachedRetrieval] | None = None
+        if settings.retrieval_cache_size > 0:
+            self.cache = TTLCache(
+                settings.retrieval_cache_size, settings.retrieval_cache_ttl_seconds
+            )
+
+    @staticmethod
+    def _cache_key(job_info: JobInfo) -> str:
+        """Build a cache key from the error type and generalized error pattern."""
+        signature = "|".join(
+            (
+                job_info.get("error_type") or "",
+                extract_error_pattern(job_info["error_message"]),
+            )
+        )
+        return hashlib.blake2b(signature.encode(), digest_size=16).hexdigest()
+
+    async def _embed_and_classify(
+        self, job_info: JobInfo, query_text: str
+    ) -> tuple[list[float], JobInfo]:
+        """Generate the query embedding, classifying the error alongside it.
+
+        Classification only runs when error_type is missing, concurrently with
+        the embedding request so it adds no latency. A failed classification
+        is left for the diagnoser to retry.
+
+        Args:
+            job_info: Job information.
+            query_text: Text to embed.
+
+        Returns:
+            Query vector and job info with error_type filled in if resolved.
+        """
+        if job_info.get("error_type"):
+            return await self.llm_service.generate_embedding(query_text), job_info
+
+        query_vector, error_type = await asyncio.gather(
+            self.llm_service.generate_embedding(query_text),
+            self.llm_service.classify_error(job_info["error_message"]),
+            return_exceptions=True,
+        )
+        if isinstance(query_vector, BaseException):
+            raise query_vector
+        if isinstance(error_type, BaseException):
+            logger.warning(
+                "Error classifying exception, leaving it to the diagnoser",
+                job_id=job_info["job_id"],
+                error=str(error_type),
+            )
+            return query_vector, job_info
+
+        return query_vector, {**job_info, "error_type": error_type}
+
+    async def _embed_with_fallback(
+        self, job_info: JobInfo, query_text: str
+    ) -> tuple[list[float], JobInfo] | list[RetrievedCase]:
+        """Embed the query, falling back to error-type matches if it is slow.
+
+        With embedding_timeout_ms set and a known error type, a metadata-only
+        case lookup runs speculatively alongside the embedding request and is
+        served if the embedding misses the deadline.
+
+        Args:
+            job_info: Job information.
+            query_text: Text to embed.
+
+        Returns:
+            Query vector and job info, or fallback cases on timeout.
+        """
+        timeout_ms = self.settings.embedding_timeout_ms
+        error_type = job_info.get("error_type")
+        if timeout_ms <= 0 or not error_type:
+            return await self._embed_and_classify(job_info, query_text)
+
+        fallback = asyncio.create_task(
+            self.milvus_service.query_cases_by_error_type(
+                error_type, limit=self.settings.max_similar_cases
+            )
+        )
+        try:
+            embedded = await asyncio.wait_for(
+                self._embed_and_classify(job_info, query_text), timeout_ms / 1000
+            )
+        except TimeoutError:
+            logger.warning(
+                "Embedding timed out, using cases matched by error type",
+                job_id=job_info["job_id"],
+                timeout_ms=timeout_ms,
+            )
+            return await fallback
+        except BaseException:
+            fallback.cancel()
+            raise
+
+        fallback.cancel()
+        return embedded
+
+    @staticmethod
+    def _search_result(
+        result: list[T] | BaseException, source: str, job_info: JobInfo
+    ) -> list[T]:
+        """Unwrap a gathered search result, logging and dropping failures."""
+        if isinstance(result, BaseException):
+            logger.warning(
+                "Error searching knowledge, continuing without it",
+                job_id=job_info["job_id"],
+                source=source,
+                error=str(result),
+            )
+            return []
+        return result
+
+    async def __call__(self, state: DiagnosisState) -> dict[str, Any]:
         """Retrieve relevant knowledge for the job exception.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated state with retrieved context.
+            State update with retrieved context.
         """
         job_info = state.get("job_info")
 
         if not job_info:
-            return state
+            return {}
+
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(job_info)
+            cached = self.cache.get(key)
+            if cached is not None:
+                cached_type, cached_context, cached_vector = cached
+                logger.debug("Reusing cached retrieval", job_id=job_info["job_id"])
+                return {
+                    "job_info": {
+                        **job_info,
+                        "error_type": job_info.get("error_type") or cached_type,
+                    },
+                    "retrieved_context": cached_context,
+                    "query_vector": cached_vector,
+                }
 
         try:
             # Build query text from error message
@@ -45,26 +188,47 @@ class KnowledgeRetriever:
                 f"{job_info.get('error_type', '')} {job_info['error_message'][:1000]}"
             )
 
-            # Generate embedding
-            query_vector = await self.llm_service.generate_embedding(query_text)
-
-            # Search for similar cases
-            similar_cases = await self.milvus_service.search_similar_cases(
-                query_vector=query_vector,
-                error_type=job_info.get("error_type"),
-                limit=self.settings.max_similar_cases,
-            )
-
-            # Search for relevant documentation
-            doc_snippets = await self.milvus_service.search_doc_snippets(
-                query_vector=query_vector, limit=self.settings.max_doc_snippets
+            # Generate embedding (and classify the error concurrently if needed)
+            embedded = await self._embed_with_fallback(job_info, query_text)
+            if isinstance(embedded, list):
+                return {
+                    "retrieved_context": {
+                        "similar_cases": embedded,
+                        "doc_snippets": [],
+                    },
+                }
+            query_vector, job_info = embedded
+
+            # Search similar cases and relevant documentation concurrently;
+            # a failed search only empties its own half of the context
+            cases_result, docs_result = await asyncio.gather(
+                self.milvus_service.search_similar_cases(
+                    query_vector=query_vector,
+                    error_type=job_info.get("error_type"),
+                    limit=self.settings.max_similar_cases,
+                ),
+                self.milvus_service.search_doc_snippets(
+                    query_vector=query_vector, limit=self.settings.max_doc_snippets
+                ),
+                return_exceptions=True,
             )
+            similar_cases = self._search_result(cases_result, "cases", job_info)
+            doc_snippets = self._search_result(docs_result, "docs", job_info)
 
             context: RetrievedContext = {
                 "similar_cases": similar_cases,
                 "doc_snippets": doc_snippets,
             }
 
+            # Only complete results are reused; a failed search is retried
+            if (
+                self.cache is not None
+                and key is not None
+                and not isinstance(cases_result, BaseException)
+                and not isinstance(docs_result, BaseException)
+            ):
+                self.cache.put(key, (job_info.get("error_type"), context, query_vector))
+
             logger.info(
                 "Retrieved knowledge context",
                 job_id=job_info["job_id"],
@@ -72,7 +236,11 @@ class KnowledgeRetriever:
                 docs_found=len(doc_snippets),
             )
 
-            return {**state, "retrieved_context": context}
+            return {
+                "job_info": job_info,
+                "retrieved_context": context,
+                "query_vector": query_vector,
+            }
 
         except Exception as e:
             logger.warning(
@@ -82,6 +250,5 @@ class KnowledgeRetriever:
             )
             # Continue without context - diagnosis can still proceed
             return {
-                **state,
                 "retrieved_context": {"similar_cases": [], "doc_snippets": []},
             }
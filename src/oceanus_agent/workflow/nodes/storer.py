@@ -1,9 +1,9 @@
 """Result storage node for the diagnosis workflow."""
 
 from datetime import datetime
+from typing import Any
 
 import structlog
-from langsmith import traceable
 
 from oceanus_agent.models.state import DiagnosisState, DiagnosisStatus
 from oceanus_agent.services.mysql_service import MySQLService
@@ -17,21 +17,20 @@ class ResultStorer:
     def __init__(self, mysql_service: MySQLService):
         self.mysql_service = mysql_service
 
-    @traceable(name="store_result")
-    async def __call__(self, state: DiagnosisState) -> DiagnosisState:
+    async def __call__(self, state: DiagnosisState) -> dict[str, Any]:
         """Store diagnosis result to MySQL.
 
         Args:
             state: Current workflow state.
 
         Returns:
-            Updated state with completion status.
+            State update with completion status.
         """
         job_info = state.get("job_info")
         diagnosis_result = state.get("diagnosis_result")
 
         if not job_info:
-            return state
+            return {}
 
         try:
             if diagnosis_result:
@@ -50,7 +49,6 @@ class ResultStorer:
                 )
 
                 return {
-                    **state,
                     "status": DiagnosisStatus.COMPLETED,
                     "end_time": datetime.now().isoformat(),
                 }
@@ -69,7 +67,6 @@ class ResultStorer:
                 )
 
                 return {
-                    **state,
                     "status": DiagnosisStatus.FAILED,
                     "end_time": datetime.now().isoformat(),
                 }
@@ -79,7 +76,6 @@ class ResultStorer:
                 "Error storing result", job_id=job_info["job_id"], error=str(e)
             )
             return {
-                **state,
                 "status": DiagnosisStatus.FAILED,
                 "error": f"Storage error: {str(e)}",
                 "end_time": datetime.now().isoformat(),
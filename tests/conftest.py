@@ -1,6 +1,9 @@
 """Global pytest fixtures for Oceanus Agent tests."""
 
+from collections.abc import Mapping
 from datetime import datetime
+from types import MappingProxyType
+from typing import Any
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -116,9 +119,8 @@ def mock_llm_service() -> AsyncMock:
 # ============ State Fixtures ============
 
 
-@pytest.fixture
-def sample_job_info() -> JobInfo:
-    """示例作业信息."""
+def _sample_job_info() -> JobInfo:
+    """构建示例作业信息."""
     return JobInfo(
         exception_id=1,
         job_id="job-123",
@@ -131,6 +133,12 @@ def sample_job_info() -> JobInfo:
     )
 
 
+@pytest.fixture
+def sample_job_info() -> JobInfo:
+    """示例作业信息."""
+    return _sample_job_info()
+
+
 @pytest.fixture
 def sample_diagnosis_result() -> DiagnosisResult:
     """示例诊断结果."""
@@ -182,37 +190,42 @@ def sample_retrieved_context(
     )
 
 
-@pytest.fixture
-def initial_state() -> DiagnosisState:
-    """初始工作流状态."""
-    return DiagnosisState(
-        job_info=None,
-        status=DiagnosisStatus.PENDING,
-        retrieved_context=None,
-        diagnosis_result=None,
-        start_time=datetime.now().isoformat(),
-        end_time=None,
-        error=None,
-        retry_count=0,
+@pytest.fixture(scope="session")
+def initial_state() -> Mapping[str, Any]:
+    """初始工作流状态 (整个会话共享, 只读)."""
+    return MappingProxyType(
+        DiagnosisState(
+            job_info=None,
+            status=DiagnosisStatus.PENDING,
+            retrieved_context=None,
+            diagnosis_result=None,
+            start_time=datetime.now().isoformat(),
+            end_time=None,
+            error=None,
+            retry_count=0,
+            query_vector=None,
+        )
     )
 
 
-@pytest.fixture
-def state_with_job(
-    initial_state: DiagnosisState,
-    sample_job_info: JobInfo,
-) -> DiagnosisState:
-    """包含作业信息的状态."""
-    return {
-        **initial_state,
-        "job_info": sample_job_info,
-        "status": DiagnosisStatus.IN_PROGRESS,
-    }
+@pytest.fixture(scope="session")
+def state_with_job(initial_state: Mapping[str, Any]) -> Mapping[str, Any]:
+    """包含作业信息的状态 (整个会话共享, 只读, 嵌套的作业信息同样只读)."""
+    job_info = _sample_job_info()
+    return MappingProxyType(
+        {
+            **initial_state,
+            "job_info": MappingProxyType(
+                {**job_info, "job_config": MappingProxyType(job_info["job_config"])}
+            ),
+            "status": DiagnosisStatus.IN_PROGRESS,
+        }
+    )
 
 
 @pytest.fixture
 def state_with_context(
-    state_with_job: DiagnosisState,
+    state_with_job: Mapping[str, Any],
     sample_retrieved_context: RetrievedContext,
 ) -> DiagnosisState:
     """包含检索上下文的状态."""
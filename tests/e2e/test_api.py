@@ -1,5 +1,7 @@
+import pytest
 from fastapi.testclient import TestClient
 from oceanus_agent.api.app import app
+from oceanus_agent.api.routes import get_mysql_service
 from oceanus_agent.config.settings import settings
 
 client = TestClient(app)
@@ -15,26 +17,30 @@ def test_health_check():
     assert data["environment"] == settings.app.env
 
 
-def test_readiness_check_mocked(mocker):
-    """Test readiness check with mocked DB."""
-    # Mock MySQLService
-    mock_service = mocker.patch("oceanus_agent.api.routes.MySQLService")
-    mock_instance = mock_service.return_value
+@pytest.fixture
+def mock_mysql_service(mocker):
+    """Override the shared MySQL service dependency with a mock."""
+    mock_instance = mocker.MagicMock()
+    app.dependency_overrides[get_mysql_service] = lambda: mock_instance
+    yield mock_instance
+    app.dependency_overrides.pop(get_mysql_service, None)
+
 
-    # Mock async context manager for session
-    mock_session = mocker.AsyncMock()
-    mock_instance.async_session.return_value.__aenter__.return_value = mock_session
+def test_readiness_check_mocked(mocker, mock_mysql_service):
+    """Test readiness check with mocked DB."""
+    mock_mysql_service.ping = mocker.AsyncMock()
 
     response = client.get("/api/v1/ready")
     assert response.status_code == 200
     assert response.json() == {"status": "ready"}
+    mock_mysql_service.ping.assert_awaited_once()
 
 
-def test_readiness_check_failure(mocker):
+def test_readiness_check_failure(mocker, mock_mysql_service):
     """Test readiness check failure."""
-    mock_service = mocker.patch("oceanus_agent.api.routes.MySQLService")
-    mock_instance = mock_service.return_value
-    mock_instance.async_session.side_effect = Exception("DB Connection Failed")
+    mock_mysql_service.ping = mocker.AsyncMock(
+        side_effect=Exception("DB Connection Failed")
+    )
 
     response = client.get("/api/v1/ready")
     assert response.status_code == 503
@@ -1,67 +1,190 @@
-"""Fixtures for integration tests."""
+"""Fixtures for integration tests.
 
+Under pytest-xdist (``make test-integration``) every worker gets
+its own MySQL database and Milvus collections, suffixed with the worker id,
+so workers never see each other's rows.
+"""
+
+import asyncio
+import contextlib
+import os
+import re
+from pathlib import Path
+
+import pytest
 import pytest_asyncio
-from oceanus_agent.config.settings import settings
+from oceanus_agent.config.settings import MilvusSettings, MySQLSettings, settings
 from oceanus_agent.services.milvus_service import MilvusService
 from oceanus_agent.services.mysql_service import MySQLService
+from pytest_asyncio import is_async_test
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+INTEGRATION_DIR = Path(__file__).parent
+INIT_DB_SCRIPT = INTEGRATION_DIR.parents[1] / "scripts" / "init_db.sql"
+
+# Connections opened by the session engine before the first test
+POOL_SIZE = 8
+
+# e.g. "_gw0" under pytest-xdist, empty otherwise
+WORKER_SUFFIX = (
+    f"_{os.environ['PYTEST_XDIST_WORKER']}"
+    if "PYTEST_XDIST_WORKER" in os.environ
+    else ""
+)
+
+
+def pytest_collection_modifyitems(items: list[pytest.Item]) -> None:
+    """Run integration tests in the session event loop.
+
+    The shared services' connection pools are bound to the loop they were
+    created in, so tests using them must run in that same loop.
+    """
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if is_async_test(item) and item.path.is_relative_to(INTEGRATION_DIR):
+            item.add_marker(session_loop, append=False)
+
+
+def _table_statements() -> list[str]:
+    """Read the CREATE TABLE statements from scripts/init_db.sql."""
+    script = INIT_DB_SCRIPT.read_text()
+    script = re.sub(r"/\*.*?\*/", "", script, flags=re.S)
+    script = re.sub(r"^\s*--.*$", "", script, flags=re.M)
+    return [
+        stmt.strip()
+        for stmt in script.split(";")
+        if stmt.strip().upper().startswith("CREATE TABLE")
+    ]
+
+
+@pytest.fixture(scope="session")
+def worker_mysql_settings() -> MySQLSettings:
+    """MySQL settings for this worker's database, using the asyncmy driver."""
+    return MySQLSettings(
+        **{
+            **settings.mysql.model_dump(),
+            "database": settings.mysql.database + WORKER_SUFFIX,
+            # Cython protocol codec; the tests issue many small queries
+            "driver": "asyncmy",
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def worker_milvus_settings() -> MilvusSettings:
+    """Milvus settings pointing at this worker's collections."""
+    milvus = settings.milvus
+    return MilvusSettings(
+        **{
+            **milvus.model_dump(),
+            "cases_collection": milvus.cases_collection + WORKER_SUFFIX,
+            "docs_collection": milvus.docs_collection + WORKER_SUFFIX,
+            "diagnosis_cache_collection": (
+                milvus.diagnosis_cache_collection + WORKER_SUFFIX
+            ),
+        }
+    )
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def db_setup(worker_mysql_settings: MySQLSettings):
+    """Ensure database exists and tables are created; yield the shared engine."""
+    server_engine = None
+    if WORKER_SUFFIX:
+        # Each xdist worker creates (and finally drops) its own database,
+        # connecting through the configured one
+        server_engine = create_async_engine(
+            MySQLSettings(**{**settings.mysql.model_dump(), "driver": "asyncmy"}).url,
+            poolclass=NullPool,
+        )
+        database = worker_mysql_settings.database
+        async with server_engine.begin() as conn:
+            await conn.execute(text(f"CREATE DATABASE IF NOT EXISTS `{database}`"))
+            await conn.execute(text(f"USE `{database}`"))
+            for stmt in _table_statements():
+                await conn.execute(text(stmt))
+    # Without xdist we use the database from settings, initialized by
+    # docker-compose/scripts
+
+    # The one engine (and connection pool) used by the whole session. The
+    # test server does not drop idle connections, so skip the per-checkout
+    # ping and open the whole pool up front instead.
+    engine = create_async_engine(
+        worker_mysql_settings.url,
+        pool_pre_ping=False,
+        pool_size=POOL_SIZE,
+        max_overflow=0,
+    )
+    async with contextlib.AsyncExitStack() as stack:
+        await asyncio.gather(
+            *(stack.enter_async_context(engine.connect()) for _ in range(POOL_SIZE))
+        )
+
+    yield engine
 
+    await engine.dispose()
+    if server_engine is not None:
+        async with server_engine.begin() as conn:
+            await conn.execute(text(f"DROP DATABASE IF EXISTS `{database}`"))
+        await server_engine.dispose()
 
-@pytest_asyncio.fixture(scope="session")
-async def db_setup():
-    """Ensure database exists and tables are created."""
-    # This assumes the user and password in settings.mysql have permissions to create DBs
-    # or that the DB already exists from docker-compose.
-    # For CI/Local, we use the one from settings.
-    engine = create_async_engine(settings.mysql.url)
-
-    # We could run migrations or init script here if needed.
-    # For now, we assume the DB is initialized by docker-compose/scripts.
-
-    yield
 
-    await engine.dispose()
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def shared_mysql_service(db_setup, worker_mysql_settings: MySQLSettings):
+    """MySQL service on the session's shared engine."""
+    return MySQLService(worker_mysql_settings, engine=db_setup)
 
 
-@pytest_asyncio.fixture
-async def real_mysql_service(db_setup):
-    """Real MySQL service connecting to the integration DB."""
-    service = MySQLService(settings.mysql)
+@pytest_asyncio.fixture(loop_scope="session")
+async def real_mysql_service(shared_mysql_service):
+    """Real MySQL service connecting to the integration DB, with empty tables."""
+    service = shared_mysql_service
 
-    # Clean up tables before each test
-    async with service.async_session() as session:
+    # Clean up tables before each test. TRUNCATE commits implicitly, so an
+    # autocommit connection skips the pointless BEGIN/COMMIT round trips.
+    async with service.engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
         # Disable foreign key checks to truncate tables
-        await session.execute(text("SET FOREIGN_KEY_CHECKS = 0;"))
-        await session.execute(text("TRUNCATE TABLE knowledge_cases;"))
-        await session.execute(text("TRUNCATE TABLE flink_job_exceptions;"))
-        await session.execute(text("SET FOREIGN_KEY_CHECKS = 1;"))
-        await session.commit()
+        await conn.execute(text("SET FOREIGN_KEY_CHECKS = 0;"))
+        await conn.execute(text("TRUNCATE TABLE knowledge_cases;"))
+        await conn.execute(text("TRUNCATE TABLE flink_job_exceptions;"))
+        await conn.execute(text("SET FOREIGN_KEY_CHECKS = 1;"))
 
-    yield service
+    return service
 
-    await service.close()
 
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def shared_milvus_service(worker_milvus_settings: MilvusSettings):
+    """Milvus service (and client connection) shared by the whole session."""
+    service = MilvusService(worker_milvus_settings)
+    # Connect and create the collections (and their indexes) once
+    service.get_client()
 
-@pytest_asyncio.fixture
-async def real_milvus_service():
-    """Real Milvus service connecting to the integration Milvus."""
-    service = MilvusService(settings.milvus)
+    yield service
 
-    # Clean up collections before each test (optional, or just delete all data)
-    # Milvus doesn't have a simple TRUNCATE, we might need to query and delete or drop and recreate.
-    # For safety in tests, we'll try to drop if they exist to start fresh.
-    for coll_name in [
-        settings.milvus.cases_collection,
-        settings.milvus.docs_collection,
-    ]:
-        if service.client.has_collection(coll_name):
-            # Using query to get all IDs and delete might be slow but safe
+    if WORKER_SUFFIX and service.client:
+        for coll_name in [
+            worker_milvus_settings.cases_collection,
+            worker_milvus_settings.docs_collection,
+            worker_milvus_settings.diagnosis_cache_collection,
+        ]:
             service.client.drop_collection(coll_name)
+    service.close()
 
-    # Re-initialize collections
-    service._ensure_collections()
 
-    yield service
+@pytest_asyncio.fixture(loop_scope="session")
+async def real_milvus_service(shared_milvus_service):
+    """Real Milvus service connecting to the integration Milvus, with empty collections."""
+    service = shared_milvus_service
 
-    service.close()
+    # Delete all entities instead of dropping the collections, so the
+    # schema and index are not rebuilt and reloaded for every test
+    for coll_name, pk_field in [
+        (service.settings.cases_collection, "case_id"),
+        (service.settings.docs_collection, "doc_id"),
+    ]:
+        service.client.delete(collection_name=coll_name, filter=f'{pk_field} != ""')
+
+    return service
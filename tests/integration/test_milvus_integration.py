@@ -3,8 +3,13 @@
 import pytest
 from oceanus_agent.services.milvus_service import MilvusService
 
+# Fixture vectors, built once; the service never mutates its inputs
+_VEC_01 = [0.1] * 1536
+_VEC_05 = [0.5] * 1536
+
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group("milvus")
 class TestMilvusIntegration:
     """Milvus Service 集成测试."""
 
@@ -20,7 +25,7 @@ class TestMilvusIntegration:
 
         # 2. 插入测试数据
         case_id = "test-case-123"
-        vector = [0.1] * 1536
+        vector = _VEC_01
         await real_milvus_service.insert_case(
             case_id=case_id,
             vector=vector,
@@ -46,7 +51,7 @@ class TestMilvusIntegration:
         """测试文档片段的搜索."""
 
         doc_id = "test-doc-001"
-        vector = [0.5] * 1536
+        vector = _VEC_05
         await real_milvus_service.insert_doc(
             doc_id=doc_id,
             vector=vector,
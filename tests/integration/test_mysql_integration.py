@@ -1,12 +1,23 @@
 """Integration tests for MySQL service."""
 
+import orjson
 import pytest
 from oceanus_agent.models.state import DiagnosisResult
 from oceanus_agent.services.mysql_service import MySQLService
 from sqlalchemy import text
 
+_SAMPLE_DIAGNOSIS: DiagnosisResult = {
+    "root_cause": "Network partitioning",
+    "detailed_analysis": "The nodes were unable to communicate...",
+    "suggested_fix": "Check network stability",
+    "priority": "high",
+    "confidence": 0.95,
+    "related_docs": ["http://example.com/doc"],
+}
+
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group("mysql")
 class TestMySQLIntegration:
     """MySQL Service 集成测试."""
 
@@ -30,7 +41,7 @@ class TestMySQLIntegration:
                     "job_name": "Integration Test Job",
                     "job_type": "streaming",
                     "error_message": "Test error message for integration",
-                    "job_config": '{"parallelism": 2}',
+                    "job_config": orjson.dumps({"parallelism": 2}).decode(),
                 },
             )
             await session.commit()
@@ -42,9 +53,13 @@ class TestMySQLIntegration:
         assert job_info["job_id"] == "int-test-001"
         assert job_info["job_config"] == {"parallelism": 2}
 
-        # 验证数据库中状态已变为 in_progress
-        async with real_mysql_service.async_session() as session:
-            res = await session.execute(
+        # 验证用的读连接在整个生命周期内只借出一次; AUTOCOMMIT 保证每次读取
+        # 都能看到服务在其他连接上提交的最新状态
+        async with real_mysql_service.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+            # 验证数据库中状态已变为 in_progress
+            res = await conn.execute(
                 text(
                     "SELECT status FROM flink_job_exceptions WHERE job_id = 'int-test-001'"
                 )
@@ -52,23 +67,13 @@ class TestMySQLIntegration:
             status = res.scalar()
             assert status == "in_progress"
 
-        # 3. 更新诊断结果
-        diagnosis: DiagnosisResult = {
-            "root_cause": "Network partitioning",
-            "detailed_analysis": "The nodes were unable to communicate...",
-            "suggested_fix": "Check network stability",
-            "priority": "high",
-            "confidence": 0.95,
-            "related_docs": ["http://example.com/doc"],
-        }
-
-        await real_mysql_service.update_diagnosis_result(
-            exception_id=job_info["exception_id"], diagnosis=diagnosis
-        )
+            # 3. 更新诊断结果
+            await real_mysql_service.update_diagnosis_result(
+                exception_id=job_info["exception_id"], diagnosis=_SAMPLE_DIAGNOSIS
+            )
 
-        # 4. 验证最终结果
-        async with real_mysql_service.async_session() as session:
-            res = await session.execute(
+            # 4. 验证最终结果
+            res = await conn.execute(
                 text(
                     "SELECT status, diagnosis_confidence FROM flink_job_exceptions WHERE job_id = 'int-test-001'"
                 )
@@ -106,15 +111,14 @@ class TestMySQLIntegration:
     async def test_get_pending_count(self, real_mysql_service: MySQLService):
         """测试获取待处理任务计数."""
 
-        # 插入 3 条记录
+        # 插入 3 条记录 (executemany, 驱动合并为一条多行 INSERT)
         async with real_mysql_service.async_session() as session:
-            for i in range(3):
-                await session.execute(
-                    text(
-                        "INSERT INTO flink_job_exceptions (job_id, error_message, status) VALUES (:j, :e, 'pending')"
-                    ),
-                    {"j": f"job-{i}", "e": "err"},
-                )
+            await session.execute(
+                text(
+                    "INSERT INTO flink_job_exceptions (job_id, error_message, status) VALUES (:j, :e, 'pending')"
+                ),
+                [{"j": f"job-{i}", "e": "err"} for i in range(3)],
+            )
             await session.commit()
 
         count = await real_mysql_service.get_pending_count()
@@ -1,14 +1,34 @@
 """Integration tests for the diagnosis workflow."""
 
+import asyncio
 from unittest.mock import patch
 
 import pytest
 from oceanus_agent.config.settings import settings
 from oceanus_agent.models.state import DiagnosisStatus
+from oceanus_agent.services.mysql_service import MySQLService
 from oceanus_agent.workflow.graph import DiagnosisWorkflow
+from sqlalchemy import text
+
+# Fixture vectors, built once; the service never mutates its inputs
+_VEC_01 = [0.1] * 1536
+
+
+async def _insert_pending(mysql_service: MySQLService) -> None:
+    """插入一条待处理的异常记录."""
+    async with mysql_service.async_session() as session:
+        await session.execute(
+            text("""
+            INSERT INTO flink_job_exceptions
+            (job_id, job_name, error_message, status)
+            VALUES ('wf-test-001', 'Test Job', 'Checkpoint timeout', 'pending')
+        """)
+        )
+        await session.commit()
 
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group("milvus")
 class TestWorkflowIntegration:
     """Workflow 级别集成测试."""
 
@@ -17,41 +37,31 @@ class TestWorkflowIntegration:
     ):
         """测试从异常发现到结果存储的完整流程."""
 
-        # 1. Setup: 插入待处理异常和相关知识案例
-        # 1.1 在 Milvus 插入向量 (模拟已有知识)
-        await real_milvus_service.insert_case(
-            case_id="kn-001",
-            vector=[0.1] * 1536,
-            error_type="checkpoint_failure",
-            error_pattern="...",
-            root_cause="Old cause",
-            solution="Old solution",
-        )
-
-        # 1.2 在 MySQL 插入对应的元数据 (可选，取决于 Retriever 是否依赖 MySQL，目前看只依赖 Milvus)
-        # 但为了完整性，我们也可以插一条
-        await real_mysql_service.insert_knowledge_case(
-            case_id="kn-001",
-            error_type="checkpoint_failure",
-            error_pattern="...",
-            root_cause="Old cause",
-            solution="Old solution",
-            source_type="manual",
+        # 1. Setup: 并发插入待处理异常和相关知识案例 (互不依赖, 各自使用独立会话)
+        await asyncio.gather(
+            # 1.1 在 Milvus 插入向量 (模拟已有知识)
+            real_milvus_service.insert_case(
+                case_id="kn-001",
+                vector=_VEC_01,
+                error_type="checkpoint_failure",
+                error_pattern="...",
+                root_cause="Old cause",
+                solution="Old solution",
+            ),
+            # 1.2 在 MySQL 插入对应的元数据 (可选，取决于 Retriever 是否依赖 MySQL，目前看只依赖 Milvus)
+            # 但为了完整性，我们也可以插一条
+            real_mysql_service.insert_knowledge_case(
+                case_id="kn-001",
+                error_type="checkpoint_failure",
+                error_pattern="...",
+                root_cause="Old cause",
+                solution="Old solution",
+                source_type="manual",
+            ),
+            # 1.3 插入待处理的任务
+            _insert_pending(real_mysql_service),
         )
 
-        # 1.3 插入待处理的任务
-        from sqlalchemy import text
-
-        async with real_mysql_service.async_session() as session:
-            await session.execute(
-                text("""
-                INSERT INTO flink_job_exceptions
-                (job_id, job_name, error_message, status)
-                VALUES ('wf-test-001', 'Test Job', 'Checkpoint timeout', 'pending')
-            """)
-            )
-            await session.commit()
-
         # 2. 初始化工作流并替换服务为真实/模拟服务
         # 我们通过 patch 来确保 build_diagnosis_workflow 使用我们的 real services
         with (
@@ -88,6 +98,8 @@ class TestWorkflowIntegration:
 
             # 6. 断言知识积累 (如果 confidence > 0.8)
             # 在 mock_llm_service 中默认返回 confidence 0.85
+            # 知识积累在后台进行, 先等待其写入完成
+            await workflow.accumulator.flush()
 
             # 6.1 验证 MySQL 中有两条知识案例 (1条 setup, 1条 accumulated)
             async with real_mysql_service.async_session() as session:
@@ -100,7 +112,7 @@ class TestWorkflowIntegration:
             # 6.2 验证 Milvus 能搜到新案例 (使用 Strong Consistency)
             # 我们用刚才 Mock LLM 生成的 embedding 进行搜索
             search_res = await real_milvus_service.search_similar_cases(
-                query_vector=[0.1] * 1536,
+                query_vector=_VEC_01,
                 limit=10,  # 获取所有
             )
             # 应该能搜到至少 2 条 (setup 的和 accumulated 的)
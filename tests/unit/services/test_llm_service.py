@@ -1,11 +1,40 @@
 """Unit tests for LLM service."""
 
+import asyncio
+from types import SimpleNamespace
+from typing import Any
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import orjson
 import pytest
 from oceanus_agent.models.diagnosis import DiagnosisOutput, Priority
 from oceanus_agent.models.state import RetrievedContext
-from oceanus_agent.services.llm_service import LLMService
+from oceanus_agent.services.llm_service import (
+    CLASSIFIED_DIAGNOSIS_RESPONSE_FORMAT,
+    DIAGNOSIS_RESPONSE_FORMAT,
+    LLMService,
+)
+from openai import DefaultAioHttpClient
+from openai.types.shared_params import ResponseFormatJSONSchema
+
+
+ERROR_TYPES = [
+    "checkpoint_failure",
+    "backpressure",
+    "deserialization_error",
+    "oom",
+    "network",
+    "other",
+]
+
+
+def _mock_classify_response(client: Any, content: str) -> None:
+    """Make the mocked chat completion return `content`."""
+    client.chat.completions.create = AsyncMock(
+        return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+    )
 
 
 class TestLLMService:
@@ -19,11 +48,39 @@ class TestLLMService:
             service.client = AsyncMock()
             return service
 
+    def test_client_uses_aiohttp_transport(self, openai_settings: MagicMock) -> None:
+        """测试 OpenAI 客户端使用 aiohttp 传输."""
+        with patch("oceanus_agent.services.llm_service.AsyncOpenAI") as mock_cls:
+            LLMService(openai_settings)
+
+        http_client = mock_cls.call_args.kwargs["http_client"]
+        assert isinstance(http_client, DefaultAioHttpClient)
+
+    @pytest.mark.parametrize(
+        "response_format",
+        [DIAGNOSIS_RESPONSE_FORMAT, CLASSIFIED_DIAGNOSIS_RESPONSE_FORMAT],
+    )
+    def test_response_format_is_strict(
+        self, response_format: ResponseFormatJSONSchema
+    ) -> None:
+        """测试结构化输出 schema 满足 OpenAI strict 模式."""
+        json_schema = response_format["json_schema"]
+        schema = json_schema["schema"]
+        properties = schema["properties"]
+
+        assert json_schema["strict"] is True
+        assert schema["additionalProperties"] is False
+        # 默认值字段 (related_docs) 也必须列为必填
+        assert schema["required"] == list(properties)
+        assert "related_docs" in schema["required"]
+        # $ref 不能带同级关键字, 枚举须内联
+        assert all("$ref" not in prop for prop in properties.values())
+        assert properties["priority"]["enum"] == [p.value for p in Priority]
+
     @pytest.mark.asyncio
     async def test_generate_embedding_success(self, llm_service: LLMService) -> None:
         """测试 embedding 生成成功."""
-        mock_response = MagicMock()
-        mock_response.data = [MagicMock(embedding=[0.1] * 1536)]
+        mock_response = SimpleNamespace(data=[SimpleNamespace(embedding=[0.1] * 1536)])
         llm_service.client.embeddings.create = AsyncMock(return_value=mock_response)
 
         result = await llm_service.generate_embedding("test text")
@@ -31,13 +88,100 @@ class TestLLMService:
         assert len(result) == 1536
         llm_service.client.embeddings.create.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_generate_embedding_caches_identical_text(
+        self, llm_service: LLMService
+    ) -> None:
+        """测试相同文本的 embedding 命中缓存."""
+        mock_response = SimpleNamespace(data=[SimpleNamespace(embedding=[0.1] * 1536)])
+        llm_service.client.embeddings.create = AsyncMock(return_value=mock_response)
+
+        first = await llm_service.generate_embedding("same text")
+        second = await llm_service.generate_embedding("same text")
+        await llm_service.generate_embedding("other text")
+
+        assert first == second
+        assert llm_service.client.embeddings.create.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_generate_embedding_cache_evicts_lru(
+        self, llm_service: LLMService
+    ) -> None:
+        """测试 embedding 缓存超出容量时淘汰最久未使用的条目."""
+        llm_service.settings.embedding_cache_size = 2
+        mock_response = SimpleNamespace(data=[SimpleNamespace(embedding=[0.1] * 1536)])
+        llm_service.client.embeddings.create = AsyncMock(return_value=mock_response)
+
+        for text in ("a", "b", "a", "c", "a", "b"):
+            await llm_service.generate_embedding(text)
+
+        # "b" was evicted by "c", so it is requested again
+        assert llm_service.client.embeddings.create.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_generate_embedding_batches_concurrent_requests(
+        self, llm_service: LLMService
+    ) -> None:
+        """测试并发的 embedding 请求合并为一次 API 调用."""
+
+        async def fake_create(model: str, input: list[str]) -> SimpleNamespace:
+            return SimpleNamespace(
+                data=[SimpleNamespace(embedding=[float(len(t))]) for t in input]
+            )
+
+        llm_service.client.embeddings.create = AsyncMock(side_effect=fake_create)
+
+        results = await asyncio.gather(
+            *(llm_service.generate_embedding("x" * n) for n in (1, 2, 3))
+        )
+
+        assert results == [[1.0], [2.0], [3.0]]
+        llm_service.client.embeddings.create.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_generate_embedding_batch_sends_duplicates_once(
+        self, llm_service: LLMService
+    ) -> None:
+        """测试同一批次中的相同文本只请求一次."""
+
+        async def fake_create(model: str, input: list[str]) -> SimpleNamespace:
+            return SimpleNamespace(
+                data=[SimpleNamespace(embedding=[float(len(t))]) for t in input]
+            )
+
+        llm_service.client.embeddings.create = AsyncMock(side_effect=fake_create)
+
+        results = await asyncio.gather(
+            *(llm_service.generate_embedding(t) for t in ("xx", "y", "xx"))
+        )
+
+        assert results == [[2.0], [1.0], [2.0]]
+        call_kwargs = llm_service.client.embeddings.create.call_args.kwargs
+        assert call_kwargs["input"] == ["xx", "y"]
+
+    @pytest.mark.asyncio
+    async def test_generate_embedding_batch_failure_reaches_all_callers(
+        self, llm_service: LLMService, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """测试批量请求失败时所有调用方都收到异常."""
+        create_embeddings = AsyncMock(side_effect=Exception("API down"))
+        monkeypatch.setattr(llm_service, "_create_embeddings", create_embeddings)
+
+        results = await asyncio.gather(
+            llm_service.generate_embedding("a"),
+            llm_service.generate_embedding("b"),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(r, Exception) for r in results)
+        create_embeddings.assert_awaited_once()
+
     @pytest.mark.asyncio
     async def test_generate_embedding_truncates_long_text(
         self, llm_service: LLMService
     ) -> None:
         """测试长文本会被截断."""
-        mock_response = MagicMock()
-        mock_response.data = [MagicMock(embedding=[0.1] * 1536)]
+        mock_response = SimpleNamespace(data=[SimpleNamespace(embedding=[0.1] * 1536)])
         llm_service.client.embeddings.create = AsyncMock(return_value=mock_response)
 
         long_text = "x" * 10000
@@ -45,7 +189,7 @@ class TestLLMService:
 
         # 验证传入的文本被截断到 8000 字符
         call_args = llm_service.client.embeddings.create.call_args
-        assert len(call_args.kwargs["input"]) == 8000
+        assert len(call_args.kwargs["input"][0]) == 8000
 
     @pytest.mark.asyncio
     async def test_generate_diagnosis_success(
@@ -60,9 +204,14 @@ class TestLLMService:
             confidence=0.85,
             related_docs=[],
         )
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(parsed=mock_parsed))]
-        llm_service.client.beta.chat.completions.parse = AsyncMock(
+        mock_response = SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content=mock_parsed.model_dump_json())
+                )
+            ]
+        )
+        llm_service.client.chat.completions.create = AsyncMock(
             return_value=mock_response
         )
 
@@ -72,6 +221,9 @@ class TestLLMService:
         assert result["confidence"] == 0.85
         assert result["priority"] == "medium"
 
+        call_kwargs = llm_service.client.chat.completions.create.call_args.kwargs
+        assert call_kwargs["response_format"] is DIAGNOSIS_RESPONSE_FORMAT
+
     @pytest.mark.asyncio
     async def test_generate_diagnosis_with_context(
         self,
@@ -88,9 +240,14 @@ class TestLLMService:
             confidence=0.95,
             related_docs=["https://example.com"],
         )
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(parsed=mock_parsed))]
-        llm_service.client.beta.chat.completions.parse = AsyncMock(
+        mock_response = SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content=mock_parsed.model_dump_json())
+                )
+            ]
+        )
+        llm_service.client.chat.completions.create = AsyncMock(
             return_value=mock_response
         )
 
@@ -105,91 +262,228 @@ class TestLLMService:
 
     @pytest.mark.asyncio
     async def test_generate_diagnosis_raises_on_parse_failure(
-        self, llm_service: LLMService, sample_job_info: dict
+        self,
+        llm_service: LLMService,
+        sample_job_info: dict,
+        monkeypatch: pytest.MonkeyPatch,
     ) -> None:
         """测试解析失败时抛出异常（经过重试后）."""
-        from tenacity import RetryError
+        from tenacity import RetryError, wait_none
 
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(parsed=None))]
-        llm_service.client.beta.chat.completions.parse = AsyncMock(
+        # 重试不做真实的指数退避等待
+        monkeypatch.setattr(LLMService._complete_diagnosis.retry, "wait", wait_none())
+        mock_response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=None))]
+        )
+        llm_service.client.chat.completions.create = AsyncMock(
             return_value=mock_response
         )
 
+        build_request = MagicMock(wraps=llm_service._build_diagnosis_request)
+        monkeypatch.setattr(llm_service, "_build_diagnosis_request", build_request)
+
         # 由于有 tenacity 重试，最终会抛出 RetryError
         with pytest.raises(RetryError):
             await llm_service.generate_diagnosis(sample_job_info)
 
+        # 重试只重复 API 调用，prompt 只构建一次
+        assert llm_service.client.chat.completions.create.await_count == 3
+        build_request.assert_called_once()
+
     @pytest.mark.asyncio
-    async def test_classify_error_returns_valid_type(
-        self, llm_service: LLMService
+    async def test_classify_and_diagnose(
+        self, llm_service: LLMService, sample_job_info: dict
     ) -> None:
-        """测试错误分类返回有效类型."""
-        mock_response = MagicMock()
-        mock_response.choices = [
-            MagicMock(message=MagicMock(content="checkpoint_failure"))
-        ]
+        """测试一次 LLM 调用同时完成分类与诊断."""
+        mock_response = SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(
+                        content=orjson.dumps(
+                            {
+                                "error_type": "oom",
+                                "root_cause": "Heap too small",
+                                "detailed_analysis": "analysis",
+                                "suggested_fix": "Increase heap",
+                                "priority": "high",
+                                "confidence": 0.9,
+                                "related_docs": [],
+                            }
+                        ).decode()
+                    )
+                )
+            ]
+        )
         llm_service.client.chat.completions.create = AsyncMock(
             return_value=mock_response
         )
 
-        result = await llm_service.classify_error("Checkpoint failed")
+        error_type, result = await llm_service.classify_and_diagnose(sample_job_info)
+
+        assert error_type == "oom"
+        assert result["root_cause"] == "Heap too small"
+        assert "error_type" not in result
+        request = llm_service.client.chat.completions.create.call_args.kwargs
+        schema_name = request["response_format"]["json_schema"]["name"]
+        assert schema_name == "ClassifiedDiagnosisOutput"
+
+    @pytest.mark.asyncio
+    async def test_submit_diagnosis_batch(
+        self, llm_service: LLMService, sample_job_info: dict
+    ) -> None:
+        """测试提交离线批量诊断."""
+        llm_service.client.files.create = AsyncMock(
+            return_value=SimpleNamespace(id="file-1")
+        )
+        llm_service.client.batches.create = AsyncMock(
+            return_value=SimpleNamespace(id="batch-1")
+        )
+
+        batch_id = await llm_service.submit_diagnosis_batch([sample_job_info])
 
-        assert result == "checkpoint_failure"
+        assert batch_id == "batch-1"
+        _, content = llm_service.client.files.create.call_args.kwargs["file"]
+        line = orjson.loads(content.splitlines()[0])
+        assert line["custom_id"] == str(sample_job_info["exception_id"])
+        assert line["url"] == "/v1/chat/completions"
+        assert line["body"]["response_format"] == DIAGNOSIS_RESPONSE_FORMAT
+        batch_kwargs = llm_service.client.batches.create.call_args.kwargs
+        assert batch_kwargs["input_file_id"] == "file-1"
 
     @pytest.mark.asyncio
-    async def test_classify_error_normalizes_case(
+    async def test_await_diagnosis_batch_collects_results(
         self, llm_service: LLMService
     ) -> None:
-        """测试错误分类会转换为小写."""
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(content="BACKPRESSURE"))]
-        llm_service.client.chat.completions.create = AsyncMock(
-            return_value=mock_response
+        """测试等待批量诊断完成并解析结果，失败的请求被跳过."""
+        output = DiagnosisOutput(
+            root_cause="Batch cause",
+            detailed_analysis="Batch analysis",
+            suggested_fix="Batch fix",
+            priority=Priority.LOW,
+            confidence=0.7,
+        )
+        lines = [
+            {
+                "custom_id": "1",
+                "response": {
+                    "body": {
+                        "choices": [{"message": {"content": output.model_dump_json()}}]
+                    }
+                },
+            },
+            {"custom_id": "2", "response": None, "error": {"message": "bad"}},
+        ]
+        llm_service.client.batches.retrieve = AsyncMock(
+            side_effect=[
+                SimpleNamespace(status="in_progress"),
+                SimpleNamespace(status="completed", output_file_id="file-out"),
+            ]
+        )
+        llm_service.client.files.content = AsyncMock(
+            return_value=MagicMock(
+                read=MagicMock(return_value=b"\n".join(orjson.dumps(x) for x in lines))
+            )
         )
 
-        result = await llm_service.classify_error("High backpressure detected")
+        results = await llm_service.await_diagnosis_batch("batch-1", poll_interval=0)
 
-        assert result == "backpressure"
+        assert list(results) == ["1"]
+        assert results["1"]["root_cause"] == "Batch cause"
+        assert results["1"]["priority"] == "low"
 
     @pytest.mark.asyncio
-    async def test_classify_error_invalid_returns_other(
+    async def test_await_diagnosis_batch_raises_on_failed_batch(
         self, llm_service: LLMService
     ) -> None:
-        """测试无效分类返回 other."""
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(content="invalid_type"))]
-        llm_service.client.chat.completions.create = AsyncMock(
-            return_value=mock_response
+        """测试批量任务失败时抛出异常."""
+        llm_service.client.batches.retrieve = AsyncMock(
+            return_value=SimpleNamespace(status="expired")
         )
 
+        with pytest.raises(RuntimeError, match="expired"):
+            await llm_service.await_diagnosis_batch("batch-1", poll_interval=0)
+
+    @pytest.mark.asyncio
+    async def test_get_diagnosis_batch_exception_ids(
+        self, llm_service: LLMService
+    ) -> None:
+        """测试从批量任务的输入文件读取已提交的异常 ID."""
+        llm_service.client.batches.retrieve = AsyncMock(
+            return_value=SimpleNamespace(input_file_id="file-in")
+        )
+        lines = [{"custom_id": "3", "body": {}}, {"custom_id": "7", "body": {}}]
+        llm_service.client.files.content = AsyncMock(
+            return_value=MagicMock(
+                read=MagicMock(return_value=b"\n".join(orjson.dumps(x) for x in lines))
+            )
+        )
+
+        ids = await llm_service.get_diagnosis_batch_exception_ids("batch-1")
+
+        assert ids == [3, 7]
+        llm_service.client.files.content.assert_awaited_once_with("file-in")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("model_output", "expected"),
+        [
+            # 大写输出会转换为小写
+            ("BACKPRESSURE", "backpressure"),
+            # 无效分类返回 other
+            ("invalid_type", "other"),
+            *((t, t) for t in ERROR_TYPES),
+        ],
+    )
+    async def test_classify_error_uses_model_output(
+        self, llm_service: LLMService, model_output: str, expected: str
+    ) -> None:
+        """测试错误分类规范化模型输出并返回有效类型."""
+        _mock_classify_response(llm_service.client, model_output)
+
         result = await llm_service.classify_error("Unknown error")
 
-        assert result == "other"
+        assert result == expected
 
     @pytest.mark.asyncio
-    async def test_classify_error_all_valid_types(
+    async def test_classify_error_caches_repeated_message(
         self, llm_service: LLMService
     ) -> None:
-        """测试所有有效的错误类型."""
-        valid_types = [
-            "checkpoint_failure",
-            "backpressure",
-            "deserialization_error",
-            "oom",
-            "network",
-            "other",
-        ]
+        """测试重复的错误消息直接命中缓存."""
+        mock_response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="backpressure"))]
+        )
+        llm_service.client.chat.completions.create = AsyncMock(
+            return_value=mock_response
+        )
 
-        for error_type in valid_types:
-            mock_response = MagicMock()
-            mock_response.choices = [MagicMock(message=MagicMock(content=error_type))]
-            llm_service.client.chat.completions.create = AsyncMock(
-                return_value=mock_response
-            )
+        first = await llm_service.classify_error("High backpressure detected")
+        second = await llm_service.classify_error("High backpressure detected")
+
+        assert first == second == "backpressure"
+        llm_service.client.chat.completions.create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("error_message", "expected"),
+        [
+            ("java.lang.OutOfMemoryError: Java heap space", "oom"),
+            (
+                "org.apache.flink.runtime.checkpoint.CheckpointException: expired",
+                "checkpoint_failure",
+            ),
+            ("java.net.ConnectException: Connection refused", "network"),
+        ],
+    )
+    async def test_classify_error_matches_known_exceptions(
+        self, llm_service: LLMService, error_message: str, expected: str
+    ) -> None:
+        """测试已知异常类无需调用 LLM 即可分类."""
+        llm_service.client.chat.completions.create = AsyncMock()
+
+        result = await llm_service.classify_error(error_message)
 
-            result = await llm_service.classify_error("test error")
-            assert result == error_type
+        assert result == expected
+        llm_service.client.chat.completions.create.assert_not_called()
 
 
 class TestBuildContextString:
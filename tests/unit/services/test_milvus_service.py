@@ -1,10 +1,15 @@
 """Unit tests for MilvusService."""
 
+import threading
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 from oceanus_agent.config.settings import MilvusSettings
-from oceanus_agent.services.milvus_service import MilvusService
+from oceanus_agent.services.milvus_service import MilvusService, eq_filter
+
+# Fixture vectors, built once; the service never mutates its inputs
+_VEC_01 = [0.1] * 1536
 
 
 class TestMilvusService:
@@ -19,6 +24,9 @@ class TestMilvusService:
         settings.cases_collection = "flink_cases"
         settings.docs_collection = "flink_docs"
         settings.vector_dim = 1536
+        settings.index_type = "HNSW"
+        settings.vector_type = "FLOAT_VECTOR"
+        settings.executor_workers = 2
         return settings
 
     @pytest.fixture
@@ -53,6 +61,32 @@ class TestMilvusService:
             # Verify schema creation
             assert client_instance.create_schema.call_count == 2
 
+    @pytest.mark.parametrize(
+        ("index_type", "params"),
+        [
+            ("HNSW", {"M": 16, "efConstruction": 200}),
+            ("IVF_FLAT", {"nlist": 128}),
+        ],
+    )
+    def test_create_collections_uses_configured_index(
+        self, mock_settings, index_type, params
+    ):
+        """Test vector index is built with the configured index type."""
+        mock_settings.index_type = index_type
+        with patch("oceanus_agent.services.milvus_service.MilvusClient") as mock_cls:
+            client_instance = mock_cls.return_value
+            client_instance.has_collection.return_value = False
+
+            MilvusService(mock_settings).get_client()
+
+            index_params = client_instance.prepare_index_params.return_value
+            index_params.add_index.assert_called_with(
+                field_name="vector",
+                index_type=index_type,
+                metric_type="COSINE",
+                params=params,
+            )
+
     def test_init_skips_creation_if_exist(self, mock_settings):
         """Test initialization skips creation if collections exist."""
         with patch("oceanus_agent.services.milvus_service.MilvusClient") as mock_cls:
@@ -84,7 +118,7 @@ class TestMilvusService:
             ]
         ]
 
-        query_vector = [0.1] * 1536
+        query_vector = _VEC_01
         results = await milvus_service.search_similar_cases(
             query_vector, error_type="checkpoint_failure"
         )
@@ -98,6 +132,7 @@ class TestMilvusService:
         call_args = mock_client.search.call_args[1]
         assert call_args["collection_name"] == "flink_cases"
         assert call_args["filter"] == 'error_type == "checkpoint_failure"'
+        assert call_args["search_params"] == {"params": {"ef": 64}}
 
     @pytest.mark.asyncio
     async def test_search_doc_snippets(self, milvus_service, mock_client):
@@ -118,7 +153,7 @@ class TestMilvusService:
             ]
         ]
 
-        query_vector = [0.1] * 1536
+        query_vector = _VEC_01
         results = await milvus_service.search_doc_snippets(
             query_vector, category="checkpoint"
         )
@@ -133,10 +168,130 @@ class TestMilvusService:
         assert call_args["collection_name"] == "flink_docs"
         assert call_args["filter"] == 'category == "checkpoint"'
 
+    @pytest.mark.asyncio
+    async def test_float16_vectors_are_encoded(
+        self, milvus_service, mock_settings, mock_client
+    ):
+        """Test FLOAT16_VECTOR collections get half-precision vectors."""
+        mock_settings.vector_type = "FLOAT16_VECTOR"
+        mock_client.search.return_value = [[]]
+
+        await milvus_service.search_doc_snippets(_VEC_01)
+        await milvus_service.insert_doc(
+            doc_id="d1", vector=_VEC_01, title="t", content="c"
+        )
+
+        query = mock_client.search.call_args[1]["data"][0]
+        inserted = mock_client.insert.call_args[1]["data"][0]["vector"]
+        assert query.dtype == np.float16
+        assert inserted.dtype == np.float16
+
+    @pytest.mark.asyncio
+    async def test_search_cached_diagnosis(
+        self, milvus_service, mock_settings, mock_client, mocker
+    ):
+        """Test cached diagnosis lookup skips expired entries."""
+        mock_settings.diagnosis_cache_collection = "flink_diagnosis_cache"
+        mocker.patch(
+            "oceanus_agent.services.milvus_service.time.time", return_value=1000
+        )
+        cached = {"root_cause": "network", "confidence": 0.9}
+        mock_client.search.return_value = [
+            [{"entity": {"result": cached}, "distance": 0.95}]
+        ]
+
+        hit = await milvus_service.search_cached_diagnosis(_VEC_01, "network")
+
+        assert hit == (cached, 0.95)
+        call_args = mock_client.search.call_args[1]
+        assert call_args["collection_name"] == "flink_diagnosis_cache"
+        assert call_args["filter"] == 'expires_at > 1000 and error_type == "network"'
+        assert call_args["limit"] == 1
+
+    @pytest.mark.asyncio
+    async def test_search_runs_on_milvus_thread_pool(self, milvus_service, mock_client):
+        """Test blocking searches run off the event loop on the Milvus pool."""
+        thread_names = []
+        mock_client.search.side_effect = lambda **_: (
+            thread_names.append(threading.current_thread().name) or [[]]
+        )
+
+        await milvus_service.search_doc_snippets(_VEC_01)
+
+        assert thread_names[0].startswith("milvus")
+
+    @pytest.mark.asyncio
+    async def test_insert_runs_on_milvus_thread_pool(self, milvus_service, mock_client):
+        """Test blocking inserts run off the event loop on the Milvus pool."""
+        thread_names = []
+        mock_client.insert.side_effect = lambda **_: thread_names.append(
+            threading.current_thread().name
+        )
+
+        await milvus_service.insert_cases(
+            [
+                {
+                    "case_id": "case-new",
+                    "vector": _VEC_01,
+                    "error_type": "oom",
+                    "error_pattern": "OOM error",
+                    "root_cause": "Bad config",
+                    "solution": "Fix config",
+                }
+            ]
+        )
+
+        assert thread_names[0].startswith("milvus")
+
+    @pytest.mark.asyncio
+    async def test_connect_runs_on_milvus_thread_pool(
+        self, milvus_service, mock_client
+    ):
+        """Test connecting (and ensuring collections) runs on the Milvus pool."""
+        thread_names = []
+        mock_client.has_collection.side_effect = lambda *_, **__: (
+            thread_names.append(threading.current_thread().name) or True
+        )
+
+        await milvus_service.connect()
+
+        assert milvus_service.client is mock_client
+        assert thread_names
+        assert all(name.startswith("milvus") for name in thread_names)
+
+    @pytest.mark.asyncio
+    async def test_query_cases_by_error_type(self, milvus_service, mock_client):
+        """Test metadata-only case lookup by error type."""
+        mock_client.query.return_value = [
+            {
+                "case_id": "case-1",
+                "error_type": "oom",
+                "error_pattern": "p",
+                "root_cause": "r",
+                "solution": "s",
+            }
+        ]
+
+        cases = await milvus_service.query_cases_by_error_type("oom", limit=2)
+
+        assert cases[0]["case_id"] == "case-1"
+        assert cases[0]["similarity_score"] == 0.0
+        call_args = mock_client.query.call_args[1]
+        assert call_args["filter"] == 'error_type == "oom"'
+        assert call_args["limit"] == 2
+
+    def test_eq_filter_escapes_quotes(self):
+        """Test filter values cannot break out of the string literal."""
+        assert eq_filter("error_type", "oom") == 'error_type == "oom"'
+        assert (
+            eq_filter("error_type", 'x" || error_type != "')
+            == 'error_type == "x\\" || error_type != \\""'
+        )
+
     @pytest.mark.asyncio
     async def test_insert_case(self, milvus_service, mock_client):
         """Test inserting a case."""
-        vector = [0.1] * 1536
+        vector = _VEC_01
         await milvus_service.insert_case(
             case_id="case-new",
             vector=vector,
@@ -149,12 +304,37 @@ class TestMilvusService:
         mock_client.insert.assert_called_once()
         call_args = mock_client.insert.call_args[1]
         assert call_args["collection_name"] == "flink_cases"
+        assert len(call_args["data"]) == 1
         assert call_args["data"][0]["case_id"] == "case-new"
 
+    @pytest.mark.asyncio
+    async def test_insert_cases_batches(self, milvus_service, mock_client):
+        """Test many cases go to Milvus in a single insert request."""
+        cases = [
+            {
+                "case_id": f"case-{i}",
+                "vector": _VEC_01,
+                "error_type": "oom",
+                "error_pattern": "OOM error",
+                "root_cause": "Bad config",
+                "solution": "Fix config",
+            }
+            for i in range(5)
+        ]
+
+        await milvus_service.insert_cases(cases)
+
+        mock_client.insert.assert_called_once()
+        call_args = mock_client.insert.call_args[1]
+        assert call_args["collection_name"] == "flink_cases"
+        assert [e["case_id"] for e in call_args["data"]] == [
+            f"case-{i}" for i in range(5)
+        ]
+
     @pytest.mark.asyncio
     async def test_insert_doc(self, milvus_service, mock_client):
         """Test inserting a document."""
-        vector = [0.1] * 1536
+        vector = _VEC_01
         await milvus_service.insert_doc(
             doc_id="doc-new",
             vector=vector,
@@ -167,8 +347,27 @@ class TestMilvusService:
         mock_client.insert.assert_called_once()
         call_args = mock_client.insert.call_args[1]
         assert call_args["collection_name"] == "flink_docs"
+        assert len(call_args["data"]) == 1
         assert call_args["data"][0]["doc_id"] == "doc-new"
 
+    @pytest.mark.asyncio
+    async def test_insert_docs_chunks_large_batches(
+        self, milvus_service, mock_client, mocker
+    ):
+        """Test bulk inserts are split into chunks of INSERT_BATCH_SIZE."""
+        mocker.patch("oceanus_agent.services.milvus_service.INSERT_BATCH_SIZE", 2)
+        docs = [
+            {"doc_id": f"doc-{i}", "vector": _VEC_01, "title": "t", "content": "c"}
+            for i in range(5)
+        ]
+
+        await milvus_service.insert_docs(docs)
+
+        chunks = [call[1]["data"] for call in mock_client.insert.call_args_list]
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert chunks[2][0]["doc_id"] == "doc-4"
+        assert chunks[0][0]["doc_url"] == ""
+
     def test_get_collection_stats(self, milvus_service, mock_client):
         """Test getting collection statistics."""
         # Mock describe_collection
@@ -176,14 +375,15 @@ class TestMilvusService:
             "description": "Test Collection"
         }
 
-        # Mock query for count
-        mock_client.query.return_value = [{"count(*)": 100}]
+        # Mock metadata row count
+        mock_client.get_collection_stats.return_value = {"row_count": 100}
 
         stats = milvus_service.get_collection_stats()
 
         assert "flink_cases" in stats
         assert "flink_docs" in stats
         assert stats["flink_cases"]["num_entities"] == 100
+        mock_client.query.assert_not_called()
 
     def test_close(self, milvus_service, mock_client):
         """Test closing connection."""
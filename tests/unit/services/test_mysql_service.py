@@ -1,11 +1,60 @@
 """Unit tests for MySQL service."""
 
+from collections.abc import Iterator
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from oceanus_agent.models.state import DiagnosisResult
-from oceanus_agent.services.mysql_service import MySQLService
+from oceanus_agent.services.mysql_service import (
+    ERROR_MESSAGE_MAX_CHARS,
+    MySQLService,
+    pattern_hash,
+)
+
+
+# flink_job_exceptions rows as returned by SELECT_PENDING_QUERY
+_CREATED_AT = datetime(2024, 1, 1)
+_ROW_OK = (
+    1,  # id
+    "job-123",  # job_id
+    "Test Job",  # job_name
+    "streaming",  # job_type
+    '{"parallelism": 4}',  # job_config (JSON string)
+    "Checkpoint failed",  # error_message
+    "checkpoint_failure",  # error_type
+    _CREATED_AT,  # created_at
+)
+_ROW_BAD_JSON = (
+    1,
+    "job-123",
+    "Test Job",
+    "streaming",
+    "invalid json",  # 无效的 JSON
+    "Error message",
+    "other",
+    _CREATED_AT,
+)
+
+
+def _async_cm_factory(value: object) -> MagicMock:
+    """Mock a factory (async_session, engine.connect) of `async with` contexts."""
+    return MagicMock(
+        return_value=AsyncMock(
+            __aenter__=AsyncMock(return_value=value),
+            __aexit__=AsyncMock(return_value=None),
+        )
+    )
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _mock_create_engine() -> Iterator[MagicMock]:
+    """Patch the engine factory once for the module; tests that assert on
+    the engine replace it with their own mock."""
+    with patch(
+        "oceanus_agent.services.mysql_service.create_async_engine"
+    ) as create_engine:
+        yield create_engine
 
 
 class TestMySQLService:
@@ -14,9 +63,7 @@ class TestMySQLService:
     @pytest.fixture
     def mysql_service(self, mysql_settings: MagicMock) -> MySQLService:
         """Create MySQL service with mocked engine."""
-        with patch("oceanus_agent.services.mysql_service.create_async_engine"):
-            service = MySQLService(mysql_settings)
-            return service
+        return MySQLService(mysql_settings)
 
     @pytest.fixture
     def mock_session(self) -> AsyncMock:
@@ -27,92 +74,90 @@ class TestMySQLService:
         return session
 
     @pytest.mark.asyncio
-    async def test_get_pending_exception_found(
-        self, mysql_service: MySQLService, mock_session: AsyncMock
+    @pytest.mark.parametrize(
+        ("rows", "expected"),
+        [
+            pytest.param(
+                [_ROW_OK],
+                {
+                    "exception_id": 1,
+                    "job_id": "job-123",
+                    "job_name": "Test Job",
+                    "job_config": {"parallelism": 4},
+                    "error_type": "checkpoint_failure",
+                },
+                id="found",
+            ),
+            pytest.param([], None, id="not_found"),
+            pytest.param(
+                [_ROW_BAD_JSON],
+                {"job_config": {}},  # 应该返回空字典
+                id="invalid_json",
+            ),
+        ],
+    )
+    async def test_get_pending_exception(
+        self,
+        mysql_service: MySQLService,
+        mock_session: AsyncMock,
+        rows: list[tuple],
+        expected: dict | None,
     ) -> None:
-        """测试获取待处理异常 - 找到记录."""
-        # 模拟数据库返回结果
-        mock_row = (
-            1,  # id
-            "job-123",  # job_id
-            "Test Job",  # job_name
-            "streaming",  # job_type
-            '{"parallelism": 4}',  # job_config (JSON string)
-            "Checkpoint failed",  # error_message
-            "checkpoint_failure",  # error_type
-            datetime(2024, 1, 1),  # created_at
-        )
+        """测试获取待处理异常: 找到记录 / 无记录 / 无效的 JSON config."""
         mock_result = MagicMock()
-        mock_result.fetchone = MagicMock(return_value=mock_row)
+        mock_result.fetchall = MagicMock(return_value=rows)
         mock_session.execute = AsyncMock(return_value=mock_result)
 
-        # 使用 context manager mock
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
-        )
+        mysql_service.async_session = _async_cm_factory(mock_session)
 
         result = await mysql_service.get_pending_exception()
 
-        assert result is not None
-        assert result["exception_id"] == 1
-        assert result["job_id"] == "job-123"
-        assert result["job_name"] == "Test Job"
-        assert result["job_config"] == {"parallelism": 4}
-        assert result["error_type"] == "checkpoint_failure"
+        if expected is None:
+            assert result is None
+        else:
+            assert result is not None
+            assert {key: result[key] for key in expected} == expected
 
     @pytest.mark.asyncio
-    async def test_get_pending_exception_not_found(
+    async def test_get_pending_exceptions_claims_batch(
         self, mysql_service: MySQLService, mock_session: AsyncMock
     ) -> None:
-        """测试获取待处理异常 - 无记录."""
+        """测试批量领取待处理异常 - 单条 UPDATE 标记全部记录."""
+        mock_rows = [
+            (i, f"job-{i}", "Test Job", "streaming", "{}", "Error", "other", None)
+            for i in (1, 2, 3)
+        ]
         mock_result = MagicMock()
-        mock_result.fetchone = MagicMock(return_value=None)
+        mock_result.fetchall = MagicMock(return_value=mock_rows)
         mock_session.execute = AsyncMock(return_value=mock_result)
 
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
-        )
+        mysql_service.async_session = _async_cm_factory(mock_session)
 
-        result = await mysql_service.get_pending_exception()
+        result = await mysql_service.get_pending_exceptions(3)
 
-        assert result is None
+        assert [job["exception_id"] for job in result] == [1, 2, 3]
+        assert mock_session.execute.call_count == 2
+        assert mock_session.execute.call_args_list[0][0][1] == {
+            "limit": 3,
+            "error_message_chars": ERROR_MESSAGE_MAX_CHARS,
+        }
+        assert mock_session.execute.call_args_list[1][0][1] == {"ids": [1, 2, 3]}
+        mock_session.commit.assert_called_once()
 
     @pytest.mark.asyncio
-    async def test_get_pending_exception_handles_invalid_json(
+    async def test_release_exceptions(
         self, mysql_service: MySQLService, mock_session: AsyncMock
     ) -> None:
-        """测试处理无效的 JSON config."""
-        mock_row = (
-            1,
-            "job-123",
-            "Test Job",
-            "streaming",
-            "invalid json",  # 无效的 JSON
-            "Error message",
-            "other",
-            datetime(2024, 1, 1),
-        )
-        mock_result = MagicMock()
-        mock_result.fetchone = MagicMock(return_value=mock_row)
-        mock_session.execute = AsyncMock(return_value=mock_result)
+        """测试将已认领的异常放回 pending, 空列表不访问数据库."""
+        mysql_service.async_session = _async_cm_factory(mock_session)
 
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
-        )
+        await mysql_service.release_exceptions([])
+        mock_session.execute.assert_not_called()
 
-        result = await mysql_service.get_pending_exception()
+        await mysql_service.release_exceptions([1, 2])
 
-        assert result is not None
-        assert result["job_config"] == {}  # 应该返回空字典
+        assert mock_session.execute.call_args[0][1] == {"ids": [1, 2]}
+        mock_session.commit.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_update_diagnosis_result(
@@ -122,12 +167,7 @@ class TestMySQLService:
         sample_diagnosis_result: DiagnosisResult,
     ) -> None:
         """测试更新诊断结果."""
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
-        )
+        mysql_service.async_session = _async_cm_factory(mock_session)
 
         await mysql_service.update_diagnosis_result(
             exception_id=1,
@@ -140,23 +180,16 @@ class TestMySQLService:
         mock_session.commit.assert_called_once()
 
         # 验证传入的参数
-        call_args = mock_session.execute.call_args
-        params = call_args[0][1]
-        assert params["id"] == 1
-        assert params["status"] == "completed"
-        assert params["confidence"] == 0.9
+        params = mock_session.execute.call_args[0][1]
+        expected = {"id": 1, "status": "completed", "confidence": 0.9}
+        assert {key: params[key] for key in expected} == expected
 
     @pytest.mark.asyncio
     async def test_mark_exception_failed(
         self, mysql_service: MySQLService, mock_session: AsyncMock
     ) -> None:
         """测试标记异常失败."""
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
-        )
+        mysql_service.async_session = _async_cm_factory(mock_session)
 
         await mysql_service.mark_exception_failed(
             exception_id=1,
@@ -167,107 +200,177 @@ class TestMySQLService:
         mock_session.commit.assert_called_once()
 
         # 验证错误消息被序列化为 JSON
-        call_args = mock_session.execute.call_args
-        params = call_args[0][1]
-        assert params["id"] == 1
-        assert "LLM timeout" in params["error_message"]
+        params = mock_session.execute.call_args[0][1]
+        expected = {"id": 1, "suggested_fix": '{"error":"LLM timeout"}'}
+        assert {key: params[key] for key in expected} == expected
 
     @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("case", "expected"),
+        [
+            pytest.param(
+                {
+                    "case_id": "case-001",
+                    "error_type": "checkpoint_failure",
+                    "error_pattern": "Checkpoint failed after <NUM> retries",
+                    "root_cause": "State backend timeout",
+                    "solution": "Increase timeout",
+                    "source_exception_id": 1,
+                    "source_type": "auto",
+                },
+                {
+                    "case_id": "case-001",
+                    "error_type": "checkpoint_failure",
+                    "source_exception_id": 1,
+                    "source_type": "auto",
+                },
+                id="auto",
+            ),
+            pytest.param(
+                {
+                    "case_id": "case-002",
+                    "error_type": "oom",
+                    "error_pattern": "OutOfMemoryError",
+                    "root_cause": "Heap size too small",
+                    "solution": "Increase heap size",
+                    "source_type": "manual",
+                },
+                {"source_type": "manual", "source_exception_id": None},
+                id="manual",
+            ),
+        ],
+    )
     async def test_insert_knowledge_case(
-        self, mysql_service: MySQLService, mock_session: AsyncMock
+        self,
+        mysql_service: MySQLService,
+        mock_session: AsyncMock,
+        case: dict,
+        expected: dict,
     ) -> None:
-        """测试插入知识案例."""
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
-        )
+        """测试插入自动 / 手工知识案例."""
+        mysql_service.async_session = _async_cm_factory(mock_session)
 
-        await mysql_service.insert_knowledge_case(
-            case_id="case-001",
-            error_type="checkpoint_failure",
-            error_pattern="Checkpoint failed after <NUM> retries",
-            root_cause="State backend timeout",
-            solution="Increase timeout",
-            source_exception_id=1,
-            source_type="auto",
-        )
+        await mysql_service.insert_knowledge_case(**case)
 
         mock_session.execute.assert_called_once()
         mock_session.commit.assert_called_once()
 
-        call_args = mock_session.execute.call_args
-        params = call_args[0][1]
-        assert params["case_id"] == "case-001"
-        assert params["error_type"] == "checkpoint_failure"
-        assert params["source_type"] == "auto"
+        params = mock_session.execute.call_args[0][1]
+        assert {key: params[key] for key in expected} == expected
 
     @pytest.mark.asyncio
-    async def test_insert_knowledge_case_manual(
+    async def test_insert_knowledge_cases(
         self, mysql_service: MySQLService, mock_session: AsyncMock
     ) -> None:
-        """测试插入手工知识案例."""
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
+        """测试批量插入知识案例只执行一次 executemany."""
+        mysql_service.async_session = _async_cm_factory(mock_session)
+
+        await mysql_service.insert_knowledge_cases(
+            [
+                {
+                    "case_id": f"case-{i}",
+                    "error_type": "oom",
+                    "error_pattern": "OutOfMemoryError",
+                    "root_cause": "Heap size too small",
+                    "solution": "Increase heap size",
+                    "source_exception_id": i,
+                }
+                for i in range(3)
+            ]
         )
 
-        await mysql_service.insert_knowledge_case(
-            case_id="case-002",
-            error_type="oom",
-            error_pattern="OutOfMemoryError",
-            root_cause="Heap size too small",
-            solution="Increase heap size",
-            source_type="manual",
-        )
+        mock_session.execute.assert_called_once()
+        mock_session.commit.assert_called_once()
+        params = mock_session.execute.call_args[0][1]
+        assert [p["case_id"] for p in params] == ["case-0", "case-1", "case-2"]
+        assert all(p["source_type"] == "auto" for p in params)
+        assert params[0]["pattern_hash"] == pattern_hash("OutOfMemoryError")
+        assert all(p["seen_count"] == 1 for p in params)
 
-        call_args = mock_session.execute.call_args
-        params = call_args[0][1]
-        assert params["source_type"] == "manual"
-        assert params["source_exception_id"] is None
+    def test_pattern_hash_matches_mysql_md5(self) -> None:
+        """测试模式哈希与 MySQL MD5() 一致, 以便用 SQL 回填已有案例."""
+        # SELECT MD5('abc')
+        assert pattern_hash("abc") == "900150983cd24fb0d6963f7d28e17f72"
 
     @pytest.mark.asyncio
-    async def test_get_pending_count(
+    async def test_bump_case_seen_count(
         self, mysql_service: MySQLService, mock_session: AsyncMock
     ) -> None:
-        """测试获取待处理数量."""
-        mock_result = MagicMock()
-        mock_result.scalar = MagicMock(return_value=5)
-        mock_session.execute = AsyncMock(return_value=mock_result)
+        """测试按错误模式哈希累加已有案例的出现次数."""
+        mysql_service.async_session = _async_cm_factory(mock_session)
+        mock_session.execute.return_value = MagicMock(rowcount=1)
 
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
-        )
+        assert await mysql_service.bump_case_seen_count("OutOfMemoryError") is True
 
-        count = await mysql_service.get_pending_count()
+        params = mock_session.execute.call_args[0][1]
+        assert params == {"pattern_hash": pattern_hash("OutOfMemoryError")}
+        mock_session.commit.assert_called_once()
 
-        assert count == 5
+        mock_session.execute.return_value = MagicMock(rowcount=0)
+        assert await mysql_service.bump_case_seen_count("new pattern") is False
 
     @pytest.mark.asyncio
-    async def test_get_pending_count_zero(
-        self, mysql_service: MySQLService, mock_session: AsyncMock
+    @pytest.mark.parametrize(
+        ("scalar", "expected"),
+        [pytest.param(5, 5, id="pending"), pytest.param(None, 0, id="zero")],
+    )
+    async def test_get_pending_count(
+        self, mysql_service: MySQLService, scalar: int | None, expected: int
     ) -> None:
-        """测试获取待处理数量为零."""
+        """测试获取待处理数量 (无记录时为零)."""
         mock_result = MagicMock()
-        mock_result.scalar = MagicMock(return_value=None)
-        mock_session.execute = AsyncMock(return_value=mock_result)
-
-        mysql_service.async_session = MagicMock(
-            return_value=AsyncMock(
-                __aenter__=AsyncMock(return_value=mock_session),
-                __aexit__=AsyncMock(return_value=None),
-            )
-        )
+        mock_result.scalar = MagicMock(return_value=scalar)
+        mock_conn = AsyncMock()
+        mock_conn.execute = AsyncMock(return_value=mock_result)
+        mysql_service.engine = MagicMock()
+        mysql_service.engine.connect = _async_cm_factory(mock_conn)
 
         count = await mysql_service.get_pending_count()
 
-        assert count == 0
+        assert count == expected
+
+    def test_engine_pool_uses_settings(
+        self, mysql_settings, _mock_create_engine: MagicMock
+    ) -> None:
+        """测试连接池参数来自配置."""
+        _mock_create_engine.reset_mock()
+
+        MySQLService(mysql_settings)
+
+        kwargs = _mock_create_engine.call_args.kwargs
+        assert kwargs["pool_size"] == mysql_settings.pool_size
+        assert kwargs["max_overflow"] == mysql_settings.max_overflow
+        assert kwargs["pool_recycle"] == mysql_settings.pool_recycle_seconds
+        assert kwargs["pool_use_lifo"] is True
+
+    @pytest.mark.asyncio
+    async def test_injected_engine_is_shared(
+        self, mysql_settings, _mock_create_engine: MagicMock
+    ) -> None:
+        """测试注入的 engine 被复用且关闭服务时不释放."""
+        engine = AsyncMock()
+        _mock_create_engine.reset_mock()
+
+        service = MySQLService(mysql_settings, engine=engine)
+
+        _mock_create_engine.assert_not_called()
+        assert service.engine is engine
+
+        await service.close()
+        engine.dispose.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_ping(self, mysql_service: MySQLService) -> None:
+        """测试连通性检查使用裸连接而非 Session."""
+        mock_conn = AsyncMock()
+        mysql_service.engine = MagicMock()
+        mysql_service.engine.connect = _async_cm_factory(mock_conn)
+        mysql_service.async_session = MagicMock()
+
+        await mysql_service.ping()
+
+        mock_conn.execute.assert_awaited_once()
+        mysql_service.async_session.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_close(self, mysql_service: MySQLService) -> None:
@@ -0,0 +1,304 @@
+"""Unit tests for DiagnosisAgent."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import structlog
+from oceanus_agent.agent import DiagnosisAgent, next_run_time
+from oceanus_agent.config.settings import SchedulerSettings, Settings
+from oceanus_agent.models.state import DiagnosisStatus
+
+
+class TestDiagnosisAgent:
+    """DiagnosisAgent 单元测试."""
+
+    @pytest.fixture
+    def agent_settings(self) -> Settings:
+        """Settings with a small batch for testing."""
+        return Settings(
+            scheduler=SchedulerSettings(
+                interval_seconds=60, batch_size=4, max_concurrency=2
+            )
+        )
+
+    @pytest.fixture
+    def agent(self, agent_settings: Settings) -> DiagnosisAgent:
+        """Create DiagnosisAgent with a mocked workflow."""
+        with patch("oceanus_agent.agent.DiagnosisWorkflow") as mock_workflow_cls:
+            mock_workflow_cls.return_value = MagicMock(
+                run=AsyncMock(),
+                close=AsyncMock(),
+                count_pending=AsyncMock(return_value=100),
+            )
+            return DiagnosisAgent(agent_settings)
+
+    @pytest.mark.asyncio
+    async def test_run_diagnosis_batch_runs_batch_size_workflows(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试批次会运行 batch_size 次工作流."""
+        agent.workflow.run.return_value = {
+            "job_info": {"job_id": "job-1"},
+            "diagnosis_result": {"confidence": 0.9},
+            "status": DiagnosisStatus.COMPLETED,
+        }
+
+        await agent.run_diagnosis_batch()
+
+        assert agent.workflow.run.call_count == 4
+        thread_ids = {call.args[0] for call in agent.workflow.run.call_args_list}
+        assert len(thread_ids) == 4
+
+    @pytest.mark.asyncio
+    async def test_run_diagnosis_batch_skips_idle_tick(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试没有待处理异常时不启动任何工作流."""
+        agent.workflow.count_pending.return_value = 0
+
+        await agent.run_diagnosis_batch()
+
+        agent.workflow.run.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_run_diagnosis_batch_sized_by_pending_count(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试待处理数少于 batch_size 时只启动相应数量的工作流."""
+        agent.workflow.count_pending.return_value = 2
+        agent.workflow.run.return_value = {
+            "job_info": {"job_id": "job-1"},
+            "diagnosis_result": {"confidence": 0.9},
+            "status": DiagnosisStatus.COMPLETED,
+        }
+
+        await agent.run_diagnosis_batch()
+
+        assert agent.workflow.run.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_run_diagnosis_batch_respects_max_concurrency(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试并发数不超过 max_concurrency."""
+        in_flight = 0
+        peak = 0
+
+        async def fake_run(thread_id: str) -> dict:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return {"job_info": None, "status": DiagnosisStatus.COMPLETED}
+
+        agent.workflow.run.side_effect = fake_run
+
+        await agent.run_diagnosis_batch()
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_run_diagnosis_batch_isolates_failures(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试单个工作流异常不会中断整个批次."""
+        completed = {
+            "job_info": {"job_id": "job-1"},
+            "diagnosis_result": {"confidence": 0.9},
+            "status": DiagnosisStatus.COMPLETED,
+        }
+        agent.workflow.run.side_effect = [
+            Exception("boom"),
+            completed,
+            completed,
+            completed,
+        ]
+
+        # Should not raise
+        await agent.run_diagnosis_batch()
+
+        assert agent.workflow.run.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_run_diagnosis_batch_skips_runs_after_queue_drained(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试队列为空后剩余的运行会被跳过."""
+        agent.settings.scheduler.max_concurrency = 1
+        agent.workflow.run.return_value = {
+            "job_info": None,
+            "status": DiagnosisStatus.COMPLETED,
+        }
+
+        await agent.run_diagnosis_batch()
+
+        agent.workflow.run.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_run_diagnosis_batch_binds_batch_id_to_log_context(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试批次运行期间 batch_id 绑定到日志上下文."""
+        seen: list[str] = []
+
+        async def fake_run(thread_id: str) -> dict:
+            seen.append(structlog.contextvars.get_contextvars()["batch_id"])
+            return {"job_info": None, "status": DiagnosisStatus.COMPLETED}
+
+        agent.workflow.run.side_effect = fake_run
+
+        await agent.run_diagnosis_batch()
+
+        assert seen
+        assert seen[0].startswith("batch_1_")
+        assert "batch_id" not in structlog.contextvars.get_contextvars()
+
+    @pytest.mark.asyncio
+    async def test_stop_wakes_start(self, agent: DiagnosisAgent) -> None:
+        """测试 stop() 会立即唤醒阻塞中的 start()."""
+        batch_done = asyncio.Event()
+        agent.run_diagnosis_batch = AsyncMock(  # type: ignore[method-assign]
+            side_effect=batch_done.set
+        )
+
+        task = asyncio.create_task(agent.start())
+        # 等第一批完成, start() 进入两次批次之间的等待
+        await asyncio.wait_for(batch_done.wait(), timeout=1)
+        await agent.stop()
+
+        await asyncio.wait_for(task, timeout=1)
+        agent.run_diagnosis_batch.assert_awaited_once()
+        agent.workflow.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_start_keeps_running_batches_on_error(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试定时循环在批次异常后继续运行."""
+        agent.settings.scheduler.interval_seconds = 0
+        calls = 0
+
+        async def flaky_batch() -> None:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise Exception("boom")
+            if calls == 3:
+                await agent.stop()
+
+        agent.run_diagnosis_batch = flaky_batch  # type: ignore[method-assign]
+
+        await asyncio.wait_for(agent.start(), timeout=1)
+
+        assert calls == 3
+
+    @pytest.mark.asyncio
+    async def test_start_scheduler_runs_in_background(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试 start_scheduler() 立即返回并在后台运行批次."""
+        batch_started = asyncio.Event()
+
+        async def fake_batch() -> None:
+            batch_started.set()
+
+        agent.run_diagnosis_batch = fake_batch  # type: ignore[method-assign]
+
+        await agent.start_scheduler()
+        await asyncio.wait_for(batch_started.wait(), timeout=1)
+
+        await agent.stop()
+        assert agent._scheduler_task is None
+        agent.workflow.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_start_scheduler_is_idempotent(self, agent: DiagnosisAgent) -> None:
+        """测试重复调用 start_scheduler() 不会启动第二个循环."""
+        agent.run_diagnosis_batch = AsyncMock()  # type: ignore[method-assign]
+
+        await agent.start_scheduler()
+        first_task = agent._scheduler_task
+        await agent.start_scheduler()
+
+        assert agent._scheduler_task is first_task
+        with pytest.raises(RuntimeError):
+            await agent.start()
+
+        await agent.stop()
+        assert not agent.scheduler_running
+
+    @pytest.mark.asyncio
+    async def test_start_scheduler_refused_while_start_running(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试 start() 运行期间 start_scheduler() 不会启动第二个循环."""
+        batch_started = asyncio.Event()
+
+        async def fake_batch() -> None:
+            batch_started.set()
+
+        agent.run_diagnosis_batch = fake_batch  # type: ignore[method-assign]
+
+        start_task = asyncio.create_task(agent.start())
+        await asyncio.wait_for(batch_started.wait(), timeout=1)
+        loop_task = agent._scheduler_task
+
+        assert agent.scheduler_running
+        await agent.start_scheduler()
+        assert agent._scheduler_task is loop_task
+
+        await agent.stop()
+        await asyncio.wait_for(start_task, timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_stop_waits_for_batch_started_by_start(
+        self, agent: DiagnosisAgent
+    ) -> None:
+        """测试 stop() 等待 start() 中正在运行的批次结束后再关闭工作流."""
+        batch_started = asyncio.Event()
+        release = asyncio.Event()
+        events: list[str] = []
+
+        async def slow_batch() -> None:
+            batch_started.set()
+            await release.wait()
+            events.append("batch_done")
+
+        agent.run_diagnosis_batch = slow_batch  # type: ignore[method-assign]
+        agent.workflow.close.side_effect = lambda: events.append("closed")
+
+        start_task = asyncio.create_task(agent.start())
+        await asyncio.wait_for(batch_started.wait(), timeout=1)
+
+        stop_task = asyncio.create_task(agent.stop())
+        await asyncio.sleep(0.01)
+        agent.workflow.close.assert_not_awaited()
+
+        release.set()
+        await asyncio.wait_for(stop_task, timeout=1)
+        await asyncio.wait_for(start_task, timeout=1)
+        assert events == ["batch_done", "closed"]
+
+
+class TestNextRunTime:
+    """next_run_time 单元测试."""
+
+    def test_on_time_batch_keeps_fixed_rate(self) -> None:
+        """测试批次未超时时按固定频率调度，不累积漂移."""
+        assert next_run_time(100.0, 130.0, 60, 0) == (160.0, 0)
+
+    def test_overrun_runs_next_immediately_and_skips_missed(self) -> None:
+        """测试批次超时后立即运行一次并跳过其余错过的周期."""
+        # Batch scheduled at 100 finished at 250: ticks 160 and 220 were missed
+        assert next_run_time(100.0, 250.0, 60, 0) == (220.0, 1)
+
+    def test_overrun_catches_up_to_max_catchup(self) -> None:
+        """测试 max_catchup 允许补跑的周期数."""
+        assert next_run_time(100.0, 250.0, 60, 1) == (160.0, 0)
+        assert next_run_time(100.0, 400.0, 60, 2) == (280.0, 2)
+
+    def test_zero_interval(self) -> None:
+        """测试间隔为 0 时不跳过任何周期."""
+        assert next_run_time(100.0, 105.0, 0, 0) == (100.0, 0)
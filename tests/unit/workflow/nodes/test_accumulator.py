@@ -1,5 +1,6 @@
 """Unit tests for KnowledgeAccumulator node."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -7,7 +8,13 @@ from oceanus_agent.config.settings import KnowledgeSettings
 from oceanus_agent.services.llm_service import LLMService
 from oceanus_agent.services.milvus_service import MilvusService
 from oceanus_agent.services.mysql_service import MySQLService
-from oceanus_agent.workflow.nodes.accumulator import KnowledgeAccumulator
+from oceanus_agent.workflow.nodes.accumulator import (
+    KnowledgeAccumulator,
+    extract_error_pattern,
+)
+
+# Fixture embedding, built once; the nodes never mutate query vectors
+_VEC_01 = [0.1] * 1536
 
 
 class TestKnowledgeAccumulator:
@@ -27,14 +34,18 @@ class TestKnowledgeAccumulator:
         """Mock KnowledgeSettings."""
         settings = MagicMock(spec=KnowledgeSettings)
         settings.confidence_threshold = 0.8
+        settings.accumulate_batch_size = 1
+        settings.accumulate_flush_seconds = 5.0
+        settings.reuse_query_embedding = False
         return settings
 
     @pytest.fixture
     def accumulator(self, mock_services, mock_settings):
         """Create KnowledgeAccumulator instance."""
         mock_services["llm"].generate_embedding = AsyncMock()
-        mock_services["milvus"].insert_case = AsyncMock()
-        mock_services["mysql"].insert_knowledge_case = AsyncMock()
+        mock_services["milvus"].insert_cases = AsyncMock()
+        mock_services["mysql"].insert_knowledge_cases = AsyncMock()
+        mock_services["mysql"].bump_case_seen_count = AsyncMock(return_value=False)
 
         return KnowledgeAccumulator(
             mock_services["mysql"],
@@ -60,12 +71,16 @@ class TestKnowledgeAccumulator:
             },
         }
 
-        mock_services["llm"].generate_embedding.return_value = [0.1] * 1536
+        mock_services["llm"].generate_embedding.return_value = _VEC_01
 
         await accumulator(state)
+        await accumulator.flush()
 
-        mock_services["milvus"].insert_case.assert_called_once()
-        mock_services["mysql"].insert_knowledge_case.assert_called_once()
+        mock_services["milvus"].insert_cases.assert_awaited_once()
+        mock_services["mysql"].insert_knowledge_cases.assert_awaited_once()
+        (mysql_cases,) = mock_services["mysql"].insert_knowledge_cases.call_args[0]
+        assert mysql_cases[0]["source_exception_id"] == 1
+        assert mysql_cases[0]["error_type"] == "checkpoint"
 
     @pytest.mark.asyncio
     async def test_skip_low_confidence(self, accumulator, mock_services):
@@ -77,10 +92,13 @@ class TestKnowledgeAccumulator:
             },
         }
 
-        await accumulator(state)
+        assert await accumulator(state) == {}
 
-        mock_services["milvus"].insert_case.assert_not_called()
-        mock_services["mysql"].insert_knowledge_case.assert_not_called()
+        # Rejected before any background work is scheduled
+        assert not accumulator._tasks
+        mock_services["mysql"].bump_case_seen_count.assert_not_called()
+        mock_services["milvus"].insert_cases.assert_not_called()
+        mock_services["mysql"].insert_knowledge_cases.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_accumulate_error_handling(self, accumulator, mock_services):
@@ -102,5 +120,165 @@ class TestKnowledgeAccumulator:
 
         # Should not raise exception
         await accumulator(state)
+        await accumulator.flush()
+
+        mock_services["milvus"].insert_cases.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_skips_known_error_pattern(self, accumulator, mock_services):
+        """Test a pattern already in the knowledge base is only counted."""
+        mock_services["mysql"].bump_case_seen_count.return_value = True
+
+        await accumulator(self._state(1))
+        await accumulator.flush()
+
+        mock_services["mysql"].bump_case_seen_count.assert_awaited_once_with("error")
+        mock_services["llm"].generate_embedding.assert_not_called()
+        mock_services["milvus"].insert_cases.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_skips_pattern_already_buffered(
+        self, accumulator, mock_services, mock_settings
+    ):
+        """Test the same pattern is buffered once per batch, counting repeats."""
+        mock_settings.accumulate_batch_size = 10
+        mock_services["llm"].generate_embedding.return_value = _VEC_01
+
+        await accumulator(self._state(1))
+        await accumulator(self._state(2))
+        await accumulator.close()
+
+        (milvus_cases,) = mock_services["milvus"].insert_cases.call_args[0]
+        assert len(milvus_cases) == 1
+        (mysql_cases,) = mock_services["mysql"].insert_knowledge_cases.call_args[0]
+        assert mysql_cases[0]["seen_count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_returns_before_accumulation_finishes(
+        self, accumulator, mock_services
+    ):
+        """Test the node does not wait for the embedding and inserts."""
+        release = asyncio.Event()
+
+        async def slow_embedding(text):
+            await release.wait()
+            return _VEC_01
+
+        mock_services["llm"].generate_embedding.side_effect = slow_embedding
+
+        assert await accumulator(self._state(1)) == {}
+        mock_services["milvus"].insert_cases.assert_not_called()
+
+        release.set()
+        await accumulator.close()
+
+        mock_services["milvus"].insert_cases.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_reuses_query_embedding(
+        self, accumulator, mock_services, mock_settings
+    ):
+        """Test the retriever's query vector is stored when reuse is enabled."""
+        mock_settings.reuse_query_embedding = True
+        state = {**self._state(1), "query_vector": [0.5] * 1536}
+
+        await accumulator(state)
+        await accumulator.flush()
+
+        mock_services["llm"].generate_embedding.assert_not_called()
+        (milvus_cases,) = mock_services["milvus"].insert_cases.call_args[0]
+        assert milvus_cases[0]["vector"] == [0.5] * 1536
+
+    @pytest.mark.asyncio
+    async def test_buffers_until_batch_is_full(
+        self, accumulator, mock_services, mock_settings
+    ):
+        """Test cases are written together once the batch size is reached."""
+        mock_settings.accumulate_batch_size = 3
+        mock_services["llm"].generate_embedding.return_value = _VEC_01
+
+        for i, message in enumerate(("oom", "timeout", "refused")):
+            await accumulator(self._state(i, message))
+            await asyncio.gather(*accumulator._tasks)
+            if i < 2:
+                mock_services["milvus"].insert_cases.assert_not_called()
+
+        (milvus_cases,) = mock_services["milvus"].insert_cases.call_args[0]
+        assert len(milvus_cases) == 3
+        mock_services["mysql"].insert_knowledge_cases.assert_awaited_once()
+        await accumulator.close()
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_partial_batch(
+        self, accumulator, mock_services, mock_settings
+    ):
+        """Test closing writes cases still waiting in the buffer."""
+        mock_settings.accumulate_batch_size = 10
+        mock_services["llm"].generate_embedding.return_value = _VEC_01
+
+        await accumulator(self._state(1))
+        await asyncio.gather(*accumulator._tasks)
+        mock_services["milvus"].insert_cases.assert_not_called()
+
+        await accumulator.close()
+
+        mock_services["milvus"].insert_cases.assert_awaited_once()
+        mock_services["mysql"].insert_knowledge_cases.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_timer_flushes_partial_batch(
+        self, accumulator, mock_services, mock_settings
+    ):
+        """Test a partial batch is written after the flush interval."""
+        mock_settings.accumulate_batch_size = 10
+        mock_settings.accumulate_flush_seconds = 0.01
+        mock_services["llm"].generate_embedding.return_value = _VEC_01
+
+        await accumulator(self._state(1))
+        await asyncio.sleep(0.05)
+
+        mock_services["milvus"].insert_cases.assert_awaited_once()
+
+    @staticmethod
+    def _state(exception_id, error_message="error"):
+        """Build a state holding a confident diagnosis."""
+        return {
+            "job_info": {
+                "exception_id": exception_id,
+                "job_id": f"job-{exception_id}",
+                "error_message": error_message,
+                "error_type": "oom",
+            },
+            "diagnosis_result": {
+                "confidence": 0.9,
+                "root_cause": "cause",
+                "suggested_fix": "fix",
+            },
+        }
+
+
+class TestExtractErrorPattern:
+    """Test suite for extract_error_pattern."""
+
+    def test_replaces_volatile_fragments(self):
+        """Test numbers, addresses and paths are generalized."""
+        pattern = extract_error_pattern(
+            "Checkpoint 42 failed at /tmp/flink/chk-42 (obj@0xdeadbeef) "
+            "task a1b2c3d4-e5f6-7890-abcd-ef1234567890 at 2024-01-01 12:00:00"
+        )
+
+        assert pattern == (
+            "Checkpoint <NUM> failed at <PATH> (obj@<ADDR>) task <UUID> at <TIMESTAMP>"
+        )
+
+    def test_keeps_slashes_inside_words(self):
+        """Test only slashes starting a word are treated as paths."""
+        pattern = extract_error_pattern("I/O error reading /data/in at 12 KB/s")
+
+        assert pattern == "I/O error reading <PATH> at <NUM> KB/s"
+
+    def test_bounds_output_length(self):
+        """Test very long messages are cut before and after generalization."""
+        pattern = extract_error_pattern("error " * 10_000)
 
-        mock_services["milvus"].insert_case.assert_not_called()
+        assert len(pattern) == 2000
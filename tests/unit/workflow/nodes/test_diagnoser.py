@@ -2,10 +2,16 @@
 
 from unittest.mock import AsyncMock, MagicMock
 
+import httpx
+import openai
 import pytest
 from oceanus_agent.models.state import DiagnosisStatus
 from oceanus_agent.services.llm_service import LLMService
-from oceanus_agent.workflow.nodes.diagnoser import LLMDiagnoser
+from oceanus_agent.services.milvus_service import MilvusService
+from oceanus_agent.workflow.nodes.diagnoser import DiagnosisCache, LLMDiagnoser
+
+# Fixture embedding, built once; the nodes never mutate query vectors
+_VEC_01 = [0.1] * 1536
 
 
 class TestLLMDiagnoser:
@@ -17,6 +23,7 @@ class TestLLMDiagnoser:
         service = MagicMock(spec=LLMService)
         service.classify_error = AsyncMock()
         service.generate_diagnosis = AsyncMock()
+        service.classify_and_diagnose = AsyncMock()
         return service
 
     @pytest.fixture
@@ -26,46 +33,69 @@ class TestLLMDiagnoser:
 
     @pytest.mark.asyncio
     async def test_diagnose_success(self, diagnoser, mock_llm_service):
-        """Test successful diagnosis."""
+        """Test successful diagnosis of an unclassified error in one LLM call."""
         state = {
             "job_info": {"job_id": "job-1", "error_message": "timeout"},
             "retrieved_context": {},
         }
 
-        # Mock classify
-        mock_llm_service.classify_error.return_value = "checkpoint_failure"
-
-        # Mock diagnosis
+        # Mock fused classification + diagnosis
         diagnosis_result = {
             "root_cause": "network",
             "suggested_fix": "retry",
             "confidence": 0.9,
             "priority": "high",
         }
-        mock_llm_service.generate_diagnosis.return_value = diagnosis_result
+        mock_llm_service.classify_and_diagnose.return_value = (
+            "checkpoint_failure",
+            diagnosis_result,
+        )
 
         new_state = await diagnoser(state)
 
         assert new_state["diagnosis_result"] == diagnosis_result
         assert new_state["job_info"]["error_type"] == "checkpoint_failure"
+        mock_llm_service.classify_error.assert_not_called()
+        mock_llm_service.generate_diagnosis.assert_not_called()
         assert new_state["status"] == DiagnosisStatus.IN_PROGRESS
         assert new_state["retry_count"] == 0
 
     @pytest.mark.asyncio
-    async def test_diagnose_retry_logic(self, diagnoser, mock_llm_service):
+    async def test_diagnose_retry_logic(self, diagnoser, mock_llm_service, mocker):
         """Test retry logic on failure."""
+        sleep = mocker.patch(
+            "oceanus_agent.workflow.nodes.diagnoser.asyncio.sleep", new=AsyncMock()
+        )
         state = {
             "job_info": {"job_id": "job-1", "error_message": "error"},
             "retry_count": 0,
         }
 
-        mock_llm_service.classify_error.side_effect = Exception("LLM Error")
+        mock_llm_service.classify_and_diagnose.side_effect = Exception("LLM Error")
 
         new_state = await diagnoser(state)
 
         assert new_state["retry_count"] == 1
         assert "LLM Error" in new_state["error"]
         assert new_state.get("status") != DiagnosisStatus.FAILED
+        # Backs off before the retry: 2s plus up to 1s of jitter
+        (delay,) = sleep.await_args.args
+        assert 2 <= delay < 3
+
+    def test_retry_delay_honors_retry_after(self):
+        """Test a rate limit's Retry-After header sets the delay."""
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        error = openai.RateLimitError(
+            "Rate limited",
+            response=httpx.Response(429, headers={"retry-after": "7"}, request=request),
+            body=None,
+        )
+
+        assert LLMDiagnoser._retry_delay(error, 1) == 7.0
+
+    def test_retry_delay_is_capped(self):
+        """Test exponential backoff is bounded."""
+        assert LLMDiagnoser._retry_delay(Exception("boom"), 10) == 30.0
 
     @pytest.mark.asyncio
     async def test_diagnose_max_retries_exceeded(self, diagnoser, mock_llm_service):
@@ -75,7 +105,7 @@ class TestLLMDiagnoser:
             "retry_count": 2,  # Max is 3, so next failure hits max
         }
 
-        mock_llm_service.classify_error.side_effect = Exception("LLM Error")
+        mock_llm_service.classify_and_diagnose.side_effect = Exception("LLM Error")
 
         new_state = await diagnoser(state)
 
@@ -83,3 +113,187 @@ class TestLLMDiagnoser:
         assert new_state["status"] == DiagnosisStatus.FAILED
         assert "Diagnosis failed after 3 retries" in new_state["error"]
         assert "end_time" in new_state
+
+    @pytest.mark.asyncio
+    async def test_diagnose_reuses_cached_result_for_same_error(
+        self, mock_llm_service, knowledge_settings
+    ):
+        """Test repeated errors reuse a confident cached diagnosis."""
+        diagnoser = LLMDiagnoser(mock_llm_service, settings=knowledge_settings)
+        mock_llm_service.generate_diagnosis.return_value = {
+            "root_cause": "network",
+            "suggested_fix": "retry",
+            "confidence": 0.9,
+            "priority": "high",
+        }
+
+        # Same error signature, differing only in numbers
+        for job_id, attempt in (("job-1", 3), ("job-2", 7)):
+            state = {
+                "job_info": {
+                    "job_id": job_id,
+                    "job_type": "streaming",
+                    "error_type": "checkpoint_failure",
+                    "error_message": f"Checkpoint failed after {attempt} retries",
+                },
+            }
+            new_state = await diagnoser(state)
+            assert new_state["diagnosis_result"]["root_cause"] == "network"
+
+        mock_llm_service.generate_diagnosis.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_diagnose_does_not_cache_low_confidence(
+        self, mock_llm_service, knowledge_settings
+    ):
+        """Test low-confidence diagnoses are not cached."""
+        diagnoser = LLMDiagnoser(mock_llm_service, settings=knowledge_settings)
+        mock_llm_service.generate_diagnosis.return_value = {
+            "root_cause": "unknown",
+            "suggested_fix": "investigate",
+            "confidence": 0.5,
+            "priority": "low",
+        }
+        state = {
+            "job_info": {
+                "job_id": "job-1",
+                "error_type": "other",
+                "error_message": "something broke",
+            },
+        }
+
+        await diagnoser(state)
+        await diagnoser(state)
+
+        assert mock_llm_service.generate_diagnosis.await_count == 2
+        assert len(diagnoser.cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_diagnose_reuses_semantically_similar_result(
+        self, mock_llm_service, knowledge_settings
+    ):
+        """Test a close enough cached diagnosis skips the LLM call."""
+        knowledge_settings.semantic_cache_enabled = True
+        milvus_service = MagicMock(spec=MilvusService)
+        cached = {"root_cause": "network", "confidence": 0.9, "priority": "high"}
+        milvus_service.search_cached_diagnosis = AsyncMock(return_value=(cached, 0.97))
+        diagnoser = LLMDiagnoser(
+            mock_llm_service, settings=knowledge_settings, milvus_service=milvus_service
+        )
+        state = {
+            "job_info": {
+                "job_id": "job-1",
+                "error_type": "network",
+                "error_message": "Connection reset by peer",
+            },
+            "query_vector": _VEC_01,
+        }
+
+        new_state = await diagnoser(state)
+
+        assert new_state["diagnosis_result"] == cached
+        mock_llm_service.generate_diagnosis.assert_not_called()
+        milvus_service.search_cached_diagnosis.assert_awaited_once_with(
+            _VEC_01, "network"
+        )
+
+    @pytest.mark.asyncio
+    async def test_diagnose_stores_confident_result_on_semantic_miss(
+        self, mock_llm_service, knowledge_settings
+    ):
+        """Test below-threshold hits fall through to the LLM and get cached."""
+        knowledge_settings.semantic_cache_enabled = True
+        milvus_service = MagicMock(spec=MilvusService)
+        milvus_service.search_cached_diagnosis = AsyncMock(
+            return_value=({"root_cause": "other"}, 0.5)
+        )
+        milvus_service.insert_cached_diagnosis = AsyncMock()
+        diagnoser = LLMDiagnoser(
+            mock_llm_service, settings=knowledge_settings, milvus_service=milvus_service
+        )
+        result = {"root_cause": "network", "confidence": 0.9, "priority": "high"}
+        mock_llm_service.generate_diagnosis.return_value = result
+        state = {
+            "job_info": {
+                "job_id": "job-1",
+                "error_type": "network",
+                "error_message": "Connection reset by peer",
+            },
+            "query_vector": _VEC_01,
+        }
+
+        new_state = await diagnoser(state)
+
+        assert new_state["diagnosis_result"] == result
+        milvus_service.insert_cached_diagnosis.assert_awaited_once_with(
+            _VEC_01,
+            "network",
+            result,
+            knowledge_settings.semantic_cache_ttl_seconds,
+        )
+
+    @pytest.mark.asyncio
+    async def test_diagnose_caches_classified_result_of_unclassified_error(
+        self, mock_llm_service, knowledge_settings
+    ):
+        """Test the fused classify-and-diagnose call goes through both caches."""
+        knowledge_settings.semantic_cache_enabled = True
+        milvus_service = MagicMock(spec=MilvusService)
+        milvus_service.search_cached_diagnosis = AsyncMock(return_value=None)
+        milvus_service.insert_cached_diagnosis = AsyncMock()
+        diagnoser = LLMDiagnoser(
+            mock_llm_service, settings=knowledge_settings, milvus_service=milvus_service
+        )
+        result = {"root_cause": "network", "confidence": 0.9, "priority": "high"}
+        mock_llm_service.classify_and_diagnose.return_value = ("network", result)
+        state = {
+            "job_info": {"job_id": "job-1", "error_message": "Connection reset"},
+            "query_vector": _VEC_01,
+        }
+
+        new_state = await diagnoser(state)
+
+        assert new_state["diagnosis_result"] == result
+        # Unclassified: the semantic lookup is not filtered by error type
+        milvus_service.search_cached_diagnosis.assert_awaited_once_with(_VEC_01, None)
+        milvus_service.insert_cached_diagnosis.assert_awaited_once_with(
+            _VEC_01,
+            "network",
+            result,
+            knowledge_settings.semantic_cache_ttl_seconds,
+        )
+        # The same error, now classified, is served from the exact-match cache
+        classified = {**state, "job_info": new_state["job_info"]}
+        assert (await diagnoser(classified))["diagnosis_result"] == result
+        mock_llm_service.classify_and_diagnose.assert_awaited_once()
+        mock_llm_service.generate_diagnosis.assert_not_called()
+
+
+class TestDiagnosisCache:
+    """Test suite for DiagnosisCache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry is evicted when full."""
+        cache = DiagnosisCache(maxsize=2, ttl_seconds=60)
+        cache.put("a", {"confidence": 0.9})
+        cache.put("b", {"confidence": 0.9})
+        cache.get("a")
+        cache.put("c", {"confidence": 0.9})
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_expired_entries_are_dropped(self, mocker):
+        """Test entries are dropped after their TTL."""
+        clock = mocker.patch(
+            "oceanus_agent.workflow.cache.time.monotonic",
+            return_value=100.0,
+        )
+        cache = DiagnosisCache(maxsize=2, ttl_seconds=60)
+        cache.put("a", {"confidence": 0.9})
+
+        clock.return_value = 161.0
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
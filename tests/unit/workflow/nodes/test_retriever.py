@@ -1,5 +1,6 @@
 """Unit tests for KnowledgeRetriever node."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -9,6 +10,9 @@ from oceanus_agent.services.llm_service import LLMService
 from oceanus_agent.services.milvus_service import MilvusService
 from oceanus_agent.workflow.nodes.retriever import KnowledgeRetriever
 
+# Fixture embedding, built once; the nodes never mutate query vectors
+_VEC_01 = [0.1] * 1536
+
 
 class TestKnowledgeRetriever:
     """Test suite for KnowledgeRetriever node."""
@@ -19,6 +23,7 @@ class TestKnowledgeRetriever:
         service = MagicMock(spec=MilvusService)
         service.search_similar_cases = AsyncMock()
         service.search_doc_snippets = AsyncMock()
+        service.query_cases_by_error_type = AsyncMock()
         return service
 
     @pytest.fixture
@@ -26,6 +31,7 @@ class TestKnowledgeRetriever:
         """Mock LLMService."""
         service = MagicMock(spec=LLMService)
         service.generate_embedding = AsyncMock()
+        service.classify_error = AsyncMock()
         return service
 
     @pytest.fixture
@@ -34,6 +40,8 @@ class TestKnowledgeRetriever:
         settings = MagicMock(spec=KnowledgeSettings)
         settings.max_similar_cases = 3
         settings.max_doc_snippets = 3
+        settings.embedding_timeout_ms = 0
+        settings.retrieval_cache_size = 0
         return settings
 
     @pytest.fixture
@@ -55,7 +63,7 @@ class TestKnowledgeRetriever:
         }
 
         # Mock LLM embedding
-        mock_llm_service.generate_embedding.return_value = [0.1] * 1536
+        mock_llm_service.generate_embedding.return_value = _VEC_01
 
         # Mock Milvus search
         mock_case = RetrievedCase(
@@ -79,11 +87,193 @@ class TestKnowledgeRetriever:
         assert len(context["similar_cases"]) == 1
         assert len(context["doc_snippets"]) == 1
         assert context["similar_cases"][0] == mock_case
+        assert new_state["query_vector"] == _VEC_01
 
         # Verify calls
         mock_llm_service.generate_embedding.assert_called_once()
         mock_milvus_service.search_similar_cases.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_retrieve_classifies_missing_error_type(
+        self, retriever, mock_milvus_service, mock_llm_service
+    ):
+        """Test error type is classified alongside the embedding when missing."""
+        state = {"job_info": {"job_id": "job-1", "error_message": "OutOfMemory"}}
+
+        mock_llm_service.generate_embedding.return_value = _VEC_01
+        mock_llm_service.classify_error.return_value = "oom"
+        mock_milvus_service.search_similar_cases.return_value = []
+        mock_milvus_service.search_doc_snippets.return_value = []
+
+        new_state = await retriever(state)
+
+        assert new_state["job_info"]["error_type"] == "oom"
+        mock_llm_service.classify_error.assert_awaited_once_with("OutOfMemory")
+        assert (
+            mock_milvus_service.search_similar_cases.call_args.kwargs["error_type"]
+            == "oom"
+        )
+
+    @pytest.mark.asyncio
+    async def test_retrieve_classification_failure_keeps_context(
+        self, retriever, mock_milvus_service, mock_llm_service
+    ):
+        """Test a failed classification does not discard retrieved context."""
+        state = {"job_info": {"job_id": "job-1", "error_message": "timeout"}}
+
+        mock_llm_service.generate_embedding.return_value = _VEC_01
+        mock_llm_service.classify_error.side_effect = Exception("API Error")
+        mock_milvus_service.search_similar_cases.return_value = []
+        mock_milvus_service.search_doc_snippets.return_value = []
+
+        new_state = await retriever(state)
+
+        assert "error_type" not in new_state["job_info"]
+        mock_milvus_service.search_similar_cases.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_retrieve_doc_search_failure_keeps_cases(
+        self, retriever, mock_milvus_service, mock_llm_service
+    ):
+        """Test a failed doc search does not discard similar cases."""
+        state = {
+            "job_info": {
+                "job_id": "job-1",
+                "error_type": "checkpoint",
+                "error_message": "timeout",
+            }
+        }
+        mock_case = RetrievedCase(
+            case_id="c1",
+            error_type="checkpoint",
+            error_pattern="p",
+            root_cause="r",
+            solution="s",
+            similarity_score=0.9,
+        )
+        mock_llm_service.generate_embedding.return_value = _VEC_01
+        mock_milvus_service.search_similar_cases.return_value = [mock_case]
+        mock_milvus_service.search_doc_snippets.side_effect = Exception("Milvus down")
+
+        new_state = await retriever(state)
+
+        assert new_state["retrieved_context"]["similar_cases"] == [mock_case]
+        assert new_state["retrieved_context"]["doc_snippets"] == []
+
+    @pytest.mark.asyncio
+    async def test_retrieve_falls_back_when_embedding_is_slow(
+        self, retriever, mock_settings, mock_milvus_service, mock_llm_service
+    ):
+        """Test error-type matches are served when the embedding times out."""
+        mock_settings.embedding_timeout_ms = 10
+        state = {
+            "job_info": {
+                "job_id": "job-1",
+                "error_type": "checkpoint",
+                "error_message": "timeout",
+            }
+        }
+
+        async def slow_embedding(_text):
+            await asyncio.sleep(1)
+            return _VEC_01
+
+        mock_llm_service.generate_embedding.side_effect = slow_embedding
+        fallback_case = RetrievedCase(
+            case_id="c1",
+            error_type="checkpoint",
+            error_pattern="p",
+            root_cause="r",
+            solution="s",
+            similarity_score=0.0,
+        )
+        mock_milvus_service.query_cases_by_error_type.return_value = [fallback_case]
+
+        new_state = await retriever(state)
+
+        assert new_state["retrieved_context"]["similar_cases"] == [fallback_case]
+        mock_milvus_service.query_cases_by_error_type.assert_awaited_once_with(
+            "checkpoint", limit=3
+        )
+        mock_milvus_service.search_similar_cases.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_retrieve_uses_vector_search_when_embedding_in_time(
+        self, retriever, mock_settings, mock_milvus_service, mock_llm_service
+    ):
+        """Test the speculative fallback is discarded when the embedding is fast."""
+        mock_settings.embedding_timeout_ms = 1000
+        state = {
+            "job_info": {
+                "job_id": "job-1",
+                "error_type": "checkpoint",
+                "error_message": "timeout",
+            }
+        }
+        mock_llm_service.generate_embedding.return_value = _VEC_01
+        mock_milvus_service.search_similar_cases.return_value = []
+        mock_milvus_service.search_doc_snippets.return_value = []
+
+        new_state = await retriever(state)
+
+        assert new_state["query_vector"] == _VEC_01
+        mock_milvus_service.search_similar_cases.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_retrieve_reuses_cached_context_for_same_pattern(
+        self, mock_milvus_service, mock_llm_service, mock_settings
+    ):
+        """Test repeats of an error pattern skip embedding and searches."""
+        mock_settings.retrieval_cache_size = 16
+        mock_settings.retrieval_cache_ttl_seconds = 60
+        retriever = KnowledgeRetriever(
+            mock_milvus_service, mock_llm_service, mock_settings
+        )
+        mock_llm_service.generate_embedding.return_value = _VEC_01
+        mock_llm_service.classify_error.return_value = "checkpoint_failure"
+        mock_milvus_service.search_similar_cases.return_value = []
+        mock_milvus_service.search_doc_snippets.return_value = []
+
+        first = await retriever(
+            {"job_info": {"job_id": "job-1", "error_message": "Checkpoint 41 expired"}}
+        )
+        second = await retriever(
+            {"job_info": {"job_id": "job-2", "error_message": "Checkpoint 42 expired"}}
+        )
+
+        assert second["retrieved_context"] == first["retrieved_context"]
+        assert second["query_vector"] == _VEC_01
+        assert second["job_info"]["job_id"] == "job-2"
+        assert second["job_info"]["error_type"] == "checkpoint_failure"
+        mock_llm_service.generate_embedding.assert_called_once()
+        mock_milvus_service.search_similar_cases.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_retrieve_does_not_cache_failed_search(
+        self, mock_milvus_service, mock_llm_service, mock_settings
+    ):
+        """Test a partial context from a failed search is not reused."""
+        mock_settings.retrieval_cache_size = 16
+        mock_settings.retrieval_cache_ttl_seconds = 60
+        retriever = KnowledgeRetriever(
+            mock_milvus_service, mock_llm_service, mock_settings
+        )
+        mock_llm_service.generate_embedding.return_value = _VEC_01
+        mock_milvus_service.search_similar_cases.return_value = []
+        mock_milvus_service.search_doc_snippets.side_effect = Exception("down")
+        state = {
+            "job_info": {
+                "job_id": "job-1",
+                "error_type": "checkpoint",
+                "error_message": "timeout",
+            }
+        }
+
+        await retriever(state)
+        await retriever(state)
+
+        assert mock_milvus_service.search_doc_snippets.call_count == 2
+
     @pytest.mark.asyncio
     async def test_retrieve_no_job_info(self, retriever):
         """Test retrieval with missing job info."""
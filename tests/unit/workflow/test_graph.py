@@ -1,10 +1,18 @@
 """Unit tests for workflow graph routing logic."""
 
+from collections.abc import Mapping
 from datetime import datetime
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END
-from oceanus_agent.models.state import DiagnosisState, DiagnosisStatus
+from oceanus_agent.config.settings import Settings
+from oceanus_agent.models.state import DiagnosisStatus
 from oceanus_agent.workflow.graph import (
+    DiagnosisWorkflow,
+    build_diagnosis_workflow,
     handle_error,
     should_continue_after_collect,
     should_continue_after_diagnose,
@@ -14,46 +22,41 @@ from oceanus_agent.workflow.graph import (
 class TestShouldContinueAfterCollect:
     """测试 collect 节点后的路由逻辑."""
 
-    def test_returns_handle_error_when_error_present(
-        self, initial_state: DiagnosisState
+    @pytest.mark.parametrize(
+        ("overrides", "expected"),
+        [
+            pytest.param(
+                {"job_info": None, "error": "Some error occurred"},
+                "handle_error",
+                id="error_without_job",
+            ),
+            pytest.param({"job_info": None}, END, id="no_job"),
+            pytest.param({}, "retrieve", id="job"),
+            # 错误优先于作业
+            pytest.param(
+                {"error": "Error message"}, "handle_error", id="error_and_job"
+            ),
+            # 空字符串是 falsy，所以应该继续
+            pytest.param({"error": ""}, "retrieve", id="empty_error"),
+            pytest.param({"error": None}, "retrieve", id="none_error"),
+        ],
+    )
+    def test_routing(
+        self, state_with_job: Mapping[str, Any], overrides: dict, expected: str
     ) -> None:
-        """有错误时应路由到 handle_error."""
-        state = {**initial_state, "error": "Some error occurred"}
+        """有错误时路由到 handle_error, 无作业时结束, 否则路由到 retrieve."""
+        state = {**state_with_job, **overrides}
 
         result = should_continue_after_collect(state)
 
-        assert result == "handle_error"
-
-    def test_returns_end_when_no_job(self, initial_state: DiagnosisState) -> None:
-        """无待处理作业时应结束."""
-        result = should_continue_after_collect(initial_state)
-
-        assert result == END
-
-    def test_returns_retrieve_when_job_present(
-        self, state_with_job: DiagnosisState
-    ) -> None:
-        """有作业时应路由到 retrieve."""
-        result = should_continue_after_collect(state_with_job)
-
-        assert result == "retrieve"
-
-    def test_error_takes_precedence_over_job(
-        self, state_with_job: DiagnosisState
-    ) -> None:
-        """错误优先于作业."""
-        state = {**state_with_job, "error": "Error message"}
-
-        result = should_continue_after_collect(state)
-
-        assert result == "handle_error"
+        assert result == expected
 
 
 class TestShouldContinueAfterDiagnose:
     """测试 diagnose 节点后的路由逻辑."""
 
     def test_returns_store_on_success(
-        self, state_with_job: DiagnosisState, sample_diagnosis_result: dict
+        self, state_with_job: Mapping[str, Any], sample_diagnosis_result: dict
     ) -> None:
         """诊断成功应路由到 store."""
         state = {
@@ -65,81 +68,35 @@ class TestShouldContinueAfterDiagnose:
 
         assert result == "store"
 
-    def test_returns_diagnose_on_first_retry(
-        self, state_with_job: DiagnosisState
-    ) -> None:
-        """第一次重试时应重新诊断."""
-        state = {
-            **state_with_job,
-            "error": "LLM error",
-            "retry_count": 0,
-        }
-
-        result = should_continue_after_diagnose(state)
-
-        assert result == "diagnose"
-
-    def test_returns_diagnose_on_second_retry(
-        self, state_with_job: DiagnosisState
+    @pytest.mark.parametrize(
+        ("retry_count", "expected"),
+        [
+            pytest.param(0, "diagnose", id="first_retry"),
+            pytest.param(1, "diagnose", id="second_retry"),
+            pytest.param(2, "diagnose", id="third_retry"),
+            pytest.param(3, "handle_error", id="max_retries"),
+            pytest.param(5, "handle_error", id="exceeds_max"),
+        ],
+    )
+    def test_retry_routing(
+        self, state_with_job: Mapping[str, Any], retry_count: int, expected: str
     ) -> None:
-        """第二次重试时应重新诊断."""
+        """重试次数未达上限时重新诊断, 否则路由到 handle_error."""
         state = {
             **state_with_job,
             "error": "LLM error",
-            "retry_count": 1,
+            "retry_count": retry_count,
         }
 
         result = should_continue_after_diagnose(state)
 
-        assert result == "diagnose"
-
-    def test_returns_diagnose_on_third_retry(
-        self, state_with_job: DiagnosisState
-    ) -> None:
-        """第三次重试时应重新诊断."""
-        state = {
-            **state_with_job,
-            "error": "LLM error",
-            "retry_count": 2,
-        }
-
-        result = should_continue_after_diagnose(state)
-
-        assert result == "diagnose"
-
-    def test_returns_handle_error_after_max_retries(
-        self, state_with_job: DiagnosisState
-    ) -> None:
-        """重试次数达上限时应路由到 handle_error."""
-        state = {
-            **state_with_job,
-            "error": "LLM error",
-            "retry_count": 3,
-        }
-
-        result = should_continue_after_diagnose(state)
-
-        assert result == "handle_error"
-
-    def test_returns_handle_error_on_retry_count_exceeds_max(
-        self, state_with_job: DiagnosisState
-    ) -> None:
-        """重试次数超过上限时应路由到 handle_error."""
-        state = {
-            **state_with_job,
-            "error": "LLM error",
-            "retry_count": 5,
-        }
-
-        result = should_continue_after_diagnose(state)
-
-        assert result == "handle_error"
+        assert result == expected
 
 
 class TestHandleError:
     """测试错误处理函数."""
 
-    def test_sets_failed_status(self, state_with_job: DiagnosisState) -> None:
+    def test_sets_failed_status(self, state_with_job: Mapping[str, Any]) -> None:
         """错误处理应设置失败状态."""
         state = {**state_with_job, "error": "Test error"}
 
@@ -147,7 +104,7 @@ class TestHandleError:
 
         assert result["status"] == DiagnosisStatus.FAILED
 
-    def test_sets_end_time(self, state_with_job: DiagnosisState) -> None:
+    def test_sets_end_time(self, state_with_job: Mapping[str, Any]) -> None:
         """错误处理应设置结束时间."""
         state = {**state_with_job, "error": "Test error"}
 
@@ -157,25 +114,26 @@ class TestHandleError:
         # 验证是有效的 ISO 格式时间戳
         datetime.fromisoformat(result["end_time"])
 
-    def test_preserves_other_state_fields(self, state_with_job: DiagnosisState) -> None:
-        """错误处理应保留其他状态字段."""
+    def test_returns_only_changed_fields(
+        self, state_with_job: Mapping[str, Any]
+    ) -> None:
+        """错误处理只返回变更的字段，其余字段由 LangGraph 保留."""
         state = {**state_with_job, "error": "Test error"}
 
         result = handle_error(state)
 
-        assert result["job_info"] == state_with_job["job_info"]
-        assert result["error"] == "Test error"
+        assert set(result) == {"status", "end_time"}
 
-    def test_handles_missing_job_info(self, initial_state: DiagnosisState) -> None:
+    def test_handles_missing_job_info(self, initial_state: Mapping[str, Any]) -> None:
         """应处理无作业信息的情况."""
         state = {**initial_state, "error": "Early error"}
 
         result = handle_error(state)
 
         assert result["status"] == DiagnosisStatus.FAILED
-        assert result["job_info"] is None
+        assert "job_info" not in result
 
-    def test_handles_none_job_id(self, initial_state: DiagnosisState) -> None:
+    def test_handles_none_job_id(self, initial_state: Mapping[str, Any]) -> None:
         """应处理 job_id 为 None 的情况."""
         state = {
             **initial_state,
@@ -192,28 +150,9 @@ class TestHandleError:
 class TestRoutingEdgeCases:
     """路由逻辑边界情况测试."""
 
-    def test_collect_with_empty_error_string_continues(
-        self, state_with_job: DiagnosisState
-    ) -> None:
-        """空错误字符串不应触发错误处理."""
-        state = {**state_with_job, "error": ""}
-
-        result = should_continue_after_collect(state)
-
-        # 空字符串是 falsy，所以应该继续
-        assert result == "retrieve"
-
-    def test_collect_with_none_error_continues(
-        self, state_with_job: DiagnosisState
+    def test_diagnose_no_error_no_result(
+        self, state_with_job: Mapping[str, Any]
     ) -> None:
-        """None 错误不应触发错误处理."""
-        state = {**state_with_job, "error": None}
-
-        result = should_continue_after_collect(state)
-
-        assert result == "retrieve"
-
-    def test_diagnose_no_error_no_result(self, state_with_job: DiagnosisState) -> None:
         """无错误无结果时应路由到 store."""
         state = {**state_with_job, "diagnosis_result": None}
 
@@ -222,7 +161,9 @@ class TestRoutingEdgeCases:
         # 即使没有结果，只要没错误就继续
         assert result == "store"
 
-    def test_diagnose_default_retry_count(self, state_with_job: DiagnosisState) -> None:
+    def test_diagnose_default_retry_count(
+        self, state_with_job: Mapping[str, Any]
+    ) -> None:
         """测试默认重试计数."""
         state = {
             **state_with_job,
@@ -234,3 +175,64 @@ class TestRoutingEdgeCases:
         result = should_continue_after_diagnose(state)
 
         assert result == "diagnose"  # 应该重试
+
+
+class TestDiagnosisWorkflow:
+    """测试 DiagnosisWorkflow 服务管理."""
+
+    @pytest.fixture
+    def workflow(self) -> DiagnosisWorkflow:
+        """创建使用 mock 服务的工作流."""
+        with (
+            patch("oceanus_agent.workflow.graph.MySQLService") as mysql_cls,
+            patch("oceanus_agent.workflow.graph.MilvusService") as milvus_cls,
+            patch("oceanus_agent.workflow.graph.LLMService") as llm_cls,
+        ):
+            mysql_cls.return_value = MagicMock(
+                ping=AsyncMock(),
+                get_pending_count=AsyncMock(return_value=3),
+                close=AsyncMock(),
+            )
+            milvus_cls.return_value = MagicMock(connect=AsyncMock())
+            llm_cls.return_value = MagicMock(close=AsyncMock())
+            return DiagnosisWorkflow(Settings())
+
+    @pytest.mark.asyncio
+    async def test_prewarm_connects_services(self, workflow: DiagnosisWorkflow) -> None:
+        """预热应建立 MySQL 与 Milvus 连接."""
+        await workflow.prewarm()
+
+        workflow.mysql_service.ping.assert_awaited_once()
+        workflow.milvus_service.connect.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_count_pending(self, workflow: DiagnosisWorkflow) -> None:
+        """待处理数量来自 MySQL 服务."""
+        assert await workflow.count_pending() == 3
+
+    @pytest.mark.asyncio
+    async def test_close_closes_services(self, workflow: DiagnosisWorkflow) -> None:
+        """关闭工作流应关闭其持有的全部服务."""
+        await workflow.close()
+
+        workflow.mysql_service.close.assert_awaited_once()
+        workflow.milvus_service.close.assert_called_once()
+        workflow.llm_service.close.assert_awaited_once()
+
+    def test_no_checkpointer_by_default(self, workflow: DiagnosisWorkflow) -> None:
+        """默认不为一次性的诊断流程保存检查点."""
+        assert workflow.app.checkpointer is None
+
+    def test_memory_checkpointer_when_configured(self) -> None:
+        """配置 memory 时使用内存检查点."""
+        settings = Settings()
+        settings.workflow.checkpointer = "memory"
+
+        app = build_diagnosis_workflow(
+            settings,
+            mysql_service=MagicMock(),
+            milvus_service=MagicMock(),
+            llm_service=MagicMock(),
+        )
+
+        assert isinstance(app.checkpointer, MemorySaver)